@@ -1,25 +1,82 @@
 #
 # (c) 2025 Yoichi Tanibayashi
 #
-from importlib.metadata import version as get_version
+"""pibtinput
 
-from .pibtinput import PiBtInput
-from .utils.clibase import CliBase, CliWithHistory, OneKeyCli, ScriptRunner
-from .utils.clickutils import click_common_opts
-from .utils.mylogger import errmsg, get_logger
+公開している名前は、最初に参照されたときに import する (PEP 562)。
+`import pibtinput` だけでは evdev, readline, blessed などを読み込まないので、
+CLI の起動が速い。
+"""
 
-__version__ = "_._._"
-if __package__:
-    __version__ = get_version(__package__)
+from importlib import import_module
+
+# 名前 -> 定義しているモジュール
+_LAZY = {
+    "click_common_opts": ".utils.clickutils",
+    "errmsg": ".utils.mylogger",
+    "get_logger": ".utils.mylogger",
+    "hot_debug": ".utils.mylogger",
+    "CliBase": ".utils.clibase",
+    "CliWithHistory": ".utils.clibase",
+    "ScriptRunner": ".utils.clibase",
+    "OneKeyCli": ".utils.clibase",
+    "PiBtInput": ".pibtinput",
+    "KeyEvent": ".stream",
+    "Stream": ".stream",
+    "AsyncStream": ".stream",
+    "FanOut": ".fanout",
+    "Broker": ".broker",
+    "BrokerClient": ".client",
+    "ShmKeyState": ".shmstate",
+    "ShmKeyReader": ".shmstate",
+    "Axes": ".axes",
+}
 
 __all__ = [
     "__version__",
     "click_common_opts",
     "errmsg",
     "get_logger",
+    "hot_debug",
     "CliBase",
     "CliWithHistory",
     "ScriptRunner",
     "OneKeyCli",
     "PiBtInput",
+    "KeyEvent",
+    "Stream",
+    "AsyncStream",
+    "FanOut",
+    "Broker",
+    "BrokerClient",
+    "ShmKeyState",
+    "ShmKeyReader",
+    "Axes",
 ]
+
+
+def _get_version() -> str:
+    """Package version (importlib.metadata is slow to import)."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(__package__ or "pibtinput")
+    except PackageNotFoundError:
+        return "_._._"
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        value = _get_version()
+    elif name in _LAZY:
+        value = getattr(import_module(_LAZY[name], __package__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # 次回からは通常の属性として参照される
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,19 +1,23 @@
 #
 # (c) 2025 Yoichi Tanibayashi
 #
-"""__main__.py"""
+"""__main__.py
+
+起動を速くするため、各サブコマンドは必要なモジュールだけを
+関数の中で import する。
+"""
 
 import click
 
-from . import __version__
-from .cmd_input import CmdInput
-from .cmd_list import CmdList
 from .utils.clickutils import click_common_opts
 from .utils.mylogger import errmsg, get_logger
 
+# バージョンは --version が指定されたときに調べる
+PKG_NAME = "pibtinput"
+
 
 @click.group()
-@click_common_opts(__version__)
+@click_common_opts(pkg_name=PKG_NAME)
 def cli(ctx, debug):
     """pi0servo CLI top."""
     cmd_name = ctx.info_name
@@ -29,15 +33,22 @@ def cli(ctx, debug):
 
 @cli.command()
 @click.argument("search_keywords", type=str, nargs=-1)
-@click_common_opts(__version__)
+@click_common_opts(pkg_name=PKG_NAME)
 def list(ctx, search_keywords, debug):
-    """List devices."""
+    """List devices.
+
+    SEARCH_KEYWORDS: part of the name, MAC (uniq), vendor:product,
+    or FIELD=VALUE (glob), FIELD~REGEX, cap=KEY_xxx
+    (FIELD: name, id, vendor, product, phys, uniq, path)
+    """
     __log = get_logger(__name__, debug)
     __log.debug("cmd_name=%s", ctx.command.name)
     __log.debug("search_keywords=%s", search_keywords)
 
     app = None
     try:
+        from .cmd_list import CmdList
+
         app = CmdList(search_keywords, debug=debug)
         app.main()
 
@@ -59,12 +70,180 @@ def list(ctx, search_keywords, debug):
     show_default=True,
     help="show repeat",
 )
-@click_common_opts(__version__)
-def input(ctx, search_keywords, repeat, debug):
+@click.option(
+    "--reconnect",
+    "-R",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="wait for the device and reconnect",
+)
+@click.option(
+    "--replay",
+    "replay_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="replay recorded events instead of a device",
+)
+@click.option(
+    "--speed",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="replay speed (0: as fast as possible)",
+)
+@click.option(
+    "--hold",
+    "hold_mode",
+    type=click.Choice(["pass", "suppress", "throttle", "coalesce"]),
+    default=None,
+    help="hold (repeat) filter  [default: suppress, pass if --repeat]",
+)
+@click.option(
+    "--hold-rate",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="throttle: max holds/sec per key",
+)
+@click.option(
+    "--hold-every",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="coalesce: holds per event",
+)
+@click.option(
+    "--dev-repeat",
+    type=(int, int),
+    default=None,
+    metavar="DELAY PERIOD",
+    help="set device key repeat delay/period [ms]",
+)
+@click.option(
+    "--axes",
+    "deadzone",
+    type=click.FloatRange(0.0, 1.0, max_open=True),
+    default=None,
+    metavar="DEADZONE",
+    help="show gamepad axes; d-pad/left stick act as cursor keys",
+)
+@click.option(
+    "--format",
+    "out_format",
+    type=click.Choice(["text", "ndjson", "csv", "binary"]),
+    default="text",
+    show_default=True,
+    help="output format (except text: one record per event to stdout)",
+)
+@click.option(
+    "--flush-interval",
+    type=click.FloatRange(min=0.0),
+    default=0.1,
+    show_default=True,
+    help="write buffered output every N sec (0: every frame)",
+)
+@click_common_opts(pkg_name=PKG_NAME)
+def input(
+    ctx,
+    search_keywords,
+    repeat,
+    reconnect,
+    replay_file,
+    speed,
+    hold_mode,
+    hold_rate,
+    hold_every,
+    dev_repeat,
+    deadzone,
+    out_format,
+    flush_interval,
+    debug,
+):
     """input test."""
     __log = get_logger(__name__, debug)
     __log.debug("cmd_name=%s", ctx.command.name)
-    __log.debug("search_keywords=%s, repeat=%s", search_keywords, repeat)
+    __log.debug(
+        "search_keywords=%s, repeat=%s, reconnect=%s",
+        search_keywords,
+        repeat,
+        reconnect,
+    )
+    __log.debug("replay_file=%a, speed=%s", replay_file, speed)
+    __log.debug(
+        "hold_mode=%s, hold_rate=%s, hold_every=%s, dev_repeat=%s",
+        hold_mode,
+        hold_rate,
+        hold_every,
+        dev_repeat,
+    )
+    __log.debug("deadzone=%s", deadzone)
+    __log.debug(
+        "out_format=%s, flush_interval=%s", out_format, flush_interval
+    )
+
+    if not search_keywords and not replay_file:
+        __log.error("no search_keywords")
+        return
+
+    app = None
+    try:
+        from .cmd_input import CmdInput
+
+        app = CmdInput(
+            search_keywords,
+            repeat,
+            reconnect,
+            replay_file,
+            speed,
+            hold_mode,
+            hold_rate,
+            hold_every,
+            dev_repeat,
+            deadzone,
+            out_format,
+            flush_interval,
+            debug=debug,
+        )
+        app.main()
+
+    except Exception as _e:
+        __log.error(errmsg(_e))
+
+    finally:
+        if app:
+            app.end()
+
+
+@cli.command()
+@click.argument("search_keywords", type=str, nargs=-1)
+@click.option(
+    "--output",
+    "-o",
+    "out_file",
+    type=click.Path(dir_okay=False),
+    required=True,
+    help="output file",
+)
+@click.option(
+    "--count",
+    "-n",
+    type=int,
+    default=0,
+    show_default=True,
+    help="number of events to record (0: until Ctrl-C)",
+)
+@click_common_opts(pkg_name=PKG_NAME)
+def record(ctx, search_keywords, out_file, count, debug):
+    """Record raw input events to a file."""
+    __log = get_logger(__name__, debug)
+    __log.debug("cmd_name=%s", ctx.command.name)
+    __log.debug(
+        "search_keywords=%s, out_file=%a, count=%s",
+        search_keywords,
+        out_file,
+        count,
+    )
 
     if not search_keywords:
         __log.error("no search_keywords")
@@ -72,7 +251,176 @@ def input(ctx, search_keywords, repeat, debug):
 
     app = None
     try:
-        app = CmdInput(search_keywords, repeat, debug=debug)
+        from .cmd_record import CmdRecord
+
+        app = CmdRecord(search_keywords, out_file, count, debug=debug)
+        app.main()
+
+    except Exception as _e:
+        __log.error(errmsg(_e))
+
+    finally:
+        if app:
+            app.end()
+
+
+@cli.command()
+@click.argument("search_keywords", type=str, nargs=-1)
+@click.option(
+    "--interval",
+    "-i",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="refresh interval [sec]",
+)
+@click.option(
+    "--replay",
+    "replay_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="replay recorded events instead of a device",
+)
+@click.option(
+    "--speed",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="replay speed (0: as fast as possible)",
+)
+@click_common_opts(pkg_name=PKG_NAME)
+def stats(ctx, search_keywords, interval, replay_file, speed, debug):
+    """Show input latency and event rates."""
+    __log = get_logger(__name__, debug)
+    __log.debug("cmd_name=%s", ctx.command.name)
+    __log.debug("search_keywords=%s, interval=%s", search_keywords, interval)
+    __log.debug("replay_file=%a, speed=%s", replay_file, speed)
+
+    if not search_keywords and not replay_file:
+        __log.error("no search_keywords")
+        return
+
+    app = None
+    try:
+        from .cmd_stats import CmdStats
+
+        app = CmdStats(
+            search_keywords, interval, replay_file, speed, debug=debug
+        )
+        app.main()
+
+    except Exception as _e:
+        __log.error(errmsg(_e))
+
+    finally:
+        if app:
+            app.end()
+
+
+@cli.command()
+@click.argument("config_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--dry-run",
+    "-n",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="print commands instead of running them",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=2,
+    show_default=True,
+    help="number of pre-spawned workers (max concurrent commands)",
+)
+@click_common_opts(pkg_name=PKG_NAME)
+def run(ctx, config_file, dry_run, workers, debug):
+    """Run commands on key events (keymap config)."""
+    __log = get_logger(__name__, debug)
+    __log.debug("cmd_name=%s", ctx.command.name)
+    __log.debug(
+        "config_file=%a, dry_run=%s, workers=%s",
+        config_file,
+        dry_run,
+        workers,
+    )
+
+    app = None
+    try:
+        from .cmd_run import CmdRun
+
+        app = CmdRun(config_file, dry_run, workers, debug=debug)
+        app.main()
+
+    except Exception as _e:
+        __log.error(errmsg(_e))
+
+    finally:
+        if app:
+            app.end()
+
+
+@cli.command()
+@click.argument("search_keywords", type=str, nargs=-1)
+@click.option(
+    "--socket",
+    "-s",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default="",
+    help="socket path  [default: $XDG_RUNTIME_DIR/pibtinput.sock]",
+)
+@click.option(
+    "--max-buffer",
+    type=click.IntRange(min=1024),
+    default=256 * 1024,
+    show_default=True,
+    help="send buffer per client [bytes]",
+)
+@click.option(
+    "--slow",
+    type=click.Choice(["drop", "disconnect"]),
+    default="drop",
+    show_default=True,
+    help="when a client's buffer is full: drop frames or disconnect",
+)
+@click.option(
+    "--shm",
+    "shm_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="also publish held keys to shared memory  (e.g. /dev/shm/keys)",
+)
+@click_common_opts(pkg_name=PKG_NAME)
+def serve(
+    ctx, search_keywords, socket_path, max_buffer, slow, shm_path, debug
+):
+    """Publish input events to local clients (Unix socket)."""
+    __log = get_logger(__name__, debug)
+    __log.debug("cmd_name=%s", ctx.command.name)
+    __log.debug(
+        "search_keywords=%s, socket_path=%a, max_buffer=%s, slow=%s",
+        search_keywords,
+        socket_path,
+        max_buffer,
+        slow,
+    )
+    __log.debug("shm_path=%a", shm_path)
+
+    app = None
+    try:
+        from .cmd_serve import CmdServe
+
+        app = CmdServe(
+            search_keywords,
+            socket_path,
+            max_buffer,
+            slow,
+            shm_path,
+            debug=debug,
+        )
         app.main()
 
     except Exception as _e:
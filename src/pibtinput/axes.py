@@ -0,0 +1,282 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Gamepad axes (EV_ABS).
+
+ゲームパッドモードの十字キーやスティックは、EV_KEY ではなく EV_ABS。
+`Axes` を read loop に渡すと、軸の値を -1.0 .. 1.0 に正規化し、
+SYN_REPORT ごとに一度だけ状態を更新する
+(スティックを動かすと、EV_ABS が毎秒数百個届くため)。
+
+  axes = Axes(deadzone=0.15, keys=DPAD_KEYS, cb_axis=cb_axis)
+  bt.read_loop(dev, cb, axes=axes)
+
+  def cb_axis(state, changed):   # SYN_REPORT ごと (変化があれば)
+      print(changed)             # {'ABS_X': 0.53, ...}
+
+keys を指定すると、軸を仮想キーとして扱う
+(例: ABS_HAT0X = -1 → KEY_LEFT を押す)。
+仮想キーは、実際のキーと同じように onkeys とコールバックに反映される。
+複数の軸が同じキーを押している場合(十字キーとスティック)は、
+最後の軸が放したときに放す。
+"""
+
+import evdev
+
+from .keycodes import KEY_CODES
+from .utils.mylogger import get_logger
+
+EV_ABS = evdev.ecodes.EV_ABS
+ABS = evdev.ecodes.ABS
+ecodes = evdev.ecodes
+
+# 十字キー(ハット) と 左スティック → カーソルキー
+DPAD_KEYS = {
+    ecodes.ABS_HAT0X: (ecodes.KEY_LEFT, ecodes.KEY_RIGHT),
+    ecodes.ABS_HAT0Y: (ecodes.KEY_UP, ecodes.KEY_DOWN),
+    ecodes.ABS_X: (ecodes.KEY_LEFT, ecodes.KEY_RIGHT),
+    ecodes.ABS_Y: (ecodes.KEY_UP, ecodes.KEY_DOWN),
+}
+
+# 0.0 .. 1.0 に正規化する軸 (アナログトリガー)
+UNIPOLAR = frozenset((ecodes.ABS_GAS, ecodes.ABS_BRAKE))
+
+
+def abs_name(code: int) -> str:
+    """Axis name (ABS_X, ...)."""
+    name = ABS.get(code, f"ABS_{code:#x}")
+    return name[0] if isinstance(name, list) else name
+
+
+def abs_code(axis) -> int:
+    """Axis name or code -> code.
+
+    Raises:
+        ValueError: 不明な軸
+    """
+    if isinstance(axis, int):
+        return axis
+    code = getattr(ecodes, axis, None)
+    if not isinstance(code, int) or not axis.startswith("ABS_"):
+        raise ValueError(f"unknown axis: {axis!r}")
+    return code
+
+
+class Axes:
+    """Axis settings (shared by devices)."""
+
+    def __init__(
+        self,
+        deadzone: float = 0.1,
+        keys: dict | None = None,
+        threshold: float = 0.5,
+        cb_axis=None,
+        debug=False,
+    ) -> None:
+        """Constractor.
+
+        Args:
+            deadzone: 中心付近で 0 とみなす範囲 (0.0 .. 1.0)
+                absinfo の flat の方が大きければ、そちらを使う
+            keys: 仮想キー {軸: (負の方向のキー, 正の方向のキー)}
+                軸, キーは名前でもコードでもよい (None: 使わない)
+            threshold: 仮想キーを押す値 (放すのは threshold / 2)
+            cb_axis: cb_axis(state: AxisState, changed: {軸名: 値})
+                SYN_REPORT ごとに、変化した軸があれば呼ぶ。
+                False が返されると read loop は終了する。
+
+        Raises:
+            ValueError: 不正な値、不明な軸やキー
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug(
+            "deadzone=%s, keys=%s, threshold=%s", deadzone, keys, threshold
+        )
+
+        if not 0.0 <= deadzone < 1.0:
+            raise ValueError(f"invalid deadzone: {deadzone}")
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"invalid threshold: {threshold}")
+
+        self.deadzone = deadzone
+        self.threshold = threshold
+        self.cb_axis = cb_axis
+
+        # {軸コード: (負のキーコード, 正のキーコード)}
+        self.keys: dict[int, tuple[int, int]] = {}
+        for axis, (neg, pos) in (keys or {}).items():
+            try:
+                self.keys[abs_code(axis)] = (
+                    neg if isinstance(neg, int) else KEY_CODES[neg],
+                    pos if isinstance(pos, int) else KEY_CODES[pos],
+                )
+            except KeyError as _e:
+                raise ValueError(f"unknown key: {_e}") from None
+
+    def new_state(self, dev) -> "AxisState":
+        """Per-device axis state."""
+        return AxisState(self, dev, debug=self.__debug)
+
+
+class _Axis:
+    """One axis (absinfo)."""
+
+    __slots__ = (
+        "center",
+        "dead",
+        "direction",
+        "half",
+        "keys",
+        "name",
+        "value",
+    )
+
+    def __init__(self, code: int, info, axes: Axes) -> None:
+        self.name = abs_name(code)
+        if code in UNIPOLAR:
+            self.center = info.min
+            self.half = max(info.max - info.min, 1)
+        else:
+            self.center = (info.min + info.max) / 2
+            self.half = max((info.max - info.min) / 2, 0.5)
+        self.dead = max(axes.deadzone, info.flat / self.half)
+        self.keys = axes.keys.get(code)
+        self.direction = 0  # 仮想キー: -1, 0, 1
+        self.value = self.normalize(info.value)
+
+    def normalize(self, raw: int) -> float:
+        """Raw value -> -1.0 .. 1.0 (with deadzone)."""
+        x = (raw - self.center) / self.half
+        if x >= 0:
+            x = min(x, 1.0)
+            return 0.0 if x < self.dead else (x - self.dead) / (1 - self.dead)
+        x = max(x, -1.0)
+        return 0.0 if -x < self.dead else (x + self.dead) / (1 - self.dead)
+
+
+class AxisState:
+    """Per-device axis state (coalesced per SYN_REPORT)."""
+
+    def __init__(self, axes: Axes, dev, debug=False) -> None:
+        """Constractor.
+
+        absinfo はデバイスから読む (EV_ABS が無いデバイスでもよい)。
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+
+        self.axes = axes
+        self.dev = dev
+        self.cb_axis = axes.cb_axis
+
+        self.axis: dict[int, _Axis] = {}
+        caps = {}
+        try:
+            caps = dev.capabilities(absinfo=True)
+        except (AttributeError, OSError) as _e:
+            self.__log.debug("%s: %s", dev, _e)
+        for code, info in caps.get(EV_ABS, []):
+            self.axis[code] = _Axis(code, info, axes)
+        self.__log.debug(
+            "%s: axes=%s", dev, [a.name for a in self.axis.values()]
+        )
+
+        # SYN_REPORT までの生の値 {code: raw} (同じ軸は最後の値だけ)
+        self.pending: dict[int, int] = {}
+
+        # SYN_DROPPED: 次の SYN_REPORT まで捨て、そこで読み直す
+        self.dropping = False
+
+        # 直前の commit() で発生した仮想キー [(code, key_state), ...]
+        self.vkeys: list[tuple[int, int]] = []
+
+        # 仮想キーを押している軸の数 {code: n}
+        self.vheld: dict[int, int] = {}
+
+    @property
+    def values(self) -> dict[str, float]:
+        """Current values {axis name: value}."""
+        return {a.name: a.value for a in self.axis.values()}
+
+    def value(self, axis) -> float:
+        """Current value of axis (name or code)."""
+        a = self.axis.get(abs_code(axis))
+        return a.value if a else 0.0
+
+    def feed(self, code: int, raw: int) -> None:
+        """EV_ABS event (applied at commit())."""
+        self.pending[code] = raw
+
+    def drop(self) -> None:
+        """SYN_DROPPED."""
+        self.dropping = True
+        self.pending.clear()
+
+    def commit(self) -> dict[str, float]:
+        """SYN_REPORT: apply pending values.
+
+        Returns:
+            変化した軸 {軸名: 値}。仮想キーは `vkeys` に入る。
+        """
+        vkeys = self.vkeys
+        vkeys.clear()
+
+        pending = self.pending
+        if self.dropping:
+            # 溜めた値は捨て、今の値をデバイスから読み直す
+            self.dropping = False
+            pending.clear()
+            for code in self.axis:
+                try:
+                    pending[code] = self.dev.absinfo(code).value
+                except (AttributeError, OSError) as _e:
+                    self.__log.debug("%s: %s", self.dev, _e)
+
+        if not pending:
+            return {}
+
+        changed = {}
+        threshold = self.axes.threshold
+        for code, raw in pending.items():
+            a = self.axis.get(code)
+            if a is None:
+                continue
+            x = a.normalize(raw)
+            if x == a.value:
+                continue
+            a.value = x
+            changed[a.name] = x
+
+            if a.keys is None:
+                continue
+            # ヒステリシス: threshold で押し、threshold / 2 未満で放す
+            d = a.direction
+            if d and x * d >= threshold / 2:
+                continue
+            new_d = 1 if x >= threshold else -1 if x <= -threshold else 0
+            if new_d == d:
+                continue
+            if d:
+                self._vkey(a.keys[d > 0], 0)
+            if new_d:
+                self._vkey(a.keys[new_d > 0], 1)
+            a.direction = new_d
+        pending.clear()
+
+        return changed
+
+    def _vkey(self, code: int, key_state: int) -> None:
+        """Press/release virtual key (reference counted)."""
+        n = self.vheld.get(code, 0)
+        if key_state:
+            self.vheld[code] = n + 1
+            if n == 0:
+                self.vkeys.append((code, 1))
+            return
+
+        if n > 1:
+            self.vheld[code] = n - 1
+            return
+        self.vheld.pop(code, None)
+        self.vkeys.append((code, 0))
@@ -0,0 +1,415 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Local event broker (Unix domain socket).
+
+`pibtinput serve` がデバイスを読み込み、SYN_REPORT ごとのフレームを
+接続しているすべてのクライアントに配る。クライアントは `BrokerClient`。
+
+メッセージ (little endian):
+
+  header: type(u8) dev(u16) n(u16) n_held(u16) seq(u32) sec(u32) usec(u32)
+          generation(u32)
+
+  MSG_DEV:   payload = "path\\0name" (utf-8, n バイト)
+  MSG_FRAME: payload = (code(u16) state(u8)) x n
+                     + (code(u16) count(u16)) x n_held  (フレーム適用後)
+  MSG_STATE: MSG_FRAME と同じ形式で n = 0 (イベントなし, 状態だけ)
+
+seq はデバイスごとのフレーム番号。クライアントは seq が飛んだら
+(フレームが捨てられたら)、n_held の状態で onkeys を作り直す。
+generation は broker 側の onkeys の世代 (変化したかどうかの判定用)。
+
+後から接続したクライアントには、デバイスごとに MSG_DEV と
+MSG_STATE を送る (イベントとしては扱われない)。
+
+フレームは一つのメッセージとして、クライアントごとに一度に送る。
+送れなかった分はクライアントごとのバッファに溜め、
+バッファが max_buffer を超えたら、slow に従って
+"drop" (そのフレームを捨てる) または "disconnect" (切断する) する。
+drop した場合は、バッファが空いたときに各デバイスの最新フレームを送る。
+一つのクライアントが詰まっても、他のクライアントは影響を受けない。
+"""
+
+import contextlib
+import itertools
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from .utils.mylogger import errmsg, get_logger
+
+MSG_DEV = 1
+MSG_FRAME = 2
+MSG_STATE = 3
+
+HDR_STRUCT = struct.Struct("<BHHHIIII")
+EVT_STRUCT = struct.Struct("<HB")
+HELD_STRUCT = struct.Struct("<HH")
+
+SLOW_POLICIES = ("drop", "disconnect")
+
+
+def default_socket_path() -> str:
+    """Default socket path ($XDG_RUNTIME_DIR or /tmp)."""
+    run_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if run_dir:
+        return os.path.join(run_dir, "pibtinput.sock")
+    return f"/tmp/pibtinput-{os.getuid()}.sock"
+
+
+def pack_dev(dev_id: int, path: str, name: str) -> bytes:
+    """MSG_DEV message."""
+    payload = f"{path}\0{name}".encode()
+    return (
+        HDR_STRUCT.pack(MSG_DEV, dev_id, len(payload), 0, 0, 0, 0, 0)
+        + payload
+    )
+
+
+def pack_frame(
+    dev_id: int,
+    seq: int,
+    frame,
+    counts: dict,
+    sec: int = 0,
+    usec: int = 0,
+    generation: int = 0,
+    msg_type: int = MSG_FRAME,
+) -> bytes:
+    """MSG_FRAME message.
+
+    Args:
+        frame: [(code, state), ...]
+        counts: {code: count} (フレーム適用後の押されているキー)
+        sec, usec: タイムスタンプ (0: 今の時刻)
+        generation: onkeys の世代
+        msg_type: MSG_FRAME, MSG_STATE (frame は空)
+    """
+    if not sec:
+        sec, usec = divmod(time.time_ns() // 1000, 1_000_000)
+    parts = [
+        HDR_STRUCT.pack(
+            msg_type,
+            dev_id,
+            len(frame),
+            len(counts),
+            seq & 0xFFFFFFFF,
+            sec & 0xFFFFFFFF,
+            usec,
+            generation & 0xFFFFFFFF,
+        )
+    ]
+    parts += itertools.starmap(EVT_STRUCT.pack, frame)
+    pack_held = HELD_STRUCT.pack
+    parts += [pack_held(code, min(n, 0xFFFF)) for code, n in counts.items()]
+    return b"".join(parts)
+
+
+def pack_state(dev_id: int, seq: int, onkeys) -> bytes:
+    """MSG_STATE message (KeySnapshot, no events)."""
+    return pack_frame(
+        dev_id,
+        seq,
+        (),
+        onkeys.counts,
+        onkeys.sec,
+        onkeys.usec,
+        onkeys.generation,
+        MSG_STATE,
+    )
+
+
+def payload_size(n: int, n_held: int, msg_type: int) -> int:
+    """Payload size of the message."""
+    if msg_type in (MSG_FRAME, MSG_STATE):
+        return n * EVT_STRUCT.size + n_held * HELD_STRUCT.size
+    return n
+
+
+class _Conn:
+    """Client connection (server side)."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.outbuf = bytearray()
+        self.closed = False
+        self.dropped = 0
+        # フレームを捨てた: バッファが空いたら、最新の状態を送る
+        self.stale = False
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+
+class Broker:
+    """Publish frames to clients over a Unix domain socket."""
+
+    def __init__(
+        self,
+        path: str = "",
+        max_buffer: int = 256 * 1024,
+        slow: str = "drop",
+        debug=False,
+    ) -> None:
+        """Constractor.
+
+        Args:
+            path: ソケットのパス ("": default_socket_path())
+            max_buffer: クライアントごとの送信待ちバッファの上限 [bytes]
+            slow: バッファが溢れたときの動作 ("drop", "disconnect")
+
+        Raises:
+            ValueError: 不正な slow
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug(
+            "path=%a, max_buffer=%s, slow=%s", path, max_buffer, slow
+        )
+
+        if slow not in SLOW_POLICIES:
+            raise ValueError(f"invalid slow policy: {slow!r}")
+
+        self.path = path or default_socket_path()
+        self.max_buffer = max_buffer
+        self.slow = slow
+
+        self.lock = threading.Lock()
+        self.conns: tuple[_Conn, ...] = ()
+
+        # dev.path -> [dev_id, seq, MSG_DEV, 最後の MSG_FRAME, 最後の onkeys]
+        self.devs: dict[str, list] = {}
+
+        self.sock: socket.socket | None = None
+        self.thread: threading.Thread | None = None
+        self.wake_r, self.wake_w = -1, -1
+        self.closing = False
+
+    def start(self) -> None:
+        """Listen and start the connection thread.
+
+        Raises:
+            OSError: ソケットを作れない (他の broker が動いている など)
+        """
+        self.__log.debug("path=%a", self.path)
+
+        if os.path.exists(self.path):
+            # 残っているソケットは、接続できなければ消す
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"{self.path}: broker already running")
+            finally:
+                probe.close()
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen()
+        self.sock.setblocking(False)
+
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+
+        self.thread = threading.Thread(
+            target=self._serve, name="pibt-broker", daemon=True
+        )
+        self.thread.start()
+
+    def publish(self, dev, frame, onkeys) -> bool:
+        """Publish one frame (read loop callback, frame=True, key_code=True).
+
+        `watch_read_loop(..., frame=True, key_code=True)` などに渡す。
+        """
+        ent = self.devs.get(dev.path)
+        if ent is None:
+            dev_id = len(self.devs)
+            ent = [dev_id, 0, pack_dev(dev_id, dev.path, dev.name), b"", None]
+            with self.lock:
+                self.devs[dev.path] = ent
+            self._send_all(ent[2])
+
+        ent[1] += 1
+        msg = ent[3] = pack_frame(
+            ent[0],
+            ent[1],
+            frame,
+            onkeys.counts,
+            onkeys.sec,
+            onkeys.usec,
+            onkeys.generation,
+        )
+        ent[4] = onkeys
+        self._send_all(msg)
+        return True
+
+    def _send_all(self, msg: bytes) -> None:
+        """Send msg to all clients."""
+        wake = False
+        for conn in self.conns:
+            if self._send(conn, msg):
+                wake = True
+        if wake:
+            # 送信待ちができた: 接続スレッドで EVENT_WRITE を待つ
+            with contextlib.suppress(BlockingIOError):
+                os.write(self.wake_w, b"\0")
+
+    def _send(self, conn: _Conn, msg: bytes) -> bool:
+        """Send or buffer msg.
+
+        Returns:
+            True: 接続スレッドを起こす (送信待ちができた、切断した)
+        """
+        with conn.lock:
+            if conn.closed:
+                return False
+
+            if conn.outbuf:
+                if len(conn.outbuf) + len(msg) > self.max_buffer:
+                    return self._overflow(conn)
+                conn.outbuf += msg
+                return False
+
+            try:
+                n = conn.sock.send(msg)
+            except BlockingIOError:
+                n = 0
+            except OSError:
+                conn.closed = True
+                return True
+
+            if n == len(msg):
+                return False
+            conn.outbuf += msg[n:]
+            return True
+
+    def _overflow(self, conn: _Conn) -> bool:
+        """Client buffer is full (with conn.lock held).
+
+        Returns:
+            True: 切断した (接続スレッドで後始末する)
+        """
+        if self.slow == "disconnect":
+            self.__log.warning("slow client: disconnect")
+            conn.closed = True
+            return True
+        conn.dropped += 1
+        conn.stale = True
+        return False
+
+    def _serve(self) -> None:
+        """Connection thread: accept, flush buffers, detect close."""
+        assert self.sock is not None
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.sock, selectors.EVENT_READ, "listen")
+            sel.register(self.wake_r, selectors.EVENT_READ, "wake")
+            while not self.closing:
+                for key, mask in sel.select():
+                    if key.data == "listen":
+                        self._accept(sel)
+                    elif key.data == "wake":
+                        with contextlib.suppress(BlockingIOError):
+                            os.read(self.wake_r, 4096)
+                    else:
+                        self._service(key.data, mask)
+                self._update(sel)
+
+    def _accept(self, sel) -> None:
+        """Accept a client and send the current state."""
+        assert self.sock is not None
+        try:
+            sock, _ = self.sock.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        conn = _Conn(sock)
+        self.__log.debug("connected: fd=%s", conn.fileno())
+
+        # デバイス一覧と、現在の状態 (イベントは送らない)
+        with self.lock:
+            for dev_id, seq, msg_dev, _, onkeys in self.devs.values():
+                conn.outbuf += msg_dev
+                if onkeys is not None:
+                    conn.outbuf += pack_state(dev_id, seq, onkeys)
+            self.conns = (*self.conns, conn)
+        sel.register(conn, selectors.EVENT_READ, conn)
+
+    def _service(self, conn: _Conn, mask: int) -> None:
+        """Client socket is readable (EOF) or writable."""
+        if mask & selectors.EVENT_READ:
+            try:
+                if not conn.sock.recv(4096):
+                    conn.closed = True
+            except BlockingIOError:
+                pass
+            except OSError:
+                conn.closed = True
+
+        if mask & selectors.EVENT_WRITE:
+            with conn.lock:
+                try:
+                    n = conn.sock.send(conn.outbuf)
+                    del conn.outbuf[:n]
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    conn.closed = True
+
+                if conn.stale and not conn.outbuf:
+                    conn.stale = False
+                    with self.lock:
+                        for ent in self.devs.values():
+                            conn.outbuf += ent[3]
+
+    def _update(self, sel) -> None:
+        """Drop closed clients, and wait EVENT_WRITE if needed."""
+        for conn in self.conns:
+            if conn.closed:
+                self.__log.debug(
+                    "disconnected: fd=%s, dropped=%s",
+                    conn.fileno(),
+                    conn.dropped,
+                )
+                sel.unregister(conn)
+                with self.lock:
+                    self.conns = tuple(c for c in self.conns if c is not conn)
+                with conn.lock:
+                    conn.sock.close()
+                continue
+
+            events = selectors.EVENT_READ
+            if conn.outbuf:
+                events |= selectors.EVENT_WRITE
+            if sel.get_key(conn).events != events:
+                sel.modify(conn, events, conn)
+
+    def close(self) -> None:
+        """Stop and remove the socket."""
+        self.__log.debug("")
+        self.closing = True
+        if self.thread:
+            os.write(self.wake_w, b"\0")
+            self.thread.join(timeout=5)
+            self.thread = None
+        for conn in self.conns:
+            conn.sock.close()
+        self.conns = ()
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError as _e:
+                self.__log.debug(errmsg(_e))
+        for fd in (self.wake_r, self.wake_w):
+            if fd >= 0:
+                os.close(fd)
+        self.wake_r, self.wake_w = -1, -1
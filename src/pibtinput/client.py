@@ -0,0 +1,226 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Client of the event broker (`pibtinput serve`).
+
+`PiBtInput` の複数デバイス用 read loop と同じコールバック、
+および `events()` と同じイテレータで、broker のイベントを受け取る。
+
+  with BrokerClient() as cl:
+      cl.read_loop(cb)                 # cb(dev, key_name, key_state, onkeys)
+      cl.read_loop(cb, frame=True)     # cb(dev, frame, onkeys)
+
+  with BrokerClient() as cl:
+      for ev in cl.events().keys("KEY_A"):
+          ...
+
+dev は `RemoteDev` (path, name)。
+frame=True の onkeys の generation は、broker 側の onkeys の世代。
+"""
+
+import socket
+
+from .broker import (
+    EVT_STRUCT,
+    HDR_STRUCT,
+    HELD_STRUCT,
+    MSG_DEV,
+    MSG_FRAME,
+    MSG_STATE,
+    default_socket_path,
+    payload_size,
+)
+from .keycodes import KEY_MAX, KEY_NAMES
+from .keystate import KeySnapshot, KeyState, bit_codes
+from .stream import KeyEvent, Stream
+from .utils.mylogger import get_logger
+
+RECV_SIZE = 64 * 1024
+
+
+class RemoteDev:
+    """Device on the broker side."""
+
+    __slots__ = ("dev_id", "name", "onkeys", "path", "seq")
+
+    def __init__(self, dev_id: int, path: str, name: str) -> None:
+        self.dev_id = dev_id
+        self.path = path
+        self.name = name
+        self.seq = 0
+        self.onkeys = KeyState()
+
+    def __str__(self) -> str:
+        return f"remote {self.path}, name {self.name!r}"
+
+
+class BrokerClient:
+    """Receive events from the broker."""
+
+    def __init__(self, path: str = "", debug=False) -> None:
+        """Constractor.
+
+        Args:
+            path: ソケットのパス ("": default_socket_path())
+
+        Raises:
+            OSError: broker に接続できない
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+
+        self.path = path or default_socket_path()
+        self.__log.debug("path=%a", self.path)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+        except OSError:
+            self.sock.close()
+            raise
+
+        self.devs: dict[int, RemoteDev] = {}
+
+        # seq が飛んだ(broker でフレームが捨てられた)回数
+        self.resyncs = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Close."""
+        self.__log.debug("")
+        self.sock.close()
+
+    def frames(self):
+        """Generate (dev, frame, counts, sec, usec, generation).
+
+        broker が終了するまで。
+        frame: [(code, state), ...], counts: {code: count} (フレーム適用後)
+        generation: broker 側の onkeys の世代
+
+        MSG_STATE (接続時の状態) は、dev.onkeys に反映するだけで生成しない。
+        """
+        buf = bytearray()
+        hdr_size = HDR_STRUCT.size
+        unpack_hdr = HDR_STRUCT.unpack_from
+        while True:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                return
+            buf += data
+
+            off = 0
+            while len(buf) - off >= hdr_size:
+                msg_type, dev_id, n, n_held, seq, sec, usec, gen = unpack_hdr(
+                    buf, off
+                )
+                size = payload_size(n, n_held, msg_type)
+                if len(buf) - off - hdr_size < size:
+                    break
+                p = off + hdr_size
+                off = p + size
+
+                if msg_type == MSG_DEV:
+                    path, _, name = bytes(buf[p:off]).decode().partition("\0")
+                    self.devs[dev_id] = RemoteDev(dev_id, path, name)
+                    continue
+                if msg_type not in (MSG_FRAME, MSG_STATE):
+                    continue
+
+                dev = self.devs.get(dev_id)
+                if dev is None:
+                    continue
+
+                # 接続時の状態: onkeys に反映するだけ (イベントではない)
+                if msg_type == MSG_STATE:
+                    dev.seq = seq
+                    self._sync(
+                        dev.onkeys, dict(HELD_STRUCT.iter_unpack(buf[p:off]))
+                    )
+                    continue
+
+                delta = (seq - dev.seq) & 0xFFFFFFFF
+                if delta == 0 or delta >= 0x80000000:
+                    # 同じフレームを二度受け取った
+                    continue
+
+                q = p + n * EVT_STRUCT.size
+                frame = list(EVT_STRUCT.iter_unpack(buf[p:q]))
+                counts = dict(HELD_STRUCT.iter_unpack(buf[q:off]))
+                if delta != 1 and dev.seq:
+                    self.resyncs += 1
+                    self.__log.debug("%s: resync (seq %s)", dev, seq)
+                dev.seq = seq
+                yield dev, frame, counts, sec, usec, gen
+
+            del buf[:off]
+
+    def read_loop(self, cb_key_event, frame=False, key_code=False) -> None:
+        """Read loop (same callbacks as `PiBtInput.select_read_loop()`).
+
+        broker が終了するか、False が返されると終了する。
+        """
+        keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+
+        for dev, fr, counts, sec, usec, gen in self.frames():
+            onkeys = dev.onkeys
+            onkeys.key_code = key_code
+            if frame:
+                fr = [(keys[code], key_state) for code, key_state in fr]
+                snap = KeySnapshot(
+                    self._bits(counts),
+                    gen,
+                    counts,
+                    key_code,
+                    sec,
+                    usec,
+                )
+                if cb_key_event(dev, fr, snap) is False:
+                    return
+                continue
+
+            for code, key_state in fr:
+                onkeys.update(code, key_state)
+                if cb_key_event(dev, keys[code], key_state, onkeys) is False:
+                    return
+            self._sync(onkeys, counts)
+
+    def events(self, key_code=False) -> Stream:
+        """Key events (same as `PiBtInput.events()`)."""
+        return Stream(self._iter_events(key_code))
+
+    def _iter_events(self, key_code):
+        keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+        new = tuple.__new__
+        for dev, fr, counts, sec, usec, _ in self.frames():
+            onkeys = dev.onkeys
+            onkeys.key_code = key_code
+            for code, key_state in fr:
+                onkeys.update(code, key_state)
+                yield new(
+                    KeyEvent,
+                    (dev, keys[code], key_state, onkeys, sec, usec),
+                )
+            self._sync(onkeys, counts)
+
+    @staticmethod
+    def _bits(counts: dict) -> int:
+        bits = 0
+        for code in counts:
+            bits |= 1 << code
+        return bits
+
+    def _sync(self, onkeys: KeyState, counts: dict) -> None:
+        """Make onkeys equal to the broker's state (after a lost frame)."""
+        if onkeys.bits == self._bits(counts):
+            return
+        for code in bit_codes(onkeys.bits):
+            onkeys.holds[code] = 0
+        for code, n in counts.items():
+            onkeys.holds[code] = n
+        onkeys.bits = self._bits(counts)
+        onkeys.generation += 1
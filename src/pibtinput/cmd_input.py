@@ -1,56 +1,205 @@
 #
 # (c) 2025 Yoichi Tanibayashi
 #
+import sys
 
-import evdev
-
+from .axes import DPAD_KEYS, Axes
+from .holdfilter import HoldFilter, get_repeat, set_repeat
+from .matcher import Matcher
+from .output import FrameWriter
 from .pibtinput import PiBtInput
-from .utils.mylogger import get_logger
+from .record import ReplayDevice
+from .utils.mylogger import errmsg, get_logger, hot_debug
 
 
 class CmdInput:
     """Test."""
 
-    def __init__(self, dev_words, flag_repeat=False, debug=False) -> None:
+    # 'S' を長押し (リピート 10回を超える) すると終了
+    EXIT_BINDING = "KEY_S*11"
+
+    def __init__(
+        self,
+        dev_words,
+        flag_repeat=False,
+        flag_reconnect=False,
+        replay_file="",
+        replay_speed=1.0,
+        hold_mode=None,
+        hold_rate=0.0,
+        hold_every=0,
+        dev_repeat=None,
+        deadzone=None,
+        out_format="text",
+        flush_interval=0.1,
+        debug=False,
+    ) -> None:
         self.__debug = debug
         self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__dbg = hot_debug(self.__log)
+        self.__log.debug(
+            "dev_words=%s, flag_repeat=%s, flag_reconnect=%s",
+            dev_words,
+            flag_repeat,
+            flag_reconnect,
+        )
+        self.__log.debug(
+            "replay_file=%a, replay_speed=%s", replay_file, replay_speed
+        )
+        self.__log.debug(
+            "hold_mode=%s, hold_rate=%s, hold_every=%s, dev_repeat=%s",
+            hold_mode,
+            hold_rate,
+            hold_every,
+            dev_repeat,
+        )
+        self.__log.debug("deadzone=%s", deadzone)
         self.__log.debug(
-            "dev_words=%s, flag_repeat=%s", dev_words, flag_repeat
+            "out_format=%s, flush_interval=%s", out_format, flush_interval
         )
 
         self.dev_words = dev_words
         self.flag_repeat = flag_repeat
+        self.flag_reconnect = flag_reconnect
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.dev_repeat = dev_repeat  # (delay_ms, period_ms) or None
 
-        self.prev_onkeys: dict[str, int] = {}
+        # 変更前のリピート設定 (終了時に戻す)
+        #   {path: (dev, (delay_ms, period_ms))}
+        #   再接続したときは、最初の設定を新しい dev に戻す
+        self.saved_repeat: dict = {}
+
+        # 前回処理した onkeys の世代
+        self.prev_generation = -1
 
         self.bt = PiBtInput(self.__debug)
 
+        self.matcher = Matcher(debug=self.__debug)
+        self.matcher.add(self.EXIT_BINDING, self.on_exit)
+
+        # hold イベントは、Matcher の後、cb_ev の前で間引く
+        #   hold_mode 省略時: --repeat なら "pass", それ以外は "suppress"
+        if hold_mode is None:
+            hold_mode = "pass" if flag_repeat else "suppress"
+        self.hold_filter = HoldFilter(
+            hold_mode, hold_rate, hold_every, debug=self.__debug
+        )
+        self.cb = self.matcher.stage(self.hold_filter.stage(self.cb_ev))
+
+        # 構造化出力 (text 以外): フレームごとに stdout に書き、
+        # メッセージは stderr に出す
+        #   キーコードのまま受け取り、キー名は書くときだけ引く
+        self.writer = None
+        self.frame = False
+        self.key_code = False
+        self.out = sys.stdout
+        if out_format != "text":
+            self.writer = FrameWriter(
+                out_format,
+                sys.stdout.fileno(),
+                flush_interval,
+                debug=self.__debug,
+            )
+            self.frame = True
+            self.key_code = True
+            self.out = sys.stderr
+            self.cb = self.matcher.stage(
+                self.hold_filter.stage(self.writer.write_frame, frame=True),
+                frame=True,
+            )
+
+        # ゲームパッドの軸 (deadzone 指定時だけ)
+        #   十字キー, 左スティックはカーソルキーとして扱う
+        self.axes = None
+        if deadzone is not None:
+            self.axes = Axes(
+                deadzone, DPAD_KEYS, cb_axis=self.cb_axis, debug=self.__debug
+            )
+
+    def on_exit(self, binding, onkeys):
+        """Exit binding."""
+        print("Bye !", file=self.out)
+        return False
+
     def cb_ev(self, key_name, key_state, onkeys):
         """Event Callback."""
-        self.__log.debug(
-            "key_name=%s,key_state=%s,onkeys=%s", key_name, key_state, onkeys
-        )
+        if self.__dbg:
+            self.__dbg(
+                "key_name=%s,key_state=%s,onkeys=%s",
+                key_name,
+                key_state,
+                onkeys,
+            )
+
+        # KeyState: 変化したかどうかは世代番号で分かる
+        if onkeys.generation != self.prev_generation:
+            if self.__dbg:
+                self.__dbg(
+                    "pressed=%s, released=%s",
+                    onkeys.pressed,
+                    onkeys.released,
+                )
+            self.prev_generation = onkeys.generation
 
-        if onkeys != self.prev_onkeys:
-            self.__log.debug(f"{self.prev_onkeys} -> {onkeys}")
-            self.prev_onkeys = onkeys.copy()
+            print(f"{key_name}:{key_state}  {onkeys}")
 
-            # if onkeys.get("KEY_S"):
-            #     if onkeys["KEY_S"] > 10:
-            #         print("Bye !")
-            #         return False
+        return True
 
-            if key_state == evdev.KeyEvent.key_hold and not self.flag_repeat:
-                return True
+    def cb_axis(self, state, changed):
+        """Axis Callback."""
+        values = " ".join(f"{k}:{v:+.2f}" for k, v in changed.items())
+        print(f"  {values}", file=self.out)
+        return True
 
-            print(f"{key_name}:{key_state}  {onkeys}")
+    def on_connect(self, dev):
+        """Device (re)connected."""
+        self.apply_repeat(dev)
+        if self.writer:
+            self.writer.set_dev(dev)
 
-        return True
+    def apply_repeat(self, dev):
+        """Set device repeat settings (if specified)."""
+        if not self.dev_repeat:
+            return
+        try:
+            repeat = get_repeat(dev)
+            if dev.path in self.saved_repeat:
+                repeat = self.saved_repeat[dev.path][1]
+            self.saved_repeat[dev.path] = (dev, repeat)
+            set_repeat(dev, *self.dev_repeat)
+        except OSError as _e:
+            self.__log.warning("%s: repeat: %s", dev.name, errmsg(_e))
 
     def main(self):
         """Main."""
         self.__log.debug("")
 
+        if self.replay_file:
+            with ReplayDevice(
+                self.replay_file, self.replay_speed, debug=self.__debug
+            ) as dev:
+                print(f"input_dev: {dev}", file=self.out)
+                if self.writer:
+                    self.writer.set_dev(dev)
+                self.bt.read_loop(
+                    dev, self.cb, frame=self.frame, key_code=self.key_code
+                )
+            return
+
+        if self.flag_reconnect:
+            print(f"waiting for: {list(self.dev_words)}", file=self.out)
+            print("* long press 'S' to exit.", file=self.out)
+            self.bt.supervised_read_loop(
+                self.dev_words,
+                self.cb,
+                frame=self.frame,
+                key_code=self.key_code,
+                on_connect=self.on_connect,
+                axes=self.axes,
+            )
+            return
+
         input_dev = self.bt.search_input_devs(self.dev_words)
         if not input_dev:
             self.__log.error("no such device: %s", list(self.dev_words))
@@ -60,10 +209,25 @@ class CmdInput:
             self.__log.error("ambiguous: %s", [d.name for d in input_dev])
             return
 
-        print(f"input_dev: {input_dev[0]}")
-        print("* long press 'S' to exit.")
-        self.bt.read_loop(input_dev[0], self.cb_ev)
+        print(f"input_dev: {input_dev[0]}", file=self.out)
+        print("* long press 'S' to exit.", file=self.out)
+        self.on_connect(input_dev[0])
+        self.bt.read_loop(
+            input_dev[0],
+            self.cb,
+            frame=self.frame,
+            key_code=self.key_code,
+            axes=self.axes,
+        )
 
     def end(self):
         """End."""
-        self.__log.debug("")
+        self.__log.debug("dropped holds=%s", self.hold_filter.dropped)
+        if self.writer:
+            self.writer.close()
+        for dev, repeat in self.saved_repeat.values():
+            try:
+                set_repeat(dev, *repeat)
+            except (OSError, ValueError) as _e:
+                self.__log.warning("%s: repeat: %s", dev.name, errmsg(_e))
+        self.bt.close()
@@ -2,6 +2,7 @@
 # (c) 2025 Yoichi Tanibayashi
 #
 
+from .devmatch import dev_fields
 from .pibtinput import PiBtInput
 from .utils.mylogger import get_logger
 
@@ -20,9 +21,13 @@ class CmdList:
     def main(self):
         self.__log.debug("")
 
-        devs = self.bt.search_input_devs(self.words)
+        # sysfs が使えれば、デバイスは開かない
+        devs = self.bt.search_dev_info(self.words)
         for d in sorted(devs, key=lambda x: x.path):
-            print(f"{d}")
+            # 同じコントローラーが複数ある場合は、uniq (MAC) で区別する
+            fields = dev_fields(d)
+            print(f"{d}, id {fields['id']}, uniq {fields['uniq']!r}")
 
     def end(self):
         self.__log.debug("")
+        self.bt.close()
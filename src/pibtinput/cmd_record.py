@@ -0,0 +1,61 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+
+from .pibtinput import PiBtInput
+from .record import EventRecorder
+from .utils.mylogger import get_logger
+
+
+class CmdRecord:
+    """Record raw input events."""
+
+    def __init__(self, dev_words, out_file, count=0, debug=False) -> None:
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug(
+            "dev_words=%s, out_file=%a, count=%s", dev_words, out_file, count
+        )
+
+        self.dev_words = dev_words
+        self.out_file = out_file
+        self.count = count
+
+        self.bt = PiBtInput(debug=self.__debug)
+        self.rec: EventRecorder | None = None
+
+    def main(self):
+        """Main."""
+        self.__log.debug("")
+
+        input_dev = self.bt.search_input_devs(self.dev_words)
+        if not input_dev:
+            self.__log.error("no such device: %s", list(self.dev_words))
+            return
+
+        if len(input_dev) > 1:
+            self.__log.error("ambiguous: %s", [d.name for d in input_dev])
+            return
+
+        dev = input_dev[0]
+        print(f"input_dev: {dev}")
+        print(f"record to: {self.out_file}")
+        print("* Ctrl-C to stop.")
+
+        self.rec = EventRecorder(self.out_file, dev.name, debug=self.__debug)
+        try:
+            for ev in dev.read_loop():
+                self.rec.write(ev)
+                if self.count and self.rec.count >= self.count:
+                    break
+        except KeyboardInterrupt:
+            print("^C [Interrupt]")
+
+        print(f"{self.rec.count} events")
+
+    def end(self):
+        """End."""
+        self.__log.debug("")
+        if self.rec:
+            self.rec.close()
+        self.bt.close()
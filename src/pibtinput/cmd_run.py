@@ -0,0 +1,87 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+
+from .executor import ActionExecutor
+from .keycodes import KEY_NAMES
+from .keymap import KeyMap
+from .pibtinput import PiBtInput
+from .utils.mylogger import get_logger, hot_debug
+
+
+class CmdRun:
+    """Run commands on key events (daemon)."""
+
+    def __init__(
+        self, config_file, dry_run=False, n_workers=2, debug=False
+    ) -> None:
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__dbg = hot_debug(self.__log)
+        self.__log.debug(
+            "config_file=%a, dry_run=%s, n_workers=%s",
+            config_file,
+            dry_run,
+            n_workers,
+        )
+
+        self.config_file = config_file
+        self.keymap = KeyMap.load(config_file, debug=self.__debug)
+        self.executor = ActionExecutor(n_workers, dry_run, debug=self.__debug)
+
+        # {dev.path: (dev, table)}
+        self.tables: dict[str, tuple] = {}
+
+        self.bt = PiBtInput(debug=self.__debug)
+
+    def cb_ev(self, dev, code, key_state, onkeys):
+        """Event Callback (key_code=True)."""
+        ent = self.tables.get(dev.path)
+        if ent is None or ent[0] is not dev:
+            table = self.keymap.table_for(dev, self.bt.dev_index())
+            ent = self.tables[dev.path] = (dev, table)
+
+        # 他に押されているキー (修飾キー)
+        mods = onkeys.bits & ~(1 << code)
+        actions = ent[1].get((code, key_state, mods))
+        if not actions:
+            return True
+
+        if self.__dbg:
+            self.__dbg("%s: %s:%s: %s", dev.path, code, key_state, actions)
+
+        env = {
+            "PIBTINPUT_KEY": KEY_NAMES[code],
+            "PIBTINPUT_STATE": str(key_state),
+            "PIBTINPUT_DEV": dev.path,
+            "PIBTINPUT_DEV_NAME": dev.name,
+        }
+        submit = self.executor.submit
+        for action in actions:
+            submit(action, env)
+        return True
+
+    def main(self):
+        """Main."""
+        self.__log.debug("")
+
+        keywords_list = self.keymap.keywords_list()
+        if not keywords_list:
+            self.__log.error("%s: no bindings", self.config_file)
+            return
+
+        print(f"config: {self.config_file}")
+        print(f"devices: {keywords_list}")
+        print("* Ctrl-C to stop.", flush=True)
+        try:
+            self.bt.watch_read_loop(keywords_list, self.cb_ev, key_code=True)
+        except KeyboardInterrupt:
+            print("^C [Interrupt]")
+
+    def end(self):
+        """End."""
+        self.__log.debug("")
+        self.executor.close()
+        self.bt.close()
+        if not self.executor.dry_run:
+            self.__log.info("actions: %s", self.executor.summary())
@@ -0,0 +1,102 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+
+from .broker import Broker
+from .keystate import KeySnapshot
+from .pibtinput import PiBtInput
+from .shmstate import ShmKeyState
+from .utils.mylogger import get_logger
+
+
+class CmdServe:
+    """Publish input events to local clients (broker daemon)."""
+
+    def __init__(
+        self,
+        dev_words,
+        socket_path="",
+        max_buffer=256 * 1024,
+        slow="drop",
+        shm_path=None,
+        debug=False,
+    ) -> None:
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug(
+            "dev_words=%s, socket_path=%a", dev_words, socket_path
+        )
+
+        self.dev_words = dev_words
+        self.broker = Broker(
+            socket_path, max_buffer, slow, debug=self.__debug
+        )
+        self.bt = PiBtInput(debug=self.__debug)
+
+        # 共有メモリ (None: 使わない)
+        #   複数のデバイスは、まとめて一つの状態にする
+        self.shm = None
+        self.shm_onkeys: dict = {}
+        # 外したデバイスの世代の合計 (generation を減らさないため)
+        self.shm_generation = 0
+        if shm_path is not None:
+            self.shm = ShmKeyState(shm_path, debug=self.__debug)
+
+    def main(self):
+        """Main."""
+        self.__log.debug("")
+
+        self.broker.start()
+        print(f"socket: {self.broker.path}")
+        if self.shm:
+            print(f"shm: {self.shm.path}")
+        print(f"devices: {list(self.dev_words) or '(all)'}")
+        print("* Ctrl-C to stop.", flush=True)
+        try:
+            self.bt.watch_read_loop(
+                [list(self.dev_words)],
+                self.publish,
+                frame=True,
+                key_code=True,
+                on_disconnect=self.on_disconnect,
+            )
+        except KeyboardInterrupt:
+            print("^C [Interrupt]")
+
+    def publish(self, dev, frame, onkeys) -> bool:
+        """Publish to the broker (and the shared memory)."""
+        self.broker.publish(dev, frame, onkeys)
+        if self.shm:
+            self.shm_onkeys[dev.path] = onkeys
+            self.shm.publish(self.merged_onkeys())
+        return True
+
+    def on_disconnect(self, dev) -> None:
+        """Device removed: release its keys in the shared memory."""
+        onkeys = self.shm_onkeys.pop(dev.path, None)
+        if onkeys is None:
+            return
+        self.shm_generation += onkeys.generation + 1
+        self.shm.publish(self.merged_onkeys())
+
+    def merged_onkeys(self) -> KeySnapshot:
+        """Held keys of all devices."""
+        if len(self.shm_onkeys) == 1 and not self.shm_generation:
+            return next(iter(self.shm_onkeys.values()))
+        bits = 0
+        generation = self.shm_generation
+        counts: dict[int, int] = {}
+        for onkeys in self.shm_onkeys.values():
+            bits |= onkeys.bits
+            generation += onkeys.generation
+            for code, n in onkeys.counts.items():
+                counts[code] = max(n, counts.get(code, 0))
+        return KeySnapshot(bits, generation, counts, True)
+
+    def end(self):
+        """End."""
+        self.__log.debug("")
+        self.broker.close()
+        if self.shm:
+            self.shm.close(unlink=True)
+        self.bt.close()
@@ -0,0 +1,175 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+
+import threading
+
+from .latency import LatencyStats
+from .pibtinput import PiBtInput
+from .record import ReplayDevice
+from .utils.mylogger import get_logger
+
+# 画面クリア (カーソルを左上に移動して消去)
+CLEAR = "\033[H\033[J"
+
+
+class CmdStats:
+    """Show live latency statistics."""
+
+    def __init__(
+        self,
+        dev_words,
+        interval=1.0,
+        replay_file="",
+        replay_speed=1.0,
+        debug=False,
+    ) -> None:
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("dev_words=%s, interval=%s", dev_words, interval)
+        self.__log.debug(
+            "replay_file=%a, replay_speed=%s", replay_file, replay_speed
+        )
+
+        self.dev_words = dev_words
+        self.interval = interval
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+
+        self.stats = LatencyStats()
+        self.dev = None
+
+        # 表示スレッドの停止用
+        self.stopped = threading.Event()
+
+        self.bt = PiBtInput(debug=self.__debug)
+
+    def cb_ev(self, key_name, key_state, onkeys):
+        """Event Callback."""
+        return True
+
+    def refresh(self):
+        """Refresh display every interval (thread).
+
+        イベントが来なくても表示を更新するため、read loop とは別に動かす。
+        """
+        self.stats.mark()
+        while not self.stopped.wait(self.interval):
+            self.show(clear=True, live=True)
+
+    def format(self, live=False) -> str:
+        """Format statistics.
+
+        Args:
+            live: 前回の表示からの区間(live)も表示する
+                (live でない値は、すべて開始からの累計)
+        """
+        s = self.stats.summary()
+        w = self.stats.window_summary() if live else None
+
+        lines = [
+            f"input_dev: {self.dev}",
+            (
+                f"cumulative: {s['elapsed']:.1f}s,"
+                f" events: {s['events']} ({s['ev_per_sec']:.1f}/s)"
+            ),
+        ]
+        if w:
+            lines.append(
+                f"live:       {w['elapsed']:.1f}s,"
+                f" events: {w['events']} ({w['ev_per_sec']:.1f}/s)"
+            )
+
+        lines += [
+            "",
+            (
+                f"{'latency(us)':<20}{'n':>8}{'p50':>10}{'p90':>10}"
+                f"{'p99':>10}{'max':>10}"
+            ),
+        ]
+        for name in ("input", "callback"):
+            if name == "input" and self.replay_file:
+                # 再生では、記録時のタイムスタンプとの差になってしまう
+                lines.append(f"{name:<20}{'-':>8}  (not measured in replay)")
+                continue
+            rows = [("cumulative", s)]
+            if w:
+                rows.insert(0, ("live", w))
+            for label, summary in rows:
+                h = summary[name]
+                lines.append(
+                    f"{f'{name} ({label})':<20}{h['n']:>8}"
+                    f"{h['p50_us']:>10.1f}{h['p90_us']:>10.1f}"
+                    f"{h['p99_us']:>10.1f}{h['max_us']:>10.1f}"
+                )
+
+        # 回数は累計, 頻度(/s)は live (最後の表示では累計の平均)
+        lines += [
+            "",
+            (
+                f"{'key':<16}{'events':>8}{'down':>8}{'hold':>8}"
+                f"{'ev/s':>8}{'hold/s':>8}"
+            ),
+        ]
+        live_keys = w["keys"] if w else s["keys"]
+        for key, k in s["keys"].items():
+            r = live_keys.get(key, {"ev_per_sec": 0.0, "hold_per_sec": 0.0})
+            lines.append(
+                f"{key:<16}{k['events']:>8}{k['down']:>8}{k['hold']:>8}"
+                f"{r['ev_per_sec']:>8.1f}{r['hold_per_sec']:>8.1f}"
+            )
+        lines.append(
+            "(events/down/hold: cumulative, ev/s hold/s: "
+            + ("live)" if w else "cumulative average)")
+        )
+
+        return "\n".join(lines)
+
+    def show(self, clear=False, live=False):
+        """Print statistics."""
+        print((CLEAR if clear else "") + self.format(live), flush=True)
+
+    def run(self, dev):
+        """Read loop with the refresh thread."""
+        self.dev = dev
+        th = threading.Thread(target=self.refresh, daemon=True)
+        th.start()
+        try:
+            self.bt.read_loop(dev, self.cb_ev, stats=self.stats)
+        finally:
+            self.stopped.set()
+            th.join()
+
+    def main(self):
+        """Main."""
+        self.__log.debug("")
+
+        if self.replay_file:
+            with ReplayDevice(
+                self.replay_file, self.replay_speed, debug=self.__debug
+            ) as dev:
+                self.run(dev)
+            self.show()
+            return
+
+        input_dev = self.bt.search_input_devs(self.dev_words)
+        if not input_dev:
+            self.__log.error("no such device: %s", list(self.dev_words))
+            return
+
+        if len(input_dev) > 1:
+            self.__log.error("ambiguous: %s", [d.name for d in input_dev])
+            return
+
+        print(f"input_dev: {input_dev[0]}")
+        print("* Ctrl-C to stop.")
+        try:
+            self.run(input_dev[0])
+        except KeyboardInterrupt:
+            print("^C [Interrupt]")
+        self.show()
+
+    def end(self):
+        """End."""
+        self.__log.debug("")
+        self.bt.close()
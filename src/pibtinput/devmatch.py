@@ -0,0 +1,211 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Device matcher (indexed).
+
+`search_input_devs()` のキーワード。すべてに一致するデバイスを返す。
+
+  8BitDo                   名前に含まれる (従来どおり)
+  e4:17:d8:12:34:56        uniq (Bluetooth MAC) が一致
+  2dc8:9020                vendor:product が一致
+  name=8BitDo Micro        名前が一致 (フィールド=値)
+  name=8BitDo*             glob
+  phys~^usb-               正規表現 (search)
+  cap=KEY_A                キー(ボタン, 軸)を持っている
+
+フィールド: name, id (vendor:product), vendor, product, phys, uniq, path, cap
+
+完全一致(MAC, vendor:product, フィールド=値)は、
+デバイスの索引を一度引くだけで候補を絞り込む。
+"""
+
+import fnmatch
+import functools
+import re
+
+import evdev
+
+from .keycodes import KEY_CODES
+
+FIELDS = ("name", "id", "vendor", "product", "phys", "uniq", "path", "cap")
+
+RE_MAC = re.compile(r"[0-9a-f]{2}(:[0-9a-f]{2}){5}", re.IGNORECASE)
+RE_ID = re.compile(r"[0-9a-f]{4}:[0-9a-f]{4}", re.IGNORECASE)
+RE_FIELD = re.compile(r"([a-z]+)([=~])(.*)", re.DOTALL)
+GLOB_CHARS = frozenset("*?[")
+
+# 大文字小文字を区別しないフィールド
+LOWER_FIELDS = frozenset(("id", "vendor", "product", "uniq"))
+
+
+def dev_fields(dev) -> dict[str, str]:
+    """Indexed fields of dev."""
+    info = getattr(dev, "info", None)
+    vendor = f"{info.vendor:04x}" if info else ""
+    product = f"{info.product:04x}" if info else ""
+    return {
+        "name": dev.name,
+        "id": f"{vendor}:{product}" if info else "",
+        "vendor": vendor,
+        "product": product,
+        "phys": getattr(dev, "phys", "") or "",
+        "uniq": (getattr(dev, "uniq", "") or "").lower(),
+        "path": dev.path,
+    }
+
+
+class DevQuery:
+    """Compiled keywords."""
+
+    __slots__ = ("keys", "preds", "words")
+
+    def __init__(self, words) -> None:
+        """Constractor.
+
+        Raises:
+            ValueError: 不正な正規表現, 不明なキー
+        """
+        self.words = tuple(words)
+
+        # 索引を引く (field, value)
+        self.keys: list[tuple[str, str]] = []
+
+        # 残りの条件 (field, fn(value))  cap の場合は fn(codes)
+        self.preds: list[tuple[str, object]] = []
+
+        for w in self.words:
+            self._compile(w)
+
+    def _compile(self, word: str) -> None:
+        m = RE_FIELD.fullmatch(word)
+        if m is None or m[1] not in FIELDS:
+            if RE_MAC.fullmatch(word):
+                self.keys.append(("uniq", word.lower()))
+            elif RE_ID.fullmatch(word):
+                self.keys.append(("id", word.lower()))
+            else:
+                self.preds.append(
+                    ("name", functools.partial(_contains, word))
+                )
+            return
+
+        field, op, value = m.groups()
+        if field in LOWER_FIELDS:
+            value = value.lower()
+
+        if field == "cap":
+            code = KEY_CODES.get(value)
+            if code is None and value.startswith("ABS_"):
+                abs_code = getattr(evdev.ecodes, value, None)
+                if isinstance(abs_code, int):
+                    code = ("abs", abs_code)
+            if op != "=" or code is None:
+                raise ValueError(f"invalid capability: {word!r}")
+            self.preds.append(("cap", functools.partial(_has, code)))
+            return
+
+        if op == "~":
+            try:
+                self.preds.append((field, re.compile(value).search))
+            except re.error as _e:
+                raise ValueError(f"{word!r}: {_e}") from None
+            return
+
+        if GLOB_CHARS & set(value):
+            match = re.compile(fnmatch.translate(value)).match
+            self.preds.append((field, match))
+            return
+
+        self.keys.append((field, value))
+
+
+def _contains(word: str, value: str) -> bool:
+    return word in value
+
+
+def _has(code, codes) -> bool:
+    return code in codes
+
+
+@functools.lru_cache(maxsize=64)
+def compile_query(words: tuple[str, ...]) -> DevQuery:
+    """Compile keywords (cached)."""
+    return DevQuery(words)
+
+
+class DevIndex:
+    """Index of devices by name, id, vendor, product, phys, uniq, path."""
+
+    def __init__(self, devs, capabilities) -> None:
+        """Constractor.
+
+        Args:
+            devs: デバイス
+            capabilities: capabilities(dev) -> dict (cap の条件用)
+        """
+        self.devs = sorted(devs, key=lambda d: d.path)
+        self.capabilities = capabilities
+
+        self.by_path = {d.path: d for d in self.devs}
+        self.fields: dict[str, dict[str, str]] = {}
+        self.index: dict[tuple[str, str], list] = {}
+        for d in self.devs:
+            fields = self.fields[d.path] = dev_fields(d)
+            for key in fields.items():
+                self.index.setdefault(key, []).append(d)
+
+        # {path: {キーコード, ("abs", 軸コード), ...}}  (cap の条件用)
+        self.codes: dict[str, frozenset] = {}
+
+    def dev_codes(self, dev) -> frozenset:
+        """Key and axis codes of dev."""
+        codes = self.codes.get(dev.path)
+        if codes is None:
+            caps = self.capabilities(dev)
+            codes = set(caps.get(evdev.ecodes.EV_KEY, ()))
+            for a in caps.get(evdev.ecodes.EV_ABS, ()):
+                code = a[0] if isinstance(a, tuple) else a
+                codes.add(("abs", code))
+            codes = self.codes[dev.path] = frozenset(codes)
+        return codes
+
+    def match(self, path: str, query: DevQuery) -> bool:
+        """Does the device of path match all keywords of query."""
+        fields = self.fields.get(path)
+        if fields is None:
+            return False
+        for field, value in query.keys:
+            if fields[field] != value:
+                return False
+        if not query.preds:
+            return True
+        return self._match_preds(self.by_path[path], fields, query.preds)
+
+    def _match_preds(self, dev, fields, preds) -> bool:
+        for field, fn in preds:
+            value = self.dev_codes(dev) if field == "cap" else fields[field]
+            if not fn(value):
+                return False
+        return True
+
+    def search(self, query: DevQuery) -> list:
+        """Devices matching all keywords of query."""
+        cands = None
+        for key in query.keys:
+            found = self.index.get(key, [])
+            cands = (
+                found if cands is None else [d for d in cands if d in found]
+            )
+            if not cands:
+                return []
+        if cands is None:
+            cands = self.devs
+
+        if not query.preds:
+            return list(cands)
+
+        preds = query.preds
+        fields = self.fields
+        return [
+            d for d in cands if self._match_preds(d, fields[d.path], preds)
+        ]
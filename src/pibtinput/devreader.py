@@ -0,0 +1,336 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Per-device event reader."""
+
+import functools
+import inspect
+
+import evdev
+
+from .keycodes import KEY_MAX, KEY_NAMES
+from .keystate import KeyState, bit_codes
+from .latency import LatencyStats, device_clock
+from .utils.mylogger import get_logger
+
+EV_KEY = evdev.ecodes.EV_KEY
+EV_SYN = evdev.ecodes.EV_SYN
+EV_ABS = evdev.ecodes.EV_ABS
+SYN_REPORT = evdev.ecodes.SYN_REPORT
+SYN_DROPPED = evdev.ecodes.SYN_DROPPED
+
+
+class DevReader:
+    """Per-device event reader.
+
+    デバイス一つ分の状態(onkeys: KeyState, フレームバッファ)を持ち、
+    入力イベントを一つずつ受け取って、コールバックを呼び出す。
+    `PiBtInput` の各 read loop から使われる。
+
+    frame=False:
+        EV_KEY ごとに呼び出す。
+        cb_key_event([dev,] key_name, key_state, onkeys)
+
+    frame=True:
+        EV_SYN/SYN_REPORT まで溜めて、一度に呼び出す。
+        cb_key_event([dev,] frame, onkeys)
+        frame: [(key_name, key_state), ...]
+        onkeys: フレーム適用後の onkeys のスナップショット (KeySnapshot)
+                (sec, usec に SYN_REPORT のタイムスタンプ)
+
+    key_code=True の場合は、key_name の代わりにキーコード(int)を使う。
+
+    stats (LatencyStats) を指定すると、コールバックを呼ぶたびに
+    入力遅延とコールバックの実行時間を記録する。
+
+    axes (Axes) を指定すると、EV_ABS を SYN_REPORT ごとにまとめて処理し、
+    仮想キーを実際のキーと同じようにコールバックに渡す。
+
+    SYN_DROPPED の後は、次の SYN_REPORT までのイベントを捨て、
+    デバイスから読み直したキーの状態(active_keys)との差分を
+    合成したイベントとしてコールバックに渡す。
+    """
+
+    def __init__(
+        self,
+        bt,
+        dev,
+        cb_key_event,
+        onkeys: KeyState | None = None,
+        frame: bool = False,
+        key_code: bool = False,
+        with_dev: bool = True,
+        stats: LatencyStats | None = None,
+        axes=None,
+        debug=False,
+    ) -> None:
+        """Constractor.
+
+        Args:
+            bt (PiBtInput):
+            dev (InputDevice): 入力デバイス
+            cb_key_event: コールバック
+            onkeys: 押されているキー (None: 新規に作る)
+            frame: フレームモード
+            key_code: キー名の代わりにキーコード(int)を使う
+            with_dev: コールバックの第1引数に dev を渡す
+            stats: 遅延統計 (None: 記録しない)
+            axes (Axes): 軸の設定 (None: EV_ABS は無視する)
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("dev=%s, frame=%s", dev, frame)
+
+        self.bt = bt
+        self.dev = dev
+        self.cb_key_event = cb_key_event
+        self.onkeys = KeyState() if onkeys is None else onkeys
+        self.onkeys.key_code = key_code
+        self.frame = frame
+        self.key_code = key_code
+        self.with_dev = with_dev
+
+        # キーコード -> コールバックに渡すキー
+        # (key_code=True の場合は、range で恒等変換)
+        self.keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+
+        # フレームモード用
+        self.frame_buf: list[tuple] = []
+
+        # SYN_DROPPED から次の SYN_REPORT まで True
+        self.dropped = False
+
+        # 毎回の分岐を避けるため、dev を束縛しておく
+        self.call = cb_key_event
+        if with_dev:
+            self.call = functools.partial(cb_key_event, dev)
+
+        self.feed = self.feed_frame if frame else self.feed_key
+
+        # 軸を使う場合だけ、feed() を差し替える
+        #   仮想キー(vbits)は、SYN_DROPPED の後の読み直しでは対象外
+        self.axes = None
+        self.vbits = 0
+        if axes is not None:
+            self.axes = axes.new_state(dev)
+            for codes in axes.keys.values():
+                for code in codes:
+                    self.vbits |= 1 << code
+            self.feed_keys = self.feed
+            self.feed = self.feed_axes
+
+        # 統計を取る場合だけ、feed() を差し替える
+        self.stats = stats
+        if stats is not None:
+            self.clock = device_clock(dev)
+            # 記録の再生などは、タイムスタンプが今の時刻ではない
+            self.live = getattr(dev, "live", True)
+            self.feed_inner = self.feed
+            self.feed = self.feed_stats
+
+    def feed_key(self, ev):
+        """Feed one event (key mode).
+
+        Returns:
+            コールバックの戻り値 (イベントが無視された場合は True)
+            コルーチン関数の場合は awaitable
+        """
+        code, key_state = self.bt.get_key_code(ev)
+        if code is None:
+            if ev.type == EV_SYN:
+                return self.feed_syn(ev)
+            return True
+
+        if self.dropped:
+            return True
+
+        self.onkeys.update(code, key_state)
+        return self.call(self.keys[code], key_state, self.onkeys)
+
+    def feed_syn(self, ev):
+        """EV_SYN (key mode)."""
+        if ev.code == SYN_DROPPED:
+            self.__log.warning("SYN_DROPPED: %s", self.dev)
+            self.dropped = True
+            return True
+
+        if ev.code != SYN_REPORT or not self.dropped:
+            return True
+
+        self.dropped = False
+        events = self.resync()
+        return self.call_vkeys(events, 0) if events else True
+
+    def resync(self) -> list[tuple[int, int]]:
+        """Key events to resync onkeys with the device (after SYN_DROPPED).
+
+        Returns:
+            [(code, key_state), ...] 放されたキー, 押されたキーの順
+            (デバイスから読めない場合は [])
+        """
+        try:
+            active = self.dev.active_keys()
+        except (AttributeError, OSError) as _e:
+            self.__log.debug("%s: %s", self.dev, _e)
+            return []
+
+        bits = 0
+        for code in active:
+            bits |= 1 << code
+        held = self.onkeys.bits & ~self.vbits
+        bits &= ~self.vbits
+
+        events = [(c, 0) for c in bit_codes(held & ~bits)]
+        events += [(c, 1) for c in bit_codes(bits & ~held)]
+        self.__log.debug("%s: resync %s", self.dev, events)
+        return events
+
+    def feed_frame(self, ev):
+        """Feed one event (frame mode).
+
+        Returns:
+            コールバックの戻り値 (呼び出さなかった場合は True)
+            コルーチン関数の場合は awaitable
+        """
+        if ev.type == evdev.ecodes.EV_SYN:
+            if ev.code == evdev.ecodes.SYN_DROPPED:
+                # カーネルのバッファが溢れた:
+                # 次の SYN_REPORT までのイベントは破棄する
+                self.__log.warning("SYN_DROPPED: %s", self.dev)
+                self.dropped = True
+                self.frame_buf.clear()
+                return True
+
+            if ev.code != evdev.ecodes.SYN_REPORT:
+                return True
+
+            if self.dropped:
+                # 捨てた間の変化は、読み直した状態との差分で補う
+                #   (軸の仮想キーは、frame_buf に入っている)
+                self.dropped = False
+                self.frame_buf[:0] = self.resync()
+
+            if not self.frame_buf:
+                return True
+
+            keys = self.keys
+            update = self.onkeys.update
+            frame = []
+            for code, key_state in self.frame_buf:
+                update(code, key_state)
+                frame.append((keys[code], key_state))
+            self.frame_buf.clear()
+
+            return self.call(frame, self.onkeys.snapshot(ev.sec, ev.usec))
+
+        if self.dropped:
+            return True
+
+        code, key_state = self.bt.get_key_code(ev)
+        if code is not None:
+            self.frame_buf.append((code, key_state))
+        return True
+
+    def feed_axes(self, ev):
+        """Feed one event (with axes).
+
+        EV_ABS は溜めておき、SYN_REPORT で一度だけ軸の状態を更新する。
+        仮想キーは、frame=True ではそのフレームに加え、
+        frame=False では一つずつコールバックを呼ぶ。
+        """
+        etype = ev.type
+        if etype == EV_ABS:
+            self.axes.feed(ev.code, ev.value)
+            return True
+
+        if etype != EV_SYN:
+            return self.feed_keys(ev)
+
+        axes = self.axes
+        if ev.code == SYN_DROPPED:
+            axes.drop()
+            return self.feed_keys(ev)
+
+        if ev.code != SYN_REPORT:
+            return True
+
+        # SYN_DROPPED の後のキーの読み直し (frame=False)
+        resync = []
+        if self.dropped and not self.frame:
+            self.dropped = False
+            resync = self.resync()
+
+        changed = axes.commit()
+        if changed and axes.cb_axis and axes.cb_axis(axes, changed) is False:
+            return False
+
+        vkeys = axes.vkeys
+        if self.frame:
+            # SYN_DROPPED の後: 溜めたキーは捨てられているので、
+            # 読み直したキーと軸の仮想キーのフレームになる
+            self.frame_buf += vkeys
+            return self.feed_keys(ev)
+
+        if resync:
+            vkeys = resync + vkeys
+        return self.call_vkeys(vkeys, 0) if vkeys else True
+
+    def call_vkeys(self, vkeys, i):
+        """Call the callback for synthetic events vkeys[i:] (frame=False).
+
+        軸の仮想キーと、SYN_DROPPED の後の読み直しのイベント。
+
+        コルーチン関数の場合は、順に await する awaitable を返す。
+        """
+        keys = self.keys
+        onkeys = self.onkeys
+        for j in range(i, len(vkeys)):
+            code, key_state = vkeys[j]
+            onkeys.update(code, key_state)
+            ret = self.call(keys[code], key_state, onkeys)
+            if inspect.isawaitable(ret):
+                return self._await_vkeys(ret, list(vkeys), j + 1)
+            if not ret:
+                return ret
+        return True
+
+    async def _await_vkeys(self, ret, vkeys, i):
+        if not await ret:
+            return False
+        ret = self.call_vkeys(vkeys, i)
+        if inspect.isawaitable(ret):
+            ret = await ret
+        return ret
+
+    def feed_stats(self, ev):
+        """Feed one event and record latency (stats).
+
+        コールバックを呼ぶイベント
+        (frame=False: EV_KEY, frame=True: 空でない SYN_REPORT) について、
+        ev のタイムスタンプからの遅延と、feed の実行時間を記録する。
+        """
+        stats = self.stats
+        etype = ev.type
+        if etype == EV_KEY:
+            stats.add_key(ev.code, ev.value)
+            if self.frame:
+                return self.feed_inner(ev)
+
+        elif not (
+            self.frame
+            and etype == EV_SYN
+            and ev.code == SYN_REPORT
+            and self.frame_buf
+            and not self.dropped
+        ):
+            return self.feed_inner(ev)
+
+        clock = self.clock
+        t0 = clock()
+        ret = self.feed_inner(ev)
+        t1 = clock()
+
+        if self.live:
+            stats.input.add(t0 - (ev.sec * 1_000_000_000 + ev.usec * 1000))
+        stats.callback.add(t1 - t0)
+        return ret
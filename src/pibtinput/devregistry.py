@@ -0,0 +1,286 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Cached input device registry."""
+
+import os
+import select
+import time
+
+import evdev
+
+from .utils.inotify import Inotify
+from .utils.mylogger import errmsg, get_logger
+
+
+class DevRegistry:
+    """Cached input device registry.
+
+    開いた `InputDevice` と `capabilities()` の結果をキャッシュする。
+    `/dev/input` を inotify で監視し、変更があったエントリだけを
+    開き直す/閉じる。
+    inotify が使えない場合は、呼ばれるたびに全体を走査する
+    (開いたままのデバイスは再利用する)。
+
+    sysfs (SysfsInput) を指定すると、デバイスは必要になるまで開かない。
+    `describe()` は sysfs から読んだ情報を返し、
+    `get()` で選んだデバイスだけを開く。
+    """
+
+    INPUT_DIR = "/dev/input"
+    DEV_PREFIX = "event"
+
+    # inotify が使えない場合の wait() の間隔
+    POLL_INTERVAL = 1.0
+
+    WATCH_MASK = (
+        Inotify.IN_CREATE
+        | Inotify.IN_DELETE
+        | Inotify.IN_ATTRIB
+        | Inotify.IN_MOVED_FROM
+        | Inotify.IN_MOVED_TO
+    )
+    MASK_REMOVED = Inotify.IN_DELETE | Inotify.IN_MOVED_FROM
+    # 監視対象のディレクトリ自体が無くなった
+    MASK_UNWATCHED = (
+        Inotify.IN_IGNORED | Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF
+    )
+
+    def __init__(
+        self,
+        input_dir: str = INPUT_DIR,
+        open_dev=None,
+        sysfs=None,
+        debug=False,
+    ) -> None:
+        """Constractor.
+
+        Args:
+            input_dir: 監視するディレクトリ
+            open_dev: デバイスを開く関数 (default: evdev.InputDevice)
+            sysfs (SysfsInput): デバイスの情報を sysfs から読む
+                (None: すべてのデバイスを開く)
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("input_dir=%a", input_dir)
+
+        self.input_dir = input_dir
+        self.open_dev = open_dev or evdev.InputDevice
+
+        self.devs: dict[str, evdev.InputDevice] = {}  # {path: dev}
+        self.caps: dict[str, dict] = {}  # {path: capabilities}
+
+        # sysfs を使う場合: 開かずに、パスと情報だけを持つ
+        self.sysfs = sysfs
+        self.paths: set[str] = set()
+        self.infos: dict = {}  # {path: SysfsDev}
+
+        # 最初の list_devs() で全体を走査する
+        self.valid = False
+
+        # 最後に変更を検出した時刻 (time.monotonic())
+        self.t_changed = time.monotonic()
+
+        # デバイスが増える/減るたびに増える (索引などのキャッシュ用)
+        self.generation = 0
+
+        self.inotify: Inotify | None = None
+        try:
+            self.inotify = Inotify(debug=self.__debug)
+            self.inotify.add_watch(self.input_dir, self.WATCH_MASK)
+        except OSError as _e:
+            self.__log.debug("no inotify: %s", errmsg(_e))
+            if self.inotify:
+                self.inotify.close()
+            self.inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self) -> int:
+        """inotify fd (-1: inotify なし)."""
+        return self.inotify.fileno() if self.inotify else -1
+
+    def open(self, path: str) -> None:
+        """Open device and add to cache."""
+        if path in self.devs:
+            return
+
+        try:
+            self.devs[path] = self.open_dev(path)
+            self.generation += 1
+            self.__log.debug("open: %s", path)
+        except OSError as _e:
+            # 作成直後はパーミッションが未設定のことがある
+            # (IN_ATTRIB で再試行する)
+            self.__log.debug("%s: %s", path, errmsg(_e))
+
+    def drop(self, path: str) -> None:
+        """Close device and remove from cache."""
+        self.caps.pop(path, None)
+        dev = self.devs.pop(path, None)
+        if dev is None:
+            return
+        self.generation += 1
+
+        self.__log.debug("close: %s", path)
+        try:
+            dev.close()
+        except OSError as _e:
+            self.__log.debug("%s: %s", path, errmsg(_e))
+
+    def add(self, path: str) -> None:
+        """Device file appeared."""
+        if self.sysfs is None:
+            self.open(path)
+            return
+        if path not in self.paths:
+            self.paths.add(path)
+            self.generation += 1
+
+    def remove(self, path: str) -> None:
+        """Device file removed."""
+        self.drop(path)
+        if path in self.paths:
+            self.paths.discard(path)
+            self.infos.pop(path, None)
+            self.generation += 1
+
+    def rescan(self) -> None:
+        """Scan all devices."""
+        try:
+            names = os.listdir(self.input_dir)
+        except OSError as _e:
+            self.__log.debug("%s: %s", self.input_dir, errmsg(_e))
+            names = []
+
+        paths = {
+            os.path.join(self.input_dir, n)
+            for n in names
+            if n.startswith(self.DEV_PREFIX)
+        }
+        for path in (set(self.devs) | self.paths) - paths:
+            self.remove(path)
+        for path in sorted(paths):
+            self.add(path)
+
+        self.valid = True
+
+    def update(self) -> bool:
+        """Apply changes of input_dir.
+
+        Returns:
+            changed (bool)
+        """
+        if self.inotify is None or not self.valid:
+            self.rescan()
+            self.t_changed = time.monotonic()
+            return True
+
+        events = self.inotify.read()
+        if not events:
+            return False
+
+        self.t_changed = time.monotonic()
+
+        for _, mask, _, name in events:
+            if mask & self.MASK_UNWATCHED:
+                # これ以降は、毎回全体を走査する
+                self.__log.warning("%s: unwatched", self.input_dir)
+                self.inotify.close()
+                self.inotify = None
+                self.rescan()
+                return True
+
+            if mask & Inotify.IN_Q_OVERFLOW:
+                self.__log.debug("overflow: rescan")
+                self.rescan()
+                continue
+
+            if not name.startswith(self.DEV_PREFIX):
+                continue
+
+            path = os.path.join(self.input_dir, name)
+            if mask & self.MASK_REMOVED:
+                self.remove(path)
+            else:
+                self.add(path)
+
+        return True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for changes of input_dir.
+
+        inotify が使えない場合は、POLL_INTERVAL 秒待つだけ。
+
+        Returns:
+            True: 変更があった(かもしれない)
+            False: タイムアウト
+        """
+        if self.inotify is None:
+            if timeout is None or timeout > self.POLL_INTERVAL:
+                timeout = self.POLL_INTERVAL
+            time.sleep(timeout)
+            return True
+
+        r, _, _ = select.select([self.inotify], [], [], timeout)
+        return bool(r)
+
+    def list_devs(self) -> list:
+        """List input devices (cached, opens all devices)."""
+        self.update()
+        for path in sorted(self.paths):
+            self.open(path)
+        return list(self.devs.values())
+
+    def describe(self) -> list:
+        """List device descriptions without opening (sysfs).
+
+        Returns:
+            SysfsDev のリスト (sysfs を使わない場合は、開いたデバイス)
+        """
+        self.update()
+        if self.sysfs is None:
+            return list(self.devs.values())
+
+        infos = []
+        for path in sorted(self.paths):
+            info = self.infos.get(path)
+            if info is None:
+                info = self.sysfs.describe(path)
+                if info is None:
+                    continue
+                self.infos[path] = info
+            infos.append(info)
+        return infos
+
+    def get(self, path: str):
+        """Opened device of path (None: cannot open)."""
+        self.open(path)
+        return self.devs.get(path)
+
+    def capabilities(self, dev) -> dict:
+        """Capabilities of dev (cached)."""
+        caps = self.caps.get(dev.path)
+        if caps is None:
+            caps = dev.capabilities()
+            if self.devs.get(dev.path) is dev:
+                self.caps[dev.path] = caps
+        return caps
+
+    def close(self) -> None:
+        """Close all devices and inotify."""
+        self.__log.debug("")
+        for path in list(self.devs):
+            self.drop(path)
+        self.paths.clear()
+        self.infos.clear()
+        self.valid = False
+
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
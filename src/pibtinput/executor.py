@@ -0,0 +1,276 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Action executor with pre-spawned shell workers.
+
+キーイベントごとに、デーモン(Python)から fork + exec すると、
+Pi Zero では数十ミリ秒かかる。
+そこで、あらかじめ起動しておいた `/bin/sh` (ワーカー)に
+コマンドを送って実行させる。ワーカー内の fork は小さな sh なので速い。
+
+  executor = ActionExecutor(n_workers=2)
+  executor.submit(Action("echo hello", "coalesce"), {"KEY": "KEY_A"})
+  ...
+  print(executor.summary())
+  executor.close()
+
+submit() はキューに入れるだけなので、read loop をブロックしない。
+同時に実行されるのは、最大 n_workers 個まで。
+
+アクションごとのキューイングポリシー:
+
+  queue:    すべて順に実行する
+  drop:     同じアクションが実行中または待ちなら、新しい要求を捨てる
+  coalesce: 同じアクションが待ち(未実行)なら、一つにまとめる
+
+コマンドの標準出力は、デーモンの標準エラー出力に出る。
+"""
+
+import collections
+import shlex
+import subprocess
+import threading
+import time
+
+from .latency import LatencyHist
+from .utils.mylogger import errmsg, get_logger
+
+POLICIES = ("queue", "drop", "coalesce")
+
+# ワーカー: 1行読んで実行し、開始(S)と終了(D 終了コード)を fd 3 で知らせる
+# (fd 3 はコマンドには渡さない)
+WORKER_SCRIPT = """\
+exec 3>&1 1>&2
+while IFS= read -r __pibt_cmd; do
+  echo S >&3
+  ( eval "$__pibt_cmd" ) </dev/null 3>&-
+  echo "D $?" >&3
+done
+"""
+
+
+class Action:
+    """Command and its queueing policy."""
+
+    __slots__ = ("command", "policy", "queued", "running")
+
+    def __init__(self, command: str, policy: str = "queue") -> None:
+        """Constractor.
+
+        Raises:
+            ValueError: 不明なポリシー、または、複数行のコマンド
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"invalid policy: {policy!r}")
+        if "\n" in command:
+            raise ValueError(f"multi-line command: {command!r}")
+
+        self.command = command
+        self.policy = policy
+
+        # 待ち/実行中の数 (ActionExecutor が更新する)
+        self.queued = 0
+        self.running = 0
+
+    def __repr__(self) -> str:
+        return f"Action({self.command!r}, {self.policy!r})"
+
+
+class ActionExecutor:
+    """Run actions on pre-spawned shell workers."""
+
+    def __init__(self, n_workers: int = 2, dry_run=False, debug=False):
+        """Constractor.
+
+        Args:
+            n_workers: ワーカー数 (同時実行数の上限)
+            dry_run: 実行せずに表示だけする
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("n_workers=%s, dry_run=%s", n_workers, dry_run)
+
+        if n_workers < 1:
+            raise ValueError(f"invalid n_workers: {n_workers}")
+
+        self.n_workers = n_workers
+        self.dry_run = dry_run
+
+        self.cond = threading.Condition()
+        self.pending: collections.deque = collections.deque()
+        self.closing = False
+        self.in_flight = 0  # 受け付けて、まだ終わっていない数
+
+        # 統計
+        self.launch = LatencyHist()  # submit() から開始まで (ns)
+        self.counts = collections.Counter()
+
+        self.threads = []
+        if dry_run:
+            return
+        for i in range(n_workers):
+            th = threading.Thread(
+                target=self._worker, name=f"pibt-worker{i}", daemon=True
+            )
+            th.start()
+            self.threads.append(th)
+
+    def submit(self, action: Action, env: dict[str, str] | None = None):
+        """Submit action (non-blocking).
+
+        Returns:
+            True: 受け付けた, False: ポリシーにより捨てた/まとめた
+        """
+        env = env or {}
+        if self.dry_run:
+            print(
+                f"{env.get('PIBTINPUT_KEY')}:{env.get('PIBTINPUT_STATE')}"
+                f"  {action.command}",
+                flush=True,
+            )
+            return True
+
+        with self.cond:
+            self.counts["submitted"] += 1
+            if action.policy == "drop" and (action.queued or action.running):
+                self.counts["dropped"] += 1
+                return False
+            if action.policy == "coalesce" and action.queued:
+                self.counts["coalesced"] += 1
+                return False
+
+            action.queued += 1
+            self.in_flight += 1
+            self.pending.append((action, env, time.monotonic_ns()))
+            self.cond.notify()
+        return True
+
+    def _spawn(self) -> subprocess.Popen:
+        """Start one shell worker."""
+        return subprocess.Popen(
+            ["/bin/sh", "-c", WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+        )
+
+    def _worker(self) -> None:
+        """Worker thread (one shell worker)."""
+        proc = None
+        try:
+            proc = self._spawn()
+        except OSError as _e:
+            self.__log.error(errmsg(_e))
+
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing:
+                    self.cond.wait()
+                if self.closing:
+                    self._cancel_pending()
+                    break
+                action, env, t_submit = self.pending.popleft()
+                action.queued -= 1
+                action.running += 1
+
+            try:
+                if proc is None or proc.poll() is not None:
+                    proc = self._spawn()
+                rc = self._run(proc, action.command, env, t_submit)
+            except (OSError, ValueError) as _e:
+                self.__log.error("%s: %s", action.command, errmsg(_e))
+                rc = -1
+                if proc is not None:
+                    self._stop(proc)
+                proc = None
+
+            with self.cond:
+                action.running -= 1
+                self.in_flight -= 1
+                self.counts["done" if rc == 0 else "failed"] += 1
+                self.cond.notify_all()
+
+        if proc is not None:
+            self._stop(proc)
+
+    def _run(self, proc, command: str, env: dict, t_submit: int) -> int:
+        """Send command to the worker and wait for it."""
+        exports = "".join(
+            f"export {k}={shlex.quote(v)}; " for k, v in env.items()
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        proc.stdin.write(exports + command + "\n")
+        proc.stdin.flush()
+
+        if proc.stdout.readline() != "S\n":
+            raise OSError(f"worker {proc.pid} died")
+        with self.cond:
+            self.launch.add(time.monotonic_ns() - t_submit)
+
+        line = proc.stdout.readline()
+        if not line.startswith("D "):
+            raise OSError(f"worker {proc.pid} died")
+
+        rc = int(line[2:])
+        if rc != 0:
+            self.__log.warning("%s: exit %s", command, rc)
+        return rc
+
+    def _cancel_pending(self) -> None:
+        """Discard pending actions (with self.cond held)."""
+        while self.pending:
+            action, _, _ = self.pending.popleft()
+            action.queued -= 1
+            self.in_flight -= 1
+            self.counts["cancelled"] += 1
+        self.cond.notify_all()
+
+    @staticmethod
+    def _stop(proc) -> None:
+        """Stop shell worker."""
+        try:
+            if proc.stdin:
+                proc.stdin.close()
+            proc.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Wait until all accepted actions are finished.
+
+        Returns:
+            False: タイムアウト
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.in_flight, timeout)
+
+    def summary(self) -> dict:
+        """Launch latency and counters."""
+        with self.cond:
+            return {
+                "workers": self.n_workers,
+                "launch": {
+                    "n": self.launch.n,
+                    "p50_ms": self.launch.percentile(50) / 1e6,
+                    "p99_ms": self.launch.percentile(99) / 1e6,
+                    "max_ms": self.launch.max / 1e6,
+                },
+                **{k: self.counts[k] for k in sorted(self.counts)},
+            }
+
+    def close(self) -> None:
+        """Stop all workers.
+
+        実行中のコマンドは終わるまで待ち(kill しない)、
+        待ちのアクションは捨てる (counts["cancelled"])。
+        """
+        self.__log.debug("")
+        with self.cond:
+            self.closing = True
+            self._cancel_pending()
+        for th in self.threads:
+            th.join(timeout=5)
+        self.threads = []
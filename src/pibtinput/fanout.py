@@ -0,0 +1,187 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Exclusive grab and in-process fan-out.
+
+一つのデバイスを一度だけ読み込み・デコードして、
+複数の購読者(subscriber)に配る。
+
+  fo = bt.fanout(dev)                       # grab=True: EVIOCGRAB
+  fo.subscribe(cb_ui)                       # 全キー
+  fo.subscribe(cb_ctrl, keys=["KEY_A", "KEY_B"], states=[1])
+  fo.run()
+
+grab すると、コンソールなど他のプロセスにはキー入力が届かない。
+
+購読者のコールバックは `read_loop()` と同じ cb(key_name, key_state, onkeys)。
+onkeys は全購読者で共有する(読むだけにすること)。
+False を返した(または例外を出した)購読者だけが外され、
+他の購読者は影響を受けない。購読者がいなくなると run() は終了する。
+
+配る先は、キーコード -> 購読者のタプル の dict で引くので、
+関係の無い購読者のフィルターは評価しない。
+"""
+
+import errno
+import threading
+
+from .keycodes import KEY_MAX, KEY_NAMES
+from .keystate import KeyState
+from .stream import key_forms
+from .utils.mylogger import errmsg, get_logger
+
+
+class Subscriber:
+    """Fan-out subscriber."""
+
+    __slots__ = ("cb", "codes", "n_calls", "states")
+
+    def __init__(self, cb, codes=None, states=None) -> None:
+        self.cb = cb
+        self.codes = codes  # frozenset[int] | None (全キー)
+        self.states = states  # frozenset[int] | None (全状態)
+        self.n_calls = 0
+
+    def __repr__(self) -> str:
+        return f"Subscriber({self.cb!r})"
+
+
+class FanOut:
+    """Read one device once and fan out to subscribers."""
+
+    def __init__(self, bt, dev, grab=True, key_code=False, debug=False):
+        """Constractor.
+
+        Args:
+            bt (PiBtInput):
+            dev (InputDevice): 入力デバイス
+            grab: 読み込み中は、デバイスを占有する (EVIOCGRAB)
+            key_code: キー名の代わりにキーコード(int)を渡す
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("dev=%s, grab=%s", dev, grab)
+
+        self.bt = bt
+        self.dev = dev
+        self.grab = grab
+        self.onkeys = KeyState(key_code)
+        self.keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+
+        # 購読者の変更は、タプルを作り直して差し替える (読み込み中も可)
+        self.lock = threading.Lock()
+        self.subs: tuple[Subscriber, ...] = ()
+        # (キーコード -> 購読者, 全キーの購読者): 一度に差し替える
+        self.table: tuple[dict, tuple] = ({}, ())
+
+    def subscribe(self, cb, keys=None, states=None) -> Subscriber:
+        """Add subscriber.
+
+        Args:
+            cb: cb(key_name, key_state, onkeys)
+            keys: キー名またはキーコードのリスト (None: 全キー)
+            states: キーの状態のリスト (None: 全状態)
+
+        Raises:
+            ValueError: 不明なキー
+        """
+        codes = None
+        if keys is not None:
+            codes = frozenset(
+                k for k in key_forms(keys) if isinstance(k, int)
+            )
+        sub = Subscriber(
+            cb, codes, None if states is None else frozenset(states)
+        )
+        with self.lock:
+            self._rebuild((*self.subs, sub))
+        self.__log.debug("%s: keys=%s, states=%s", sub, keys, states)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        """Remove subscriber."""
+        self.__log.debug("%s", sub)
+        with self.lock:
+            self._rebuild(tuple(s for s in self.subs if s is not sub))
+
+    def _rebuild(self, subs: tuple[Subscriber, ...]) -> None:
+        """Rebuild dispatch tables (subscription order is kept)."""
+        codes = {c for s in subs if s.codes for c in s.codes}
+        by_code = {
+            c: tuple(s for s in subs if s.codes is None or c in s.codes)
+            for c in codes
+        }
+        any_subs = tuple(s for s in subs if s.codes is None)
+        self.table = (by_code, any_subs)
+        self.subs = subs
+
+    def feed(self, ev) -> bool:
+        """Decode one event and fan it out.
+
+        Returns:
+            False: 購読者がいなくなった
+        """
+        code, key_state = self.bt.get_key_code(ev)
+        if code is None:
+            return bool(self.subs)
+
+        onkeys = self.onkeys
+        onkeys.update(code, key_state)
+        key = self.keys[code]
+
+        by_code, any_subs = self.table
+        for sub in by_code.get(code, any_subs):
+            if sub.states is not None and key_state not in sub.states:
+                continue
+            sub.n_calls += 1
+            try:
+                ret = sub.cb(key, key_state, onkeys)
+            except Exception as _e:
+                self.__log.error("%s: %s", sub, errmsg(_e))
+                ret = False
+            if ret is False:
+                self.unsubscribe(sub)
+
+        return bool(self.subs)
+
+    def run(self) -> None:
+        """Read loop (until all subscribers are gone)."""
+        self.__log.debug("dev=%s", self.dev)
+
+        grabbed = self._grab()
+        try:
+            feed = self.feed
+            for ev in self.dev.read_loop():
+                if not feed(ev):
+                    break
+        finally:
+            if grabbed:
+                self._ungrab()
+
+    def _grab(self) -> bool:
+        """Grab the device (EVIOCGRAB).
+
+        Raises:
+            OSError: 他のプロセスが grab している (EBUSY) など
+        """
+        if not self.grab:
+            return False
+        grab = getattr(self.dev, "grab", None)
+        if grab is None:
+            self.__log.debug("%s: grab not supported", self.dev)
+            return False
+        try:
+            grab()
+        except OSError as _e:
+            if _e.errno == errno.EBUSY:
+                self.__log.error("%s: grabbed by another process", self.dev)
+            raise
+        return True
+
+    def _ungrab(self) -> None:
+        """Release the device."""
+        try:
+            self.dev.ungrab()
+        except OSError as _e:
+            # 切断済みなど
+            self.__log.debug("%s: ungrab: %s", self.dev, errmsg(_e))
@@ -0,0 +1,184 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Hold-repeat filter stage.
+
+カーネルのオートリピートによる hold イベント(key_state=2)を、
+コールバックに渡す前に間引く。onkeys のカウントはすべて数えられる。
+
+  pass:     そのまま渡す
+  suppress: hold はすべて捨てる (down/up だけ)
+  throttle: デバイス, キーごとに、最大 rate [Hz] に間引く
+  coalesce: キーごとに、every 回の hold を 1回にまとめる
+
+Usage:
+
+  hf = HoldFilter("throttle", rate=5)
+  hf = HoldFilter("coalesce", every=3)
+  bt.read_loop(dev, hf.stage(cb))
+
+発生源で減らす場合は、デバイスのリピート設定を変える (EVIOCSREP)。
+
+  set_repeat(dev, delay_ms=500, period_ms=200)
+"""
+
+import fcntl
+import struct
+import time
+from array import array
+
+from .keycodes import KEY_CODES, KEY_MAX
+from .keystate import KEY_HOLD
+from .utils.mylogger import get_logger
+
+# _IOW('E', 0x03, unsigned int[2])
+EVIOCSREP = 0x40084503
+# _IOR('E', 0x03, unsigned int[2])
+EVIOCGREP = 0x80084503
+
+MODES = ("pass", "suppress", "throttle", "coalesce")
+
+
+def get_repeat(dev) -> tuple[int, int]:
+    """Get device repeat settings.
+
+    Returns:
+        (delay_ms, period_ms)
+
+    Raises:
+        OSError: 設定を持たないデバイス
+    """
+    buf = fcntl.ioctl(dev.fileno(), EVIOCGREP, bytes(8))
+    delay, period = struct.unpack("II", buf)
+    return delay, period
+
+
+def set_repeat(dev, delay_ms: int, period_ms: int) -> None:
+    """Set device repeat settings (EVIOCSREP).
+
+    Args:
+        delay_ms: 押してからリピートが始まるまで
+        period_ms: リピートの間隔
+
+    Raises:
+        OSError: 設定できないデバイス
+    """
+    fcntl.ioctl(
+        dev.fileno(), EVIOCSREP, struct.pack("II", delay_ms, period_ms)
+    )
+
+
+class HoldFilter:
+    """Hold-repeat filter stage."""
+
+    def __init__(
+        self, mode: str = "pass", rate: float = 0, every: int = 0, debug=False
+    ):
+        """Constractor.
+
+        Args:
+            mode: "pass", "suppress", "throttle", "coalesce"
+            rate: throttle: 最大頻度 [Hz]
+            every: coalesce: まとめる hold の回数 (1以上)
+
+        Raises:
+            ValueError: 不正な mode, rate または every
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("mode=%s, rate=%s, every=%s", mode, rate, every)
+
+        if mode not in MODES:
+            raise ValueError(f"invalid mode: {mode!r}")
+        if mode == "throttle" and rate <= 0:
+            raise ValueError(f"{mode}: invalid rate: {rate}")
+        if mode == "coalesce" and (not isinstance(every, int) or every < 1):
+            raise ValueError(f"{mode}: invalid every: {every}")
+
+        self.mode = mode
+        self.rate = rate
+        self.period = 1.0 / rate if mode == "throttle" else 0.0
+        self.every = every if mode == "coalesce" else 1
+
+        # デバイス(dev.path, dev なし: None)ごと、キーコードごとの、
+        # 最後に渡した時刻 (throttle)
+        self.t_last: dict = {}
+
+        # 捨てた hold イベントの数
+        self.dropped = 0
+
+        self.accept = {
+            "pass": self.accept_pass,
+            "suppress": self.accept_suppress,
+            "throttle": self.accept_throttle,
+            "coalesce": self.accept_coalesce,
+        }[mode]
+
+    def accept_pass(self, key, key_state: int, onkeys, dev=None) -> bool:
+        """Accept all events."""
+        return True
+
+    def accept_suppress(self, key, key_state: int, onkeys, dev=None) -> bool:
+        """Accept non-hold events."""
+        if key_state != KEY_HOLD:
+            return True
+        self.dropped += 1
+        return False
+
+    def accept_throttle(self, key, key_state: int, onkeys, dev=None) -> bool:
+        """Accept hold events at most `rate` Hz per device and key."""
+        path = dev.path if dev is not None else None
+        t_last = self.t_last.get(path)
+        if t_last is None:
+            t_last = self.t_last[path] = array("d", bytes(8 * (KEY_MAX + 1)))
+
+        code = key if isinstance(key, int) else KEY_CODES[key]
+        t_now = time.monotonic()
+        if key_state == KEY_HOLD and t_now - t_last[code] < self.period:
+            self.dropped += 1
+            return False
+        t_last[code] = t_now
+        return True
+
+    def accept_coalesce(self, key, key_state: int, onkeys, dev=None) -> bool:
+        """Accept every `every`-th hold event per key."""
+        if key_state != KEY_HOLD:
+            return True
+        code = key if isinstance(key, int) else KEY_CODES[key]
+        # onkeys の回数: down で 1, hold ごとに +1
+        if (onkeys.count(code) - 1) % self.every == 0:
+            return True
+        self.dropped += 1
+        return False
+
+    def stage(self, cb, frame=False):
+        """Make a read loop callback that filters hold events.
+
+        Args:
+            cb: 続けて呼び出すコールバック
+            frame: read loop の frame と同じ
+                (hold だけのフレームは、cb を呼ばない)
+        """
+        accept = self.accept
+        if self.mode == "pass":
+            return cb
+
+        if frame:
+
+            def _cb_frame(*args):
+                onkeys = args[-1]
+                dev = args[0] if len(args) > 2 else None
+                fr = [e for e in args[-2] if accept(e[0], e[1], onkeys, dev)]
+                if not fr:
+                    return True
+                return cb(*args[:-2], fr, onkeys)
+
+            return _cb_frame
+
+        def _cb(*args):
+            dev = args[0] if len(args) > 3 else None
+            if not accept(args[-3], args[-2], args[-1], dev):
+                return True
+            return cb(*args)
+
+        return _cb
@@ -0,0 +1,58 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Precomputed key code tables.
+
+`evdev.ecodes.keys` の辞書引きと tuple 判定を毎イベント行わないように、
+import 時に一度だけ、キーコードをインデックスとする配列を作っておく。
+
+  KEY_NAMES[code] -> 'KEY_A' (intern 済み)
+  KEY_CODES['KEY_A'] -> code (別名, 未定義のコードの '0x54' なども含む)
+"""
+
+import sys
+
+from evdev import ecodes
+
+KEY_MAX: int = ecodes.KEY_MAX
+
+
+def _build_tables() -> tuple[tuple[str, ...], dict[str, int]]:
+    """Build tables."""
+    names: list[str] = []
+    codes: dict[str, int] = {}
+
+    for code in range(KEY_MAX + 1):
+        name = ecodes.keys.get(code)  # str | tuple[str] | None
+
+        if name is None:
+            # 未定義のコードは evdev.KeyEvent(allow_unknown=True) と同じ表記
+            #   KEY_NAMES から引いた名前は、KEY_CODES でコードに戻せる
+            name = sys.intern(f"0x{code:02X}")
+            names.append(name)
+            codes[name] = code
+            continue
+
+        aliases = name if isinstance(name, tuple) else (name,)
+        names.append(sys.intern(aliases[0]))
+        for a in aliases:
+            codes.setdefault(sys.intern(a), code)
+
+    return tuple(names), codes
+
+
+KEY_NAMES, KEY_CODES = _build_tables()
+
+
+def key_name(code: int) -> str:
+    """Key code -> key name."""
+    return KEY_NAMES[code]
+
+
+def key_code(name: str) -> int:
+    """Key name -> key code.
+
+    Raises:
+        KeyError: 不明なキー名
+    """
+    return KEY_CODES[name]
@@ -0,0 +1,178 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Keymap config for `pibtinput run`.
+
+triggerhappy と同じ形式の行に、デバイスごとのセクションを加えたもの。
+
+  # コメント
+  KEY_VOLUMEUP  1  amixer set Master 5%+     # 全キー入力デバイス
+
+  [8BitDo Micro]                             # 以降は、このデバイスだけ
+  KEY_ENTER             1  /usr/local/bin/foo
+  KEY_S+KEY_LEFTCTRL    1  echo save          # KEY_LEFTCTRL を押したまま S
+  KEY_A                 2  echo repeat        # 0:up, 1:down, 2:hold
+  KEY_B    1  @drop  long-command              # 実行中なら無視する
+
+  [*]                                        # 全キー入力デバイスに戻す
+
+セクション名は `search_input_devs()` のキーワード(空白区切り, `devmatch`)。
+名前の一部のほか、MAC アドレス([e4:17:d8:12:34:56]), vendor:product
+([2dc8:9020]), name=.., phys~.. なども使える。
+"+" の後ろのキーは修飾キーで、イベントの時点で押されているキーが
+修飾キーと完全に一致した場合に実行される。
+
+状態の後ろに "@queue", "@drop", "@coalesce" を書くと、
+そのコマンドのキューイングポリシーになる (`executor` 参照)。
+
+判定は (キーコード, 状態, 他に押されているキーのビットセット) を
+キーとする dict の一回の参照で行う。
+"""
+
+from .devmatch import DevIndex, compile_query
+from .executor import POLICIES, Action
+from .matcher import key_to_code
+from .utils.mylogger import get_logger
+
+ALL_DEVICES = "*"
+
+
+class KeyMap:
+    """Keymap (device sections -> dispatch tables)."""
+
+    def __init__(self, debug=False) -> None:
+        """Constractor."""
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+
+        # [(keywords, {(code, state, mods): [Action, ...]}), ...]
+        self.sections: list[tuple[tuple[str, ...], dict]] = []
+
+        # デバイスごとにまとめたテーブル (キーワードの組み合わせでキャッシュ)
+        self._merged: dict[tuple[int, ...], dict] = {}
+
+    @classmethod
+    def load(cls, path: str, debug=False) -> "KeyMap":
+        """Load config file.
+
+        Raises:
+            OSError:
+            ValueError: 書式エラー ("file:line: message")
+        """
+        keymap = cls(debug=debug)
+        with open(path, encoding="utf-8") as f:
+            keymap.parse(f, path)
+        return keymap
+
+    def parse(self, lines, filename: str = "<string>") -> None:
+        """Parse config lines.
+
+        Raises:
+            ValueError: 書式エラー ("file:line: message")
+        """
+        table = self._section(())
+
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                if line.startswith("["):
+                    line = line.split("#", 1)[0].strip()
+                    if not line.endswith("]"):
+                        raise ValueError(f"invalid section: {line!r}")
+                    name = line[1:-1].strip()
+                    keywords = () if name == ALL_DEVICES else name.split()
+                    compile_query(tuple(keywords))  # 不正なキーワード
+                    table = self._section(tuple(keywords))
+                    continue
+
+                key, state, action = self.parse_line(line)
+
+            except ValueError as _e:
+                raise ValueError(f"{filename}:{lineno}: {_e}") from None
+
+            table.setdefault((key[0], state, key[1]), []).append(action)
+
+        self.sections = [(kw, t) for kw, t in self.sections if t]
+        self._merged = {}
+        self.__log.debug("sections=%s", [kw for kw, _ in self.sections])
+
+    def _section(self, keywords: tuple[str, ...]) -> dict:
+        """Table of the section (create if needed)."""
+        for kw, table in self.sections:
+            if kw == keywords:
+                return table
+        table: dict = {}
+        self.sections.append((keywords, table))
+        return table
+
+    @staticmethod
+    def parse_line(line: str) -> tuple[tuple[int, int], int, Action]:
+        """Parse "KEY[+MOD...] STATE [@POLICY] COMMAND".
+
+        Returns:
+            ((code, mods_bits), state, action)
+        """
+        fields = line.split(None, 2)
+        if len(fields) < 3:
+            raise ValueError(f"'KEY STATE COMMAND' expected: {line!r}")
+        keys, state_str, command = fields
+
+        names = keys.split("+")
+        code = key_to_code(names[0])
+        mods = 0
+        for name in names[1:]:
+            mods |= 1 << key_to_code(name)
+
+        try:
+            state = int(state_str)
+        except ValueError:
+            raise ValueError(f"invalid state: {state_str!r}") from None
+        if state not in (0, 1, 2):
+            raise ValueError(f"invalid state: {state_str!r}")
+
+        policy = "queue"
+        if command.startswith("@"):
+            fields = command.split(None, 1)
+            policy = fields[0][1:]
+            if policy not in POLICIES or len(fields) < 2:
+                raise ValueError(f"invalid policy: {command!r}")
+            command = fields[1]
+
+        return (code, mods), state, Action(command, policy)
+
+    @staticmethod
+    def capabilities(dev) -> dict:
+        """Capabilities of dev (for DevIndex)."""
+        return dev.capabilities()
+
+    def keywords_list(self) -> list[list[str]]:
+        """Search keywords of all sections."""
+        return [list(kw) for kw, _ in self.sections]
+
+    def table_for(self, dev, index: DevIndex | None = None) -> dict:
+        """Dispatch table for dev (all matching sections merged).
+
+        セクションは、デバイスを開くときと同じく `devmatch` で判定する。
+
+        Args:
+            index: デバイスの索引 (`PiBtInput.dev_index()`)
+                None または dev が索引に無い場合は、dev だけの索引を作る
+        """
+        if index is None or dev.path not in index.fields:
+            index = DevIndex([dev], self.capabilities)
+        idx = tuple(
+            i
+            for i, (kw, _) in enumerate(self.sections)
+            if index.match(dev.path, compile_query(kw))
+        )
+        table = self._merged.get(idx)
+        if table is None:
+            table = {}
+            for i in idx:
+                for k, cmds in self.sections[i][1].items():
+                    table[k] = table.get(k, []) + cmds
+            self._merged[idx] = table
+        return table
@@ -0,0 +1,257 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Compact key state.
+
+`onkeys` (dict) の代わりに、キーコードをビット位置とするビットセット(int)と
+`array` によるリピート回数カウンタで、押されているキーを管理する。
+
+  KeyState: 更新される状態 (read loop が持つ)
+  KeySnapshot: ある時点の状態 (イミュータブル)
+
+どちらも読み取り専用の `Mapping` として振る舞うので、
+従来の onkeys と同じように使える。
+
+  onkeys["KEY_A"]  -> 押されている間の回数 (down:1, hold ごとに +1)
+  "KEY_A" in onkeys
+  dict(onkeys)     -> {'KEY_A': 3, ...}
+
+key_code=True の場合は、キー名の代わりにキーコード(int)がキーになる。
+"""
+
+from array import array
+from collections.abc import Mapping
+
+from .keycodes import KEY_CODES, KEY_MAX, KEY_NAMES
+
+KEY_UP = 0
+KEY_DOWN = 1
+KEY_HOLD = 2
+
+
+def bit_codes(bits: int) -> list[int]:
+    """Bitset -> key codes (ascending)."""
+    codes = []
+    while bits:
+        low = bits & -bits
+        codes.append(low.bit_length() - 1)
+        bits ^= low
+    return codes
+
+
+class KeyBase(Mapping):
+    """Read-only mapping over a key bitset."""
+
+    __slots__ = ("_key_code", "_keys", "bits", "generation")
+
+    bits: int
+    generation: int
+
+    @property
+    def key_code(self) -> bool:
+        """Use key codes (int) instead of key names."""
+        return self._key_code
+
+    @key_code.setter
+    def key_code(self, flag: bool) -> None:
+        self._key_code = flag
+        # キーコード -> キー (key_code=True の場合は range で恒等変換)
+        self._keys = range(KEY_MAX + 1) if flag else KEY_NAMES
+
+    def count(self, code: int) -> int:
+        """Hold count of code (0: not pressed).
+        **TO BE OVERRIDE**
+        """
+        raise NotImplementedError
+
+    def to_code(self, key) -> int:
+        """Key name or code -> code.
+
+        Raises:
+            KeyError: 不明なキー名
+        """
+        if isinstance(key, int):
+            return key
+        return KEY_CODES[key]
+
+    def to_key(self, code: int):
+        """Code -> key name or code."""
+        return self._keys[code]
+
+    def is_pressed(self, key) -> bool:
+        """Is key pressed."""
+        try:
+            return bool(self.bits >> self.to_code(key) & 1)
+        except KeyError:
+            return False
+
+    def codes(self) -> list[int]:
+        """Pressed key codes."""
+        return bit_codes(self.bits)
+
+    def delta(self, prev: "KeyBase") -> tuple[list, list]:
+        """Pressed/released keys since prev.
+
+        Returns:
+            (pressed, released)
+        """
+        return (
+            [self.to_key(c) for c in bit_codes(self.bits & ~prev.bits)],
+            [self.to_key(c) for c in bit_codes(prev.bits & ~self.bits)],
+        )
+
+    def __getitem__(self, key) -> int:
+        code = self.to_code(key)
+        if not self.bits >> code & 1:
+            raise KeyError(key)
+        return self.count(code)
+
+    def __contains__(self, key) -> bool:
+        return self.is_pressed(key)
+
+    def __iter__(self):
+        return (self.to_key(c) for c in bit_codes(self.bits))
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class KeySnapshot(KeyBase):
+    """Immutable key state.
+
+    sec, usec: フレームの SYN_REPORT のタイムスタンプ (0: 不明)
+    """
+
+    __slots__ = ("counts", "sec", "usec")
+
+    def __init__(
+        self,
+        bits: int,
+        generation: int,
+        counts: dict[int, int],
+        key_code: bool = False,
+        sec: int = 0,
+        usec: int = 0,
+    ) -> None:
+        self.bits = bits
+        self.generation = generation
+        self.counts = counts
+        self.key_code = key_code
+        self.sec = sec
+        self.usec = usec
+
+    def count(self, code: int) -> int:
+        """Hold count of code (0: not pressed)."""
+        return self.counts.get(code, 0)
+
+    def __hash__(self) -> int:
+        return hash((self.bits, tuple(sorted(self.counts.items()))))
+
+
+class KeyState(KeyBase):
+    """Compact key state.
+
+    update() のたびに generation が増え、
+    直前の update() で押された/放されたキーが pressed/released で分かる。
+    """
+
+    __slots__ = ("holds", "last_change", "last_code")
+
+    def __init__(self, key_code: bool = False) -> None:
+        self.bits = 0
+        self.generation = 0
+        self.key_code = key_code
+
+        # キーコードごとの回数 (down:1, hold ごとに +1)
+        self.holds = array("I", bytes(4 * (KEY_MAX + 1)))
+
+        # 直前の update() の差分
+        #   last_change: 1:押された, -1:放された, 0:変化なし
+        self.last_code = 0
+        self.last_change = 0
+
+    @property
+    def pressed(self):
+        """Key pressed by the last update() (or None)."""
+        if self.last_change > 0:
+            return self._keys[self.last_code]
+        return None
+
+    @property
+    def released(self):
+        """Key released by the last update() (or None)."""
+        if self.last_change < 0:
+            return self._keys[self.last_code]
+        return None
+
+    def count(self, code: int) -> int:
+        """Hold count of code (0: not pressed)."""
+        return self.holds[code]
+
+    def update(self, code: int, key_state: int) -> bool:
+        """Update by key event.
+
+        Returns:
+            changed (bool)
+        """
+        bits = self.bits
+        mask = 1 << code
+
+        if key_state == KEY_DOWN:
+            self.holds[code] = 1
+            if bits & mask:
+                self.last_change = 0
+            else:
+                self.bits = bits | mask
+                self.last_change = 1
+
+        elif key_state == KEY_UP:
+            if not bits & mask:
+                self.last_change = 0
+                return False
+            self.bits = bits ^ mask
+            self.holds[code] = 0
+            self.last_change = -1
+
+        elif key_state == KEY_HOLD:
+            self.holds[code] += 1
+            if bits & mask:
+                self.last_change = 0
+            else:
+                self.bits = bits | mask
+                self.last_change = 1
+
+        else:
+            self.last_change = 0
+            return False
+
+        self.last_code = code
+        self.generation += 1
+        return True
+
+    def clear(self) -> None:
+        """Release all keys."""
+        for code in bit_codes(self.bits):
+            self.holds[code] = 0
+        if self.bits:
+            self.bits = 0
+            self.generation += 1
+        self.last_change = 0
+
+    def snapshot(self, sec: int = 0, usec: int = 0) -> KeySnapshot:
+        """Immutable snapshot (O(pressed keys))."""
+        holds = self.holds
+        counts = {c: holds[c] for c in bit_codes(self.bits)}
+        return KeySnapshot(
+            self.bits, self.generation, counts, self.key_code, sec, usec
+        )
+
+    def copy(self) -> KeySnapshot:
+        """Same as snapshot() (compatible with dict.copy())."""
+        return self.snapshot()
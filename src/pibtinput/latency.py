@@ -0,0 +1,299 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Input latency statistics.
+
+カーネルがイベントに付けたタイムスタンプから、コールバックが呼ばれるまでの
+時間(input latency)と、コールバック自体の実行時間を、
+あらかじめ確保した対数バケットのヒストグラムに記録する。
+
+  stats = LatencyStats()
+  bt.read_loop(dev, cb, stats=stats)
+  print(stats.summary())         # 開始からの累計
+  print(stats.window_summary())  # 前回の window_summary() からの区間
+
+デバイスのタイムスタンプは、可能なら CLOCK_MONOTONIC に切り替える
+(EVIOCSCLOCKID)。切り替えられない場合(パイプ、再生ファイルなど)は
+CLOCK_REALTIME のまま比較する。
+"""
+
+import fcntl
+import struct
+import time
+from array import array
+
+from .keycodes import KEY_MAX, KEY_NAMES
+from .keystate import KEY_DOWN, KEY_HOLD
+
+# _IOW('E', 0xa0, int)
+EVIOCSCLOCKID = 0x400445A0
+
+# ヒストグラム: 1オクターブ(2倍)を SUB_BUCKETS 個に分割 (誤差 約12%)
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_EXP = 40  # 2**40 ns (約18分) 以上は最後のバケット
+N_BUCKETS = (MAX_EXP - SUB_BITS + 1) * SUB_BUCKETS
+
+
+def bucket_index(ns: int) -> int:
+    """Value (ns) -> bucket index."""
+    if ns < SUB_BUCKETS:
+        return max(0, ns)
+    e = ns.bit_length() - 1
+    if e >= MAX_EXP:
+        return N_BUCKETS - 1
+    mant = (ns >> (e - SUB_BITS)) & (SUB_BUCKETS - 1)
+    return (e - SUB_BITS + 1) * SUB_BUCKETS + mant
+
+
+def bucket_range(idx: int) -> tuple[int, int]:
+    """Bucket index -> [low, high) (ns)."""
+    if idx < SUB_BUCKETS:
+        return idx, idx + 1
+    e = idx // SUB_BUCKETS + SUB_BITS - 1
+    mant = idx % SUB_BUCKETS
+    width = 1 << (e - SUB_BITS)
+    low = (1 << e) + mant * width
+    return low, low + width
+
+
+def device_clock(dev):
+    """Switch dev timestamps to CLOCK_MONOTONIC if possible.
+
+    Returns:
+        ev のタイムスタンプと比較できる時計 (ns を返す関数)
+    """
+    try:
+        fcntl.ioctl(
+            dev.fileno(),
+            EVIOCSCLOCKID,
+            struct.pack("i", time.CLOCK_MONOTONIC),
+        )
+    except (AttributeError, OSError, TypeError, ValueError):
+        return time.time_ns
+    return time.monotonic_ns
+
+
+class LatencyHist:
+    """Log-bucketed histogram (ns).
+
+    バケットは `array` で最初に確保するので、add() はメモリを確保しない。
+    """
+
+    __slots__ = ("counts", "max", "min", "n", "total")
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * N_BUCKETS))
+        self.clear()
+
+    def clear(self) -> None:
+        """Clear."""
+        counts = self.counts
+        for i in range(N_BUCKETS):
+            counts[i] = 0
+        self.n = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def add(self, ns: int) -> None:
+        """Add one value (ns). Negative values are counted as 0."""
+        ns = max(ns, 0)
+        self.counts[bucket_index(ns)] += 1
+        if self.n == 0 or ns < self.min:
+            self.min = ns
+        self.max = max(self.max, ns)
+        self.n += 1
+        self.total += ns
+
+    def percentile(self, p: float) -> int:
+        """p-th percentile (ns, 0 <= p <= 100).
+
+        バケットの中央値を返す (min/max の範囲に丸める)。
+        """
+        if self.n == 0:
+            return 0
+        rank = max(1, -(-self.n * p // 100))
+        acc = 0
+        for idx, c in enumerate(self.counts):
+            if not c:
+                continue
+            acc += c
+            if acc >= rank:
+                low, high = bucket_range(idx)
+                mid = (low + high - 1) // 2
+                return min(max(mid, self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """Mean (ns)."""
+        return self.total / self.n if self.n else 0.0
+
+    def copy(self) -> "LatencyHist":
+        """Copy."""
+        hist = LatencyHist.__new__(LatencyHist)
+        hist.counts = array("Q", self.counts)
+        hist.n = self.n
+        hist.total = self.total
+        hist.min = self.min
+        hist.max = self.max
+        return hist
+
+    def since(self, prev: "LatencyHist") -> "LatencyHist":
+        """Values added since prev (a copy() of self).
+
+        区間の min/max は記録していないので、バケットの範囲で近似する。
+        """
+        hist = LatencyHist.__new__(LatencyHist)
+        hist.counts = array(
+            "Q", [max(a - b, 0) for a, b in zip(self.counts, prev.counts)]
+        )
+        hist.n = self.n - prev.n
+        hist.total = self.total - prev.total
+        hist.min = hist.max = 0
+        used = [i for i, c in enumerate(hist.counts) if c]
+        if used:
+            hist.min = max(bucket_range(used[0])[0], self.min)
+            hist.max = min(bucket_range(used[-1])[1] - 1, self.max)
+        return hist
+
+
+class LatencyStats:
+    """Latency and event-rate statistics of a read loop.
+
+    input: ev.timestamp() からコールバック直前まで
+    callback: コールバックの実行時間
+      (コルーチン関数の場合は、コルーチンを作るまでの時間)
+
+    summary() は開始からの累計、window_summary() は前回の
+    window_summary() からの区間 (表示の更新ごとに呼べば、今の値)。
+    区間は、累計との差で求めるので、記録(add)の負担は増えない。
+    """
+
+    def __init__(self) -> None:
+        self.input = LatencyHist()
+        self.callback = LatencyHist()
+
+        # キーコードごとのイベント数 (全状態, down, hold)
+        self.counts = array("Q", bytes(8 * (KEY_MAX + 1)))
+        self.downs = array("Q", bytes(8 * (KEY_MAX + 1)))
+        self.holds = array("Q", bytes(8 * (KEY_MAX + 1)))
+        self.n_events = 0
+
+        self.t_start = time.monotonic()
+        self.mark()
+
+    def mark(self) -> None:
+        """Start a new window (window_summary())."""
+        self.prev = (
+            time.monotonic(),
+            self.n_events,
+            self.input.copy(),
+            self.callback.copy(),
+            array("Q", self.counts),
+            array("Q", self.downs),
+            array("Q", self.holds),
+        )
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        self.input.clear()
+        self.callback.clear()
+        for arr in (self.counts, self.downs, self.holds):
+            for i in range(KEY_MAX + 1):
+                arr[i] = 0
+        self.n_events = 0
+        self.t_start = time.monotonic()
+        self.mark()
+
+    def add_key(self, code: int, key_state: int) -> None:
+        """Count one key event."""
+        self.n_events += 1
+        self.counts[code] += 1
+        if key_state == KEY_DOWN:
+            self.downs[code] += 1
+        elif key_state == KEY_HOLD:
+            self.holds[code] += 1
+
+    def elapsed(self) -> float:
+        """Seconds since start or reset()."""
+        return time.monotonic() - self.t_start
+
+    def summary(self) -> dict:
+        """Cumulative summary (since start or reset()).
+
+        Returns:
+            {'elapsed': sec, 'events': int, 'ev_per_sec': float,
+             'input': {'p50_us': .., 'p90_us': .., 'p99_us': ..,
+                       'max_us': .., 'n': ..},
+             'callback': {...},
+             'keys': {key_name: {'events': n, 'down': n, 'hold': n,
+                                 'ev_per_sec': float,
+                                 'hold_per_sec': float}, ...}}
+        """
+        return self._summary(
+            self.elapsed(),
+            self.n_events,
+            self.input,
+            self.callback,
+            self.counts,
+            self.downs,
+            self.holds,
+        )
+
+    def window_summary(self) -> dict:
+        """Summary of the window since the last call (or start), and mark().
+
+        Returns:
+            summary() と同じ形式 (elapsed は区間の長さ)
+        """
+        t_prev, n_prev, input_prev, cb_prev, *arrs_prev = self.prev
+        arrs = (self.counts, self.downs, self.holds)
+        ret = self._summary(
+            time.monotonic() - t_prev,
+            self.n_events - n_prev,
+            self.input.since(input_prev),
+            self.callback.since(cb_prev),
+            *(
+                [a - b for a, b in zip(cur, prev)]
+                for cur, prev in zip(arrs, arrs_prev)
+            ),
+        )
+        self.mark()
+        return ret
+
+    def _summary(
+        self, elapsed, n_events, input_hist, cb_hist, counts, downs, holds
+    ) -> dict:
+        keys = {}
+        per_sec = 1 / elapsed if elapsed else 0.0
+        for code, n in enumerate(counts):
+            if not n:
+                continue
+            keys[KEY_NAMES[code]] = {
+                "events": n,
+                "down": downs[code],
+                "hold": holds[code],
+                "ev_per_sec": n * per_sec,
+                "hold_per_sec": holds[code] * per_sec,
+            }
+
+        return {
+            "elapsed": elapsed,
+            "events": n_events,
+            "ev_per_sec": n_events * per_sec,
+            "input": self.hist_summary(input_hist),
+            "callback": self.hist_summary(cb_hist),
+            "keys": keys,
+        }
+
+    @staticmethod
+    def hist_summary(hist: LatencyHist) -> dict:
+        """Percentiles of hist (us)."""
+        return {
+            "n": hist.n,
+            "p50_us": hist.percentile(50) / 1000,
+            "p90_us": hist.percentile(90) / 1000,
+            "p99_us": hist.percentile(99) / 1000,
+            "max_us": hist.max / 1000,
+        }
@@ -0,0 +1,390 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Chord / hold / sequence matcher.
+
+キーの組み合わせを宣言的に登録し、一度だけコンパイルしておくことで、
+登録数に関係なく、1イベントあたり O(1) で判定する。
+
+  chord:    "KEY_LEFTCTRL+KEY_S"       (最後のキーが押された時点で一致)
+  hold:     "KEY_S*11"                 (KEY_S の回数が 11 に達したとき)
+  sequence: "KEY_UP KEY_UP KEY_DOWN"   (空白区切り、各ステップは chord)
+
+キー名は "KEY_A", "BTN_A" のほか、"a", "leftctrl" のように
+"KEY_" / "BTN_" を省略して小文字で書いてもよい。
+
+Usage:
+
+  m = Matcher()
+  m.add("KEY_LEFTCTRL+KEY_S", lambda b, onkeys: print("save"))
+  m.add("KEY_S*11", lambda b, onkeys: False)  # False: read loop を終了
+  bt.read_loop(dev, m.stage(cb))
+
+判定方法:
+
+  chord: 押されているキーのビットセット -> Binding (dict)
+  hold: (ビットセット, 回数) -> Binding (dict)
+  sequence: Aho-Corasick オートマトン。
+    キーが押されるたびのビットセットを1文字として、状態遷移する。
+    遷移は (状態, 文字) -> 状態 の dict にメモ化する。
+
+判定の状態 (sequence の状態、前回のビットセット) はデバイスごとに持つ。
+dev 付きのコールバック(複数デバイス)では dev.path で区別する。
+
+フレーム(frame=True)では、前回のビットセットからフレーム内のイベントを
+順に適用し、キーごとの場合と同じ途中のビットセットで判定する。
+"""
+
+import time
+
+from .keycodes import KEY_CODES
+from .keystate import KEY_DOWN, KEY_HOLD, KEY_UP
+from .utils.mylogger import get_logger
+
+
+def key_to_code(name: str) -> int:
+    """Key name -> code.
+
+    Raises:
+        ValueError: 不明なキー名
+    """
+    for cand in (name, "KEY_" + name.upper(), "BTN_" + name.upper()):
+        if cand in KEY_CODES:
+            return KEY_CODES[cand]
+    raise ValueError(f"unknown key: {name!r}")
+
+
+def chord_bits(spec: str) -> int:
+    """Chord spec ("KEY_A+KEY_B") -> bitset."""
+    bits = 0
+    for name in spec.split("+"):
+        name = name.strip()
+        if not name:
+            raise ValueError(f"invalid chord: {spec!r}")
+        bits |= 1 << key_to_code(name)
+    return bits
+
+
+class Binding:
+    """Compiled binding."""
+
+    CHORD = "chord"
+    HOLD = "hold"
+    SEQUENCE = "sequence"
+
+    def __init__(self, spec: str, action) -> None:
+        """Constractor.
+
+        Args:
+            spec: "KEY_A+KEY_B", "KEY_A*10", "KEY_A KEY_B ..."
+            action: action(binding, onkeys)。False を返すと read loop を終了
+
+        Raises:
+            ValueError: spec が不正
+        """
+        self.spec = spec
+        self.action = action
+
+        steps = spec.split()
+        if not steps:
+            raise ValueError(f"empty binding: {spec!r}")
+
+        self.count = 0
+        if len(steps) > 1:
+            if any("*" in s for s in steps):
+                raise ValueError(f"hold in sequence: {spec!r}")
+            self.kind = self.SEQUENCE
+            self.steps = tuple(chord_bits(s) for s in steps)
+            return
+
+        chord, _, count = steps[0].partition("*")
+        self.steps = (chord_bits(chord),)
+        if not count:
+            self.kind = self.CHORD
+            return
+
+        self.kind = self.HOLD
+        try:
+            self.count = int(count)
+        except ValueError:
+            raise ValueError(f"invalid hold count: {spec!r}") from None
+        if self.count < 1:
+            raise ValueError(f"invalid hold count: {spec!r}")
+
+    def __repr__(self) -> str:
+        return f"Binding({self.spec!r}, {self.kind})"
+
+
+class _DevState:
+    """Per-device match state."""
+
+    __slots__ = ("prev_bits", "state", "t_last")
+
+    def __init__(self) -> None:
+        self.prev_bits = 0
+        self.state = 0
+        self.t_last = 0.0
+
+
+class Matcher:
+    """Chord / hold / sequence matcher."""
+
+    def __init__(self, timeout: float = 0.0, debug=False) -> None:
+        """Constractor.
+
+        Args:
+            timeout: sequence のステップ間の最大間隔 [sec] (0: 無制限)
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("timeout=%s", timeout)
+
+        self.timeout = timeout
+        self.bindings: list[Binding] = []
+        self.compiled = False
+
+        # chord: bits -> [Binding]
+        self.chords: dict[int, list[Binding]] = {}
+        # hold: (bits, count) -> [Binding]
+        self.holds: dict[tuple[int, int], list[Binding]] = {}
+
+        # sequence: Aho-Corasick
+        self.goto: list[dict[int, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[list[Binding]] = [[]]
+        self.alphabet: set[int] = set()
+        self.trans: dict[tuple[int, int], int] = {}
+
+        # dev.path (dev なし: None) -> _DevState
+        self.dev_states: dict = {}
+
+    def add(self, spec: str, action) -> Binding:
+        """Add binding.
+
+        Raises:
+            ValueError: spec が不正
+        """
+        self.__log.debug("spec=%a", spec)
+        binding = Binding(spec, action)
+        self.bindings.append(binding)
+        self.compiled = False
+        return binding
+
+    def compile(self) -> None:
+        """Compile all bindings."""
+        self.__log.debug("%s bindings", len(self.bindings))
+
+        self.chords = {}
+        self.holds = {}
+        self.goto = [{}]
+        self.out = [[]]
+
+        for b in self.bindings:
+            if b.kind == Binding.CHORD:
+                self.chords.setdefault(b.steps[0], []).append(b)
+            elif b.kind == Binding.HOLD:
+                self.holds.setdefault((b.steps[0], b.count), []).append(b)
+            else:
+                self._add_sequence(b)
+
+        self._build_fail()
+        self.alphabet = {s for g in self.goto for s in g}
+        self.trans = {}
+        self.reset()
+        self.compiled = True
+
+    def _add_sequence(self, binding: Binding) -> None:
+        """Add sequence to the trie."""
+        state = 0
+        for sym in binding.steps:
+            nxt = self.goto[state].get(sym)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][sym] = nxt
+                self.goto.append({})
+                self.out.append([])
+            state = nxt
+        self.out[state].append(binding)
+
+    def _build_fail(self) -> None:
+        """Build failure links (BFS)."""
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for sym, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and sym not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(sym, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                # 接尾辞で一致するものも出力する
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def _next_state(self, state: int, sym: int) -> int:
+        """Transition (memoized)."""
+        key = (state, sym)
+        nxt = self.trans.get(key)
+        if nxt is None:
+            s = state
+            while s and sym not in self.goto[s]:
+                s = self.fail[s]
+            nxt = self.goto[s].get(sym, 0)
+            self.trans[key] = nxt
+        return nxt
+
+    def reset(self) -> None:
+        """Reset sequence state (all devices)."""
+        self.dev_states = {}
+
+    def feed(self, key, key_state: int, onkeys, dev=None) -> bool:
+        """Feed one key event (after onkeys was updated).
+
+        Args:
+            key: キー名 または キーコード
+            key_state: 0:up, 1:down, 2:hold
+            onkeys: KeyState / KeySnapshot
+            dev: デバイス (複数デバイスの場合)
+
+        Returns:
+            False: いずれかの action が False を返した
+        """
+        if not self.compiled:
+            self.compile()
+
+        ds = self._dev_state(dev)
+
+        bits = onkeys.bits
+        changed = bits != ds.prev_bits
+        ds.prev_bits = bits
+
+        if key_state == KEY_DOWN:
+            if not changed:
+                return True
+            return self._press(ds, bits, onkeys)
+
+        if key_state == KEY_HOLD and self.holds:
+            code = key if isinstance(key, int) else KEY_CODES[key]
+            matched = self.holds.get((bits, onkeys.count(code)))
+            if matched:
+                return self._fire(matched, onkeys)
+
+        return True
+
+    def feed_frame(self, frame, onkeys, dev=None) -> bool:
+        """Feed one frame (after onkeys was updated).
+
+        Args:
+            frame: [(キー名 または キーコード, key_state), ...]
+            onkeys: フレーム適用後の KeySnapshot
+            dev: デバイス (複数デバイスの場合)
+
+        Returns:
+            False: いずれかの action が False を返した
+        """
+        if not self.compiled:
+            self.compile()
+
+        ds = self._dev_state(dev)
+
+        # フレーム内の各イベントの時点のビットセットを再現する
+        bits = ds.prev_bits
+        ret = True
+        for key, key_state in frame:
+            code = key if isinstance(key, int) else KEY_CODES[key]
+            mask = 1 << code
+            if key_state == KEY_UP:
+                bits &= ~mask
+                continue
+
+            prev = bits
+            bits |= mask
+            if key_state == KEY_DOWN:
+                if bits != prev and not self._press(ds, bits, onkeys):
+                    ret = False
+            elif key_state == KEY_HOLD and self.holds:
+                matched = self.holds.get((bits, onkeys.count(code)))
+                if matched and not self._fire(matched, onkeys):
+                    ret = False
+
+        ds.prev_bits = onkeys.bits
+        return ret
+
+    def _dev_state(self, dev) -> _DevState:
+        path = dev.path if dev is not None else None
+        ds = self.dev_states.get(path)
+        if ds is None:
+            ds = self.dev_states[path] = _DevState()
+        return ds
+
+    def _press(self, ds: _DevState, bits: int, onkeys) -> bool:
+        """Key pressed: chord and sequence."""
+        ret = True
+        matched = self.chords.get(bits)
+        if matched and not self._fire(matched, onkeys):
+            ret = False
+        if self.alphabet and not self._feed_seq(ds, bits, onkeys):
+            ret = False
+        return ret
+
+    def _feed_seq(self, ds: _DevState, sym: int, onkeys) -> bool:
+        """Advance sequence state."""
+        state = ds.state
+        if self.timeout:
+            t_now = time.monotonic()
+            if t_now - ds.t_last > self.timeout:
+                state = 0
+            ds.t_last = t_now
+
+        if sym not in self.alphabet:
+            ds.state = 0
+            return True
+
+        state = ds.state = self._next_state(state, sym)
+        matched = self.out[state]
+        if matched:
+            return self._fire(matched, onkeys)
+        return True
+
+    def _fire(self, bindings: list[Binding], onkeys) -> bool:
+        """Call actions."""
+        ret = True
+        for b in bindings:
+            self.__log.debug("match: %s", b)
+            if b.action(b, onkeys) is False:
+                ret = False
+        return ret
+
+    def stage(self, cb=None, frame=False):
+        """Make a read loop callback that feeds this matcher first.
+
+        `read_loop()` などのコールバックとして使う。
+        dev 付きのコールバック(複数デバイス)では、
+        判定の状態をデバイスごとに分ける。
+
+        Args:
+            cb: 続けて呼び出すコールバック (None: 呼び出さない)
+            frame: read loop の frame と同じ
+        """
+        if not self.compiled:
+            self.compile()
+        feed = self.feed
+
+        if frame:
+            feed_frame = self.feed_frame
+
+            def _cb_frame(*args):
+                dev = args[0] if len(args) > 2 else None
+                if not feed_frame(args[-2], args[-1], dev):
+                    return False
+                return cb(*args) if cb else True
+
+            return _cb_frame
+
+        def _cb(*args):
+            dev = args[0] if len(args) > 3 else None
+            if not feed(args[-3], args[-2], args[-1], dev):
+                return False
+            return cb(*args) if cb else True
+
+        return _cb
@@ -0,0 +1,199 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Structured output of key frames (`pibtinput input --format`).
+
+frame=True, key_code=True の read loop のコールバックとして使い、
+フレーム(SYN_REPORT)ごとにまとめてバッファに書き、
+flush_interval ごとに一度だけ write する。
+キー名が必要な形式(ndjson, csv)だけ、書くときにキー名を引く。
+
+ndjson: 1行 1イベント
+  {"sec":1700000000,"usec":123456,"dev":"/dev/input/event3",
+   "code":30,"key":"KEY_A","state":1,"held":{"KEY_A":1}}
+
+csv: 1行 1イベント (held は "KEY_A:1 KEY_LEFTCTRL:1")
+  sec,usec,dev,code,key,state,held
+
+binary: `pibtinput serve` と同じメッセージ (broker.py 参照)
+  デバイスごとに MSG_DEV, フレームごとに MSG_FRAME
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+
+from .broker import pack_dev, pack_frame
+from .keycodes import KEY_NAMES
+from .utils.mylogger import errmsg, get_logger
+
+FORMATS = ("ndjson", "csv", "binary")
+
+CSV_HEADER = b"sec,usec,dev,code,key,state,held\n"
+
+# バッファがこれを超えたら、flush_interval を待たずに書く
+MAX_BUFFER = 64 * 1024
+
+
+def csv_field(value: str) -> str:
+    """Quote value for csv (if needed)."""
+    out = io.StringIO()
+    csv.writer(out, lineterminator="").writerow([value])
+    return out.getvalue()
+
+
+class FrameWriter:
+    """Buffered structured writer of key frames."""
+
+    def __init__(
+        self, fmt: str, fd: int = 1, flush_interval: float = 0.1, debug=False
+    ) -> None:
+        """Constractor.
+
+        Args:
+            fmt: "ndjson", "csv", "binary"
+            fd: 出力先
+            flush_interval: 書き出す間隔 [sec] (0: フレームごと)
+
+        Raises:
+            ValueError: 不明な fmt
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug(
+            "fmt=%s, fd=%s, flush_interval=%s", fmt, fd, flush_interval
+        )
+
+        if fmt not in FORMATS:
+            raise ValueError(f"invalid format: {fmt!r}")
+
+        self.fmt = fmt
+        self.fd = fd
+        self.flush_interval = flush_interval
+        self.encode = getattr(self, f"encode_{fmt}")
+
+        self.lock = threading.Lock()
+        self.buf = bytearray(CSV_HEADER if fmt == "csv" else b"")
+        self.broken = False
+        self.n_frames = 0
+        self.n_writes = 0
+
+        # 現在のデバイス (set_dev())
+        self.dev_path = ""
+        self.dev_enc = ""  # dev の JSON 文字列 / csv フィールド
+        self.dev_ids: dict[str, int] = {}
+        self.dev_id = 0
+        self.seq = 0
+
+        # 間隔ごとに書き出すスレッド
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+        if flush_interval > 0:
+            self.thread = threading.Thread(
+                target=self._run, name="pibt-output", daemon=True
+            )
+            self.thread.start()
+
+    def set_dev(self, dev) -> None:
+        """Set the device of the following frames."""
+        path = dev.path
+        self.__log.debug("path=%a", path)
+        self.dev_path = path
+        if self.fmt == "ndjson":
+            self.dev_enc = json.dumps(path)
+        elif self.fmt == "csv":
+            self.dev_enc = csv_field(path)
+
+        dev_id = self.dev_ids.get(path)
+        if dev_id is None:
+            dev_id = self.dev_ids[path] = len(self.dev_ids)
+            if self.fmt == "binary":
+                with self.lock:
+                    self.buf += pack_dev(dev_id, path, dev.name)
+        self.dev_id = dev_id
+
+    def write_frame(self, frame, onkeys) -> bool:
+        """Write one frame (read loop callback, frame=True, key_code=True).
+
+        Returns:
+            False: 出力先が閉じられた
+        """
+        data = self.encode(frame, onkeys)
+        with self.lock:
+            self.buf += data
+            self.n_frames += 1
+            if self.flush_interval <= 0 or len(self.buf) >= MAX_BUFFER:
+                self._flush()
+        return not self.broken
+
+    def encode_ndjson(self, frame, onkeys) -> bytes:
+        names = KEY_NAMES
+        held = ",".join(f'"{names[c]}":{n}' for c, n in onkeys.counts.items())
+        head = (
+            f'{{"sec":{onkeys.sec},"usec":{onkeys.usec},"dev":{self.dev_enc}'
+        )
+        return "".join(
+            [
+                f'{head},"code":{c},"key":"{names[c]}","state":{st},'
+                f'"held":{{{held}}}}}\n'
+                for c, st in frame
+            ]
+        ).encode()
+
+    def encode_csv(self, frame, onkeys) -> bytes:
+        names = KEY_NAMES
+        held = " ".join(f"{names[c]}:{n}" for c, n in onkeys.counts.items())
+        head = f"{onkeys.sec},{onkeys.usec},{self.dev_enc}"
+        return "".join(
+            [f"{head},{c},{names[c]},{st},{held}\n" for c, st in frame]
+        ).encode()
+
+    def encode_binary(self, frame, onkeys) -> bytes:
+        self.seq += 1
+        return pack_frame(
+            self.dev_id,
+            self.seq,
+            frame,
+            onkeys.counts,
+            onkeys.sec,
+            onkeys.usec,
+        )
+
+    def _flush(self) -> None:
+        """Write the buffer (with lock held)."""
+        if not self.buf or self.broken:
+            self.buf.clear()
+            return
+        view = memoryview(self.buf)
+        try:
+            while view:
+                n = os.write(self.fd, view)
+                view = view[n:]
+            self.n_writes += 1
+        except OSError as _e:
+            # 読む側が終了した (BrokenPipeError など)
+            self.__log.debug(errmsg(_e))
+            self.broken = True
+        finally:
+            view.release()
+        self.buf.clear()
+
+    def flush(self) -> None:
+        """Write the buffer now."""
+        with self.lock:
+            self._flush()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        """Flush and stop."""
+        self.__log.debug("frames=%s, writes=%s", self.n_frames, self.n_writes)
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.flush()
@@ -2,9 +2,24 @@
 # (c) 2025 Yoichi Tanibayashi
 #
 
+import asyncio
+import contextlib
+import errno
+import inspect
+import selectors
+import time
+
 import evdev
 
-from .utils.mylogger import get_logger
+from .devmatch import DevIndex, compile_query
+from .devreader import DevReader
+from .devregistry import DevRegistry
+from .keycodes import KEY_NAMES
+from .keystate import KeyState
+from .sysfs import SysfsInput
+from .utils.mylogger import get_logger, hot_debug
+
+EV_KEY = evdev.ecodes.EV_KEY
 
 
 class PiBtInput:
@@ -21,16 +36,58 @@ class PiBtInput:
         self.__log = get_logger(self.__class__.__name__, self.__debug)
         self.__log.debug("")
 
-        # {'KEY_?': 1, 'KEY_?': 20, ...}
-        self.onkeys: dict[str, int] = {}
+        # 毎イベントのデバッグログ (ホットパス用, 無効時は None)
+        # 有効な場合だけ、ログを出す版に差し替える
+        self.__dbg = hot_debug(self.__log)
+        if self.__dbg:
+            self.get_key_event = self._get_key_event_debug
+            self.get_key_code = self._get_key_code_debug
+
+        # {'KEY_?': 1, 'KEY_?': 20, ...} として振る舞う
+        self.onkeys = KeyState()
+
+        # {dev.path: KeyState, ...}  (複数デバイス用)
+        self.dev_onkeys: dict[str, KeyState] = {}
+
+        # 最初に使われるときに作る
+        self._registry: DevRegistry | None = None
+
+        # デバイスの索引 (registry.generation が変わったら作り直す)
+        self._dev_index: DevIndex | None = None
+        self._dev_index_gen = -1
+
+        # 再接続の記録 (supervised_read_loop)
+        # [{'path': str, 'downtime': sec, 'latency': sec}, ...]
+        self.reconnects: list[dict] = []
+
+    @property
+    def registry(self) -> DevRegistry:
+        """Device registry."""
+        if self._registry is None:
+            # sysfs があれば、デバイスは選んだものだけを開く
+            self._registry = DevRegistry(
+                sysfs=SysfsInput.probe(debug=self.__debug),
+                debug=self.__debug,
+            )
+        return self._registry
+
+    def close(self):
+        """Close all cached devices."""
+        self.__log.debug("")
+        if self._registry:
+            self._registry.close()
+            self._registry = None
+        self._dev_index = None
 
     def list_input_devs(self):
-        """List input devices."""
+        """List input devices.
+
+        開いたデバイスは `registry` にキャッシュされ、
+        `/dev/input` に変更があるまで再利用される。
+        """
         self.__log.debug("")
 
-        input_devs = [
-            evdev.device.InputDevice(d) for d in evdev.util.list_devices()
-        ]
+        input_devs = self.registry.list_devs()
         self.__log.debug("input_devs=%s", input_devs)
         return input_devs
 
@@ -41,55 +98,278 @@ class PiBtInput:
 
         keyin_devs = []
         for d in in_devs:
-            if evdev.ecodes.EV_KEY in d.capabilities():
+            if EV_KEY in self.registry.capabilities(d):
                 keyin_devs.append(d)
 
         self.__log.debug("keyin_devs=%s", keyin_devs)
         return keyin_devs
 
+    def dev_index(self) -> DevIndex:
+        """Index of key input devices (rebuilt when devices change).
+
+        sysfs を使う場合、索引のデバイスは `SysfsDev` (開いていない)。
+        """
+        reg = self.registry
+        reg.update()
+        gen = reg.generation
+        if self._dev_index is None or self._dev_index_gen != gen:
+            keyin_devs = [
+                d for d in reg.describe() if EV_KEY in reg.capabilities(d)
+            ]
+            self._dev_index = DevIndex(keyin_devs, reg.capabilities)
+            self._dev_index_gen = gen
+        return self._dev_index
+
+    def search_dev_info(self, search_keywords: list[str]) -> list:
+        """Search devices without opening them (if sysfs is available).
+
+        Returns:
+            `SysfsDev` (sysfs を使わない場合は InputDevice) のリスト
+        """
+        index = self.dev_index()
+        if not search_keywords:
+            return list(index.devs)
+        return index.search(compile_query(tuple(search_keywords)))
+
     def search_input_devs(self, search_keywords: list[str]) -> list:
-        """Search device"""
+        """Search device.
+
+        キーワードは `devmatch` を参照 (名前の一部, MAC アドレス,
+        vendor:product, name=.., phys~.., cap=KEY_A など)。
+        すべてのキーワードに一致する、キー入力デバイスを開いて返す。
+        (一致したデバイスだけを開く)
+
+        Raises:
+            ValueError: 不正なキーワード
+        """
         self.__log.debug("search_keywords=%s", search_keywords)
 
-        keyin_devs = self.list_keyin_devs()
-        if not search_keywords:
-            return keyin_devs
+        found = self.search_dev_info(search_keywords)
+        devs = (self.registry.get(d.path) for d in found)
+        return [d for d in devs if d is not None]
 
-        ret_devs = []
+    def wait_input_dev(self, search_keywords: list[str]):
+        """Wait for a device to appear.
 
-        for _dev in keyin_devs:
-            dev_found: evdev.device.InputDevice[str] | None = _dev
-            for w in search_keywords:
-                if w not in _dev.name:
-                    dev_found = None
-                    break
+        `/dev/input` の変更を inotify で待ち、
+        `search_input_devs()` で見つかるまで繰り返す。
+        複数見つかった場合は、パス名順で最初のものを使う。
 
-            if dev_found:
-                ret_devs.append(dev_found)
+        Returns:
+            dev (InputDevice)
+        """
+        self.__log.debug("search_keywords=%s", search_keywords)
 
-        return ret_devs
+        while True:
+            devs = self.search_input_devs(search_keywords)
+            if devs:
+                devs = sorted(devs, key=lambda d: d.path)
+                if len(devs) > 1:
+                    self.__log.warning(
+                        "ambiguous: %s .. use %a",
+                        [d.name for d in devs],
+                        devs[0].path,
+                    )
+                return devs[0]
+
+            self.registry.wait()
+
+    def supervised_read_loop(
+        self,
+        search_keywords,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        on_connect=None,
+        axes=None,
+    ):
+        """Read loop with auto-reconnect.
+
+        デバイスが見つかるまで待ち、切断(ENODEV)されたら、
+        同じキーワードで再接続されるのを待って、読み込みを再開する。
+        再接続のたびに onkeys はクリアされ、`reconnects` に記録される。
+
+        Args:
+            search_keywords (list[str]): `search_input_devs()` のキーワード
+            cb_key_event: `read_loop()` と同じ
+            frame (bool): `read_loop()` と同じ
+            key_code (bool): `read_loop()` と同じ
+            stats (LatencyStats): `read_loop()` と同じ
+            on_connect: 接続(再接続)のたびに `on_connect(dev)` を呼ぶ
+                (リピート設定など、デバイスごとの設定用)
+            axes (Axes): `read_loop()` と同じ
+        """
+        self.__log.debug(
+            "search_keywords=%s, cb_key_event=%s",
+            search_keywords,
+            cb_key_event,
+        )
+
+        if not cb_key_event:
+            self.__log.error("cb_key_event=%s", cb_key_event)
+            return
+
+        t_lost = None
+        while True:
+            dev = self.wait_input_dev(search_keywords)
+
+            # 前回の状態は無効
+            self.onkeys.clear()
+            if on_connect:
+                on_connect(dev)
+            reader = DevReader(
+                self,
+                dev,
+                cb_key_event,
+                self.onkeys,
+                frame,
+                key_code=key_code,
+                with_dev=False,
+                stats=stats,
+                axes=axes,
+                debug=self.__debug,
+            )
+
+            if t_lost is not None:
+                t_now = time.monotonic()
+                rec = {
+                    "path": dev.path,
+                    "downtime": t_now - t_lost,
+                    "latency": t_now - self.registry.t_changed,
+                }
+                self.reconnects.append(rec)
+                self.__log.info(
+                    "reconnected: %s (downtime=%.3fs, latency=%.1fms)",
+                    dev,
+                    rec["downtime"],
+                    rec["latency"] * 1000,
+                )
+
+            try:
+                for ev in dev.read_loop():
+                    if not reader.feed(ev):
+                        return
+
+            except OSError as _e:
+                if _e.errno != errno.ENODEV:
+                    raise
+
+                self.__log.warning("disconnected: %s", dev)
+                t_lost = time.monotonic()
+                self.registry.drop(dev.path)
+                self.onkeys.clear()
 
     def get_key_event(self, ev):
-        """Get key event."""
-        self.__log.debug("ev=%s", ev)
+        """Get key event.
 
-        if ev.type != evdev.ecodes.EV_KEY:
-            self.__log.debug("ignore: ev.type=%s", ev.type)
-            return None, None
+        キー名は `keycodes.KEY_NAMES` から引き、
+        キーの状態は `ev.value` (0:up, 1:down, 2:hold) をそのまま使う。
 
-        key_name = evdev.ecodes.keys[ev.code]  # str | Tuple[str]
-        if isinstance(key_name, tuple):
-            key_name = key_name[0]
-        self.__log.debug("key_name=%s", key_name)
+        Returns:
+            (key_name, key_state): EV_KEY 以外は (None, None)
+        """
+        if ev.type != EV_KEY:
+            return None, None
 
-        key_state = evdev.KeyEvent(ev).keystate
-        self.__log.debug("key_state=%s", key_state)
+        return KEY_NAMES[ev.code], ev.value
 
+    def _get_key_event_debug(self, ev):
+        """get_key_event() with debug log."""
+        key_name, key_state = type(self).get_key_event(self, ev)
+        if key_name is not None:
+            self.__dbg("key_name=%s, key_state=%s", key_name, key_state)
         return key_name, key_state
 
-    def read_loop(self, dev, cb_key_event):
-        """Read loop."""
-        self.__log.debug("dev=%s, cb_key_event=%s", dev, cb_key_event)
+    def get_key_code(self, ev):
+        """Get key event (integer code).
+
+        Returns:
+            (key_code, key_state): EV_KEY 以外は (None, None)
+        """
+        if ev.type != EV_KEY:
+            return None, None
+
+        return ev.code, ev.value
+
+    def _get_key_code_debug(self, ev):
+        """get_key_code() with debug log."""
+        code, key_state = type(self).get_key_code(self, ev)
+        if code is not None:
+            self.__dbg("key_code=%s, key_state=%s", code, key_state)
+        return code, key_state
+
+    def update_onkeys(self, onkeys: dict, key_name, key_state):
+        """Update onkeys (dict).
+
+        key_name は、キー名(str)でもキーコード(int)でもよい。
+        read loop 自体は `KeyState` を使う。
+        """
+        if key_state == evdev.KeyEvent.key_down:
+            # キーが押下されたら、onkeysに加える
+            onkeys[key_name] = 1
+
+        elif key_state == evdev.KeyEvent.key_hold:
+            # リピート
+            onkeys[key_name] = onkeys.get(key_name, 0) + 1
+
+        elif key_state == evdev.KeyEvent.key_up:
+            # キーが放されたら、onkeysから削除する
+            onkeys.pop(key_name, None)
+
+    def new_reader(
+        self,
+        dev,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        axes=None,
+    ) -> DevReader:
+        """Create per-device reader (multiple devices)."""
+        # デバイスごとに onkeys を持つ
+        onkeys = self.dev_onkeys.get(dev.path)
+        if onkeys is None:
+            onkeys = self.dev_onkeys[dev.path] = KeyState()
+        return DevReader(
+            self,
+            dev,
+            cb_key_event,
+            onkeys,
+            frame,
+            key_code=key_code,
+            stats=stats,
+            axes=axes,
+            debug=self.__debug,
+        )
+
+    def read_loop(
+        self,
+        dev,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        axes=None,
+    ):
+        """Read loop.
+
+        Args:
+            dev (InputDevice): 入力デバイス
+            cb_key_event:
+                frame=False: cb_key_event(key_name, key_state, onkeys)
+                frame=True: cb_key_event(frame, onkeys)
+                onkeys は `KeyState` (frame=True では `KeySnapshot`)。
+                False が返されると終了する。
+            frame (bool): SYN_REPORT 単位でまとめて呼び出す
+            key_code (bool): キー名の代わりにキーコード(int)を渡す
+            stats (LatencyStats): 入力遅延などを記録する (None: 記録しない)
+            axes (Axes): ゲームパッドの軸(EV_ABS)を処理する
+                (None: EV_ABS は無視する)
+        """
+        self.__log.debug(
+            "dev=%s, cb_key_event=%s, frame=%s", dev, cb_key_event, frame
+        )
 
         # self.onkeys.clear()
 
@@ -97,23 +377,311 @@ class PiBtInput:
             self.__log.error("cb_key_event=%s", cb_key_event)
             return
 
+        reader = DevReader(
+            self,
+            dev,
+            cb_key_event,
+            self.onkeys,
+            frame,
+            key_code=key_code,
+            with_dev=False,
+            stats=stats,
+            axes=axes,
+            debug=self.__debug,
+        )
+        feed = reader.feed
+
         for ev in dev.read_loop():
-            key_name, key_state = self.get_key_event(ev)
-            if not key_name:
-                continue
+            if not feed(ev):
+                break
 
-            if key_state == evdev.KeyEvent.key_down:
-                # キーが押下されたら、self.onkeysに加える
-                self.onkeys[key_name] = 1
+    def events(self, dev, key_code=False):
+        """Key events of dev as a generator (instead of a callback).
+
+        `read_loop()` と同じく `self.onkeys` を更新する。
+        ループを抜ける(break)と終了する。
+
+        Returns:
+            Stream: KeyEvent のイテレータ (keys(), take_while() などの
+                ステージで絞り込める)
+        """
+        from .stream import Stream, iter_key_events
+
+        self.__log.debug("dev=%s, key_code=%s", dev, key_code)
+        return Stream(iter_key_events(self, dev, self.onkeys, key_code))
+
+    def async_events(self, dev, key_code=False):
+        """Key events of dev as an async iterator.
+
+        Returns:
+            AsyncStream: `events()` の async 版
+        """
+        from .stream import AsyncStream, aiter_key_events
+
+        self.__log.debug("dev=%s, key_code=%s", dev, key_code)
+        return AsyncStream(aiter_key_events(self, dev, self.onkeys, key_code))
+
+    def fanout(self, dev, grab=True, key_code=False):
+        """Read dev once and fan out to multiple subscribers.
+
+        Returns:
+            FanOut: subscribe() してから run() する
+        """
+        from .fanout import FanOut
+
+        return FanOut(self, dev, grab, key_code, debug=self.__debug)
+
+    def select_read_loop(
+        self,
+        devs,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        axes=None,
+    ):
+        """Read loop for multiple devices (selectors/epoll).
+
+        一つのスレッドで全デバイスを待ち受け、読み込み可能になった
+        デバイスだけをノンブロッキングで読み切る。
+        アイドル中は select() でブロックするので、CPUを消費しない。
+
+        Args:
+            devs (list[InputDevice]): 入力デバイス
+            cb_key_event:
+                frame=False: cb_key_event(dev, key_name, key_state, onkeys)
+                frame=True: cb_key_event(dev, frame, onkeys)
+                いずれかのデバイスで False が返されると、全体が終了する。
+            frame (bool): SYN_REPORT 単位でまとめて呼び出す
+            key_code (bool): キー名の代わりにキーコード(int)を渡す
+            stats (LatencyStats): 全デバイス分をまとめて記録する
+            axes (Axes): `read_loop()` と同じ (デバイスごとに状態を持つ)
+        """
+        self.__log.debug(
+            "devs=%s, cb_key_event=%s, frame=%s", devs, cb_key_event, frame
+        )
 
-            if key_state == evdev.KeyEvent.key_hold:
-                # リピート
-                self.onkeys[key_name] += 1
+        if not cb_key_event:
+            self.__log.error("cb_key_event=%s", cb_key_event)
+            return
 
-            if key_state == evdev.KeyEvent.key_up:
-                # キーが放されたら、self.onkeysから削除する
-                del self.onkeys[key_name]
+        if not devs:
+            self.__log.error("devs=%s", devs)
+            return
 
-            ret = cb_key_event(key_name, key_state, self.onkeys)
-            if not ret:
-                break
+        with selectors.DefaultSelector() as sel:
+            for d in devs:
+                reader = self.new_reader(
+                    d, cb_key_event, frame, key_code, stats, axes
+                )
+                sel.register(d, selectors.EVENT_READ, reader)
+
+            while True:
+                # 準備ができたデバイスだけが返される
+                for sel_key, _ in sel.select():
+                    reader = sel_key.data
+
+                    try:
+                        events = tuple(reader.dev.read())
+                    except BlockingIOError:
+                        continue
+
+                    feed = reader.feed
+                    for ev in events:
+                        if not feed(ev):
+                            return
+
+    def watch_read_loop(
+        self,
+        keywords_list,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        axes=None,
+        on_disconnect=None,
+    ):
+        """Read loop for all matching devices, following hotplug.
+
+        `keywords_list` のいずれかに一致するデバイスをすべて読み込む。
+        `/dev/input` を監視し、デバイスが接続されたら追加し、
+        切断(ENODEV)されたら外して、読み込みを続ける。
+        デーモン(`pibtinput run`)など、長時間動かす場合に使う。
+
+        Args:
+            keywords_list (list[list[str]]):
+                `search_input_devs()` のキーワードのリスト
+            cb_key_event: `select_read_loop()` と同じ (第1引数は dev)
+            frame (bool): `select_read_loop()` と同じ
+            key_code (bool): `select_read_loop()` と同じ
+            stats (LatencyStats): `select_read_loop()` と同じ
+            axes (Axes): `select_read_loop()` と同じ
+            on_disconnect: デバイスを外したときに `on_disconnect(dev)` を呼ぶ
+        """
+        self.__log.debug(
+            "keywords_list=%s, cb_key_event=%s", keywords_list, cb_key_event
+        )
+
+        if not cb_key_event:
+            self.__log.error("cb_key_event=%s", cb_key_event)
+            return
+
+        readers: dict[str, DevReader] = {}
+
+        def remove(sel, path):
+            reader = readers.pop(path)
+            self.__log.info("disconnected: %s", reader.dev)
+            with contextlib.suppress(KeyError, ValueError):
+                sel.unregister(reader.dev)
+            self.dev_onkeys.pop(path, None)
+            if on_disconnect:
+                on_disconnect(reader.dev)
+
+        def sync(sel):
+            found = {}
+            for words in keywords_list:
+                for d in self.search_input_devs(words):
+                    found[d.path] = d
+
+            for path in list(readers):
+                if found.get(path) is not readers[path].dev:
+                    remove(sel, path)
+
+            for path, d in sorted(found.items()):
+                if path in readers:
+                    continue
+                self.__log.info("connected: %s", d)
+                readers[path] = self.new_reader(
+                    d, cb_key_event, frame, key_code, stats, axes
+                )
+                sel.register(d, selectors.EVENT_READ, readers[path])
+
+        with selectors.DefaultSelector() as sel:
+            reg_fd = -1
+            while True:
+                sync(sel)
+
+                # inotify が使えない(使えなくなった)場合は、定期的に走査
+                if self.registry.fileno() != reg_fd:
+                    if reg_fd >= 0:
+                        sel.unregister(reg_fd)
+                    reg_fd = self.registry.fileno()
+                    if reg_fd >= 0:
+                        sel.register(reg_fd, selectors.EVENT_READ, None)
+                timeout = None if reg_fd >= 0 else self.registry.POLL_INTERVAL
+
+                changed = False
+                while not changed:
+                    sel_keys = sel.select(timeout)
+                    if not sel_keys:
+                        break
+
+                    for sel_key, _ in sel_keys:
+                        reader = sel_key.data
+                        if reader is None:
+                            # /dev/input に変更あり
+                            changed = True
+                            continue
+
+                        try:
+                            events = tuple(reader.dev.read())
+                        except BlockingIOError:
+                            continue
+                        except OSError as _e:
+                            if _e.errno != errno.ENODEV:
+                                raise
+                            remove(sel, reader.dev.path)
+                            self.registry.drop(reader.dev.path)
+                            continue
+
+                        feed = reader.feed
+                        for ev in events:
+                            if not feed(ev):
+                                return
+
+    async def async_read_loop(
+        self,
+        devs,
+        cb_key_event,
+        frame=False,
+        key_code=False,
+        stats=None,
+        axes=None,
+    ):
+        """Async read loop for multiple devices.
+
+        全デバイスを一つのイベントループで並行して読み込む。
+
+        Args:
+            devs (list[InputDevice]): 入力デバイス
+            cb_key_event:
+                frame=False: cb_key_event(dev, key_name, key_state, onkeys)
+                frame=True: cb_key_event(dev, frame, onkeys)
+                通常の関数でもコルーチン関数でもよい。
+                いずれかのデバイスで False が返されると、全体が終了する。
+            frame (bool): SYN_REPORT 単位でまとめて呼び出す
+            key_code (bool): キー名の代わりにキーコード(int)を渡す
+            stats (LatencyStats): 全デバイス分をまとめて記録する
+            axes (Axes): `read_loop()` と同じ (デバイスごとに状態を持つ)
+        """
+        self.__log.debug(
+            "devs=%s, cb_key_event=%s, frame=%s", devs, cb_key_event, frame
+        )
+
+        if not cb_key_event:
+            self.__log.error("cb_key_event=%s", cb_key_event)
+            return
+
+        if not devs:
+            self.__log.error("devs=%s", devs)
+            return
+
+        readers = [
+            self.new_reader(d, cb_key_event, frame, key_code, stats, axes)
+            for d in devs
+        ]
+        tasks = [
+            asyncio.create_task(self._async_dev_loop(r)) for r in readers
+        ]
+        try:
+            done, _ = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # 例外があれば、呼び出し元に伝える
+        for t in done:
+            t.result()
+
+    async def _async_dev_loop(self, reader: DevReader):
+        """Async read loop for one device."""
+        dev = reader.dev
+        self.__log.debug("dev=%s", dev)
+
+        # 読み込み可能になったら ready をセット (level trigger)
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        fd = dev.fileno()
+        loop.add_reader(fd, ready.set)
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+
+                try:
+                    events = tuple(dev.read())
+                except BlockingIOError:
+                    continue
+
+                feed = reader.feed
+                for ev in events:
+                    ret = feed(ev)
+                    if inspect.isawaitable(ret):
+                        ret = await ret
+                    if not ret:
+                        return
+        finally:
+            loop.remove_reader(fd)
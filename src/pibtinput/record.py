@@ -0,0 +1,175 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Binary event recording and replay.
+
+File format (little endian):
+
+  header: MAGIC(8) + name_len(u16) + name(utf-8)
+  record: sec(u32), usec(u32), type(u16), code(u16), value(s32)  x N
+
+Usage:
+
+  with EventRecorder("a.rec", dev.name) as rec:
+      for ev in dev.read_loop():
+          rec.write(ev)
+
+  with ReplayDevice("a.rec", speed=0) as dev:
+      bt.read_loop(dev, cb)
+"""
+
+import contextlib
+import mmap
+import os
+import struct
+import time
+
+import evdev
+
+from .utils.mylogger import errmsg, get_logger
+
+MAGIC = b"PBTREC01"
+HDR_STRUCT = struct.Struct("<8sH")
+REC_STRUCT = struct.Struct("<IIHHi")
+
+
+class EventRecorder:
+    """Write raw input events to a binary file."""
+
+    def __init__(self, path: str, dev_name: str = "", debug=False) -> None:
+        """Constractor.
+
+        Args:
+            path: 出力ファイル
+            dev_name: デバイス名 (ヘッダーに記録)
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("path=%a, dev_name=%a", path, dev_name)
+
+        self.path = path
+        self.count = 0
+
+        name = dev_name.encode("utf-8")
+        # ヘッダーの書き込みに失敗したら閉じる。成功したら close() で閉じる
+        with contextlib.ExitStack() as stack:
+            self.f = stack.enter_context(open(path, "wb"))
+            self.f.write(HDR_STRUCT.pack(MAGIC, len(name)) + name)
+            self.closer = stack.pop_all()
+
+        self.pack = REC_STRUCT.pack
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, ev) -> None:
+        """Write one event."""
+        self.f.write(self.pack(ev.sec, ev.usec, ev.type, ev.code, ev.value))
+        self.count += 1
+
+    def close(self) -> None:
+        """Close."""
+        self.__log.debug("count=%s", self.count)
+        self.closer.close()
+
+
+class ReplayDevice:
+    """Replay recorded events (mmap).
+
+    `InputDevice` の代わりに `PiBtInput.read_loop()` に渡せる。
+    ファイルの最後まで再生すると、read_loop() が終了する。
+    """
+
+    # タイムスタンプは記録したときのもの (入力遅延は測れない)
+    live = False
+
+    def __init__(self, path: str, speed: float = 1.0, debug=False) -> None:
+        """Constractor.
+
+        Args:
+            path: 記録ファイル
+            speed: 再生速度 (1.0: 記録時と同じ, 0: 待たずに全速)
+
+        Raises:
+            ValueError: 記録ファイルではない
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("path=%a, speed=%s", path, speed)
+
+        self.path = path
+        self.speed = speed
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HDR_STRUCT.size:
+                raise ValueError(f"{path!r}: not a record file")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, name_len = HDR_STRUCT.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path!r}: not a record file")
+
+        off = HDR_STRUCT.size
+        self.name = self.mm[off : off + name_len].decode("utf-8")
+        self.data_offset = off + name_len
+
+        n_bytes = len(self.mm) - self.data_offset
+        self.n_events = n_bytes // REC_STRUCT.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __str__(self) -> str:
+        return f"replay {self.path}, name {self.name!r}"
+
+    def iter_raw(self):
+        """Iterate raw records (sec, usec, type, code, value)."""
+        end = self.data_offset + self.n_events * REC_STRUCT.size
+        view = memoryview(self.mm)[self.data_offset : end]
+        try:
+            yield from REC_STRUCT.iter_unpack(view)
+        finally:
+            view.release()
+
+    def read_loop(self):
+        """Yield events (InputDevice.read_loop() compatible)."""
+        InputEvent = evdev.InputEvent
+
+        if self.speed <= 0:
+            for rec in self.iter_raw():
+                yield InputEvent(*rec)
+            return
+
+        t_start = None
+        ts_start = 0.0
+        for rec in self.iter_raw():
+            ts = rec[0] + rec[1] / 1_000_000
+            if t_start is None:
+                t_start = time.monotonic()
+                ts_start = ts
+            else:
+                delay = (ts - ts_start) / self.speed
+                delay -= time.monotonic() - t_start
+                if delay > 0:
+                    time.sleep(delay)
+            yield InputEvent(*rec)
+
+    def close(self) -> None:
+        """Close."""
+        self.__log.debug("")
+        if self.mm.closed:
+            return
+
+        try:
+            self.mm.close()
+        except BufferError as _e:
+            # 再生中のイテレータが残っている
+            self.__log.warning(errmsg(_e))
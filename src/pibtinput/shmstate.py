@@ -0,0 +1,227 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Shared-memory key state (seqlock).
+
+押されているキーのビットマップと回数を、共有メモリ(/dev/shm の mmap)に
+書き出す。他のプロセスは、システムコールもコピーもなしに読める。
+
+  # 書く側 (read loop のステージ)
+  shm = ShmKeyState("/dev/shm/pibtinput.keys")
+  bt.read_loop(dev, shm.stage(cb))
+
+  # 読む側 (別プロセス)
+  keys = ShmKeyReader("/dev/shm/pibtinput.keys")
+  if keys.is_pressed(ecodes.KEY_A):
+      ...
+
+レイアウト (little endian):
+
+  0   magic(8)  "PBTSHM01"
+  8   seq(u64)       書き込み中は奇数
+  16  generation(u64)
+  24  bits(96)       キーコードごとのビット
+  128 holds(u32 x (KEY_MAX + 1))
+
+seqlock: 書く側は seq を奇数にしてから書き、終わったら偶数に戻す。
+読む側は、読む前後で seq が同じ偶数なら、その値を使う(違えば読み直す)。
+書く側は一つのプロセスだけにすること。
+"""
+
+import mmap
+import os
+from array import array
+
+from .keycodes import KEY_CODES, KEY_MAX
+from .keystate import bit_codes
+from .utils.mylogger import get_logger
+
+MAGIC = b"PBTSHM01"
+OFF_SEQ = 8
+OFF_GEN = 16
+OFF_BITS = 24
+N_BITS_BYTES = (KEY_MAX + 1 + 7) // 8
+OFF_HOLDS = 128
+SIZE = OFF_HOLDS + 4 * (KEY_MAX + 1)
+
+# 書き込み中のまま変わらない場合に、あきらめるまでの回数
+MAX_RETRY = 100_000
+
+
+def default_shm_path() -> str:
+    """Default path (/dev/shm)."""
+    return f"/dev/shm/pibtinput-{os.getuid()}.keys"
+
+
+class ShmKeyState:
+    """Publish key state to shared memory (writer)."""
+
+    def __init__(self, path: str = "", debug=False) -> None:
+        """Constractor.
+
+        Args:
+            path: 共有メモリのファイル ("": default_shm_path())
+
+        Raises:
+            OSError:
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+
+        self.path = path or default_shm_path()
+        self.__log.debug("path=%a", self.path)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self.mm = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+
+        view = memoryview(self.mm)
+        self.seqv = view[OFF_SEQ:OFF_GEN].cast("Q")
+        self.genv = view[OFF_GEN:OFF_BITS].cast("Q")
+        self.bitsv = view[OFF_BITS : OFF_BITS + N_BITS_BYTES]
+        self.holdsv = view[OFF_HOLDS:SIZE].cast("I")
+
+        # KeySnapshot を書くときの作業用
+        self.zeros = array("I", bytes(4 * (KEY_MAX + 1)))
+
+        self.seqv[0] = 0
+        self.mm[0:8] = MAGIC
+
+    def publish(self, onkeys) -> None:
+        """Write onkeys (KeyState or KeySnapshot)."""
+        seqv = self.seqv
+        seq = seqv[0] + 1
+        seqv[0] = seq  # 奇数: 書き込み中
+
+        self.genv[0] = onkeys.generation
+        self.bitsv[:] = onkeys.bits.to_bytes(N_BITS_BYTES, "little")
+        holds = getattr(onkeys, "holds", None)
+        if holds is not None:
+            self.holdsv[:] = holds
+        else:
+            holdsv = self.holdsv
+            holdsv[:] = self.zeros
+            for code, n in onkeys.counts.items():
+                holdsv[code] = n
+
+        seqv[0] = seq + 1
+
+    def stage(self, cb=None, frame=False):
+        """Make a read loop callback that publishes onkeys first.
+
+        Args:
+            cb: 続けて呼び出すコールバック (None: 呼び出さない)
+            frame: read loop の frame と同じ
+        """
+        publish = self.publish
+
+        def _cb(*args):
+            publish(args[-1])
+            return cb(*args) if cb else True
+
+        return _cb
+
+    def close(self, unlink=False) -> None:
+        """Close (and remove the file)."""
+        self.__log.debug("unlink=%s", unlink)
+        for v in (self.seqv, self.genv, self.bitsv, self.holdsv):
+            v.release()
+        self.mm.close()
+        if unlink:
+            os.unlink(self.path)
+
+
+class ShmKeyReader:
+    """Read key state from shared memory (no syscalls, no copies)."""
+
+    def __init__(self, path: str = "", debug=False) -> None:
+        """Constractor.
+
+        Raises:
+            OSError:
+            ValueError: 共有メモリのファイルではない
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+
+        self.path = path or default_shm_path()
+        self.__log.debug("path=%a", self.path)
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if os.fstat(fd).st_size < SIZE:
+                raise ValueError(f"{self.path!r}: not a key state file")
+            self.mm = mmap.mmap(fd, SIZE, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+
+        if self.mm[0:8] != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{self.path!r}: not a key state file")
+
+        view = memoryview(self.mm)
+        self.seqv = view[OFF_SEQ:OFF_GEN].cast("Q")
+        self.genv = view[OFF_GEN:OFF_BITS].cast("Q")
+        self.bitsv = view[OFF_BITS : OFF_BITS + N_BITS_BYTES]
+        self.holdsv = view[OFF_HOLDS:SIZE].cast("I")
+
+    @property
+    def seq(self) -> int:
+        """Sequence number (changes on every update)."""
+        return self.seqv[0]
+
+    @staticmethod
+    def to_code(key) -> int:
+        """Key name or code -> code."""
+        return key if isinstance(key, int) else KEY_CODES[key]
+
+    def count(self, key) -> int:
+        """Hold count of key (0: not pressed)."""
+        code = self.to_code(key)
+        seqv = self.seqv
+        holdsv = self.holdsv
+        for _ in range(MAX_RETRY):
+            s1 = seqv[0]
+            n = holdsv[code]
+            if not s1 & 1 and seqv[0] == s1:
+                return n
+        raise RuntimeError(f"{self.path!r}: writer stopped while writing")
+
+    def is_pressed(self, key) -> bool:
+        """Key is pressed now."""
+        code = self.to_code(key)
+        seqv = self.seqv
+        bitsv = self.bitsv
+        idx, bit = code >> 3, 1 << (code & 7)
+        for _ in range(MAX_RETRY):
+            s1 = seqv[0]
+            pressed = bitsv[idx] & bit
+            if not s1 & 1 and seqv[0] == s1:
+                return bool(pressed)
+        raise RuntimeError(f"{self.path!r}: writer stopped while writing")
+
+    def read(self) -> tuple[int, int, dict[int, int]]:
+        """Consistent snapshot.
+
+        Returns:
+            (seq, bits, {code: count})
+        """
+        seqv = self.seqv
+        for _ in range(MAX_RETRY):
+            s1 = seqv[0]
+            if s1 & 1:
+                continue
+            bits = int.from_bytes(self.bitsv, "little")
+            counts = {c: self.holdsv[c] for c in bit_codes(bits)}
+            if seqv[0] == s1:
+                return s1, bits, counts
+        raise RuntimeError(f"{self.path!r}: writer stopped while writing")
+
+    def close(self) -> None:
+        """Close."""
+        for v in (self.seqv, self.genv, self.bitsv, self.holdsv):
+            v.release()
+        self.mm.close()
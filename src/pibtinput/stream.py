@@ -0,0 +1,264 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Key event stream (generator / async iterator).
+
+コールバックの代わりに、キーイベントを順に取り出す。
+
+  for ev in bt.events(dev).keys("KEY_A", "KEY_B").states(1):
+      print(ev.key, ev.onkeys)
+
+  async for ev in bt.async_events(dev).take_while(lambda e: e.key != "q"):
+      ...
+
+各ステージ(keys, states, filter, map, actions, take_while, window)は
+イテレータを包むだけで、途中でリストを作らない。
+使ったステージの分だけ、1イベントあたりのコストが増える。
+
+KeyEvent.onkeys は、読み込みに使っている `KeyState` そのもの
+(次のイベントで更新される)。保持する場合は `snapshot()` する。
+"""
+
+import collections
+import itertools
+from typing import NamedTuple
+
+from .keycodes import KEY_CODES, KEY_MAX, KEY_NAMES
+from .keystate import KeyState
+
+
+class KeyEvent(NamedTuple):
+    """Key event."""
+
+    dev: object
+    key: str | int  # キー名 (key_code=True: キーコード)
+    state: int  # 0:up, 1:down, 2:hold
+    onkeys: KeyState
+    sec: int
+    usec: int
+
+
+def key_forms(keys) -> frozenset:
+    """Key names/codes -> set of both forms.
+
+    key_code の有無にかかわらず、`ev.key in key_forms(...)` で判定できる。
+
+    Raises:
+        ValueError: 不明なキー
+    """
+    forms: set = set()
+    for k in keys:
+        if isinstance(k, int):
+            if not 0 <= k <= KEY_MAX:
+                raise ValueError(f"invalid key code: {k}")
+            forms |= {k, KEY_NAMES[k]}
+        elif k in KEY_CODES:
+            forms |= {k, KEY_CODES[k]}
+        else:
+            raise ValueError(f"unknown key: {k!r}")
+    return frozenset(forms)
+
+
+def iter_key_events(bt, dev, onkeys: KeyState, key_code=False):
+    """Generate KeyEvent from dev."""
+    onkeys.key_code = key_code
+    keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+    get_key_code = bt.get_key_code
+    update = onkeys.update
+    # KeyEvent(...) より速い (Python の __new__ を通らない)
+    new = tuple.__new__
+
+    for ev in dev.read_loop():
+        code, key_state = get_key_code(ev)
+        if code is None:
+            continue
+        update(code, key_state)
+        yield new(
+            KeyEvent, (dev, keys[code], key_state, onkeys, ev.sec, ev.usec)
+        )
+
+
+async def aiter_key_events(bt, dev, onkeys: KeyState, key_code=False):
+    """Generate KeyEvent from dev (async)."""
+    onkeys.key_code = key_code
+    keys = range(KEY_MAX + 1) if key_code else KEY_NAMES
+    get_key_code = bt.get_key_code
+    update = onkeys.update
+    # KeyEvent(...) より速い (Python の __new__ を通らない)
+    new = tuple.__new__
+
+    async for ev in dev.async_read_loop():
+        code, key_state = get_key_code(ev)
+        if code is None:
+            continue
+        update(code, key_state)
+        yield new(
+            KeyEvent, (dev, keys[code], key_state, onkeys, ev.sec, ev.usec)
+        )
+
+
+def _action_table(table: dict) -> dict:
+    """{key or (key, state): action} -> accepting both key forms."""
+    ret = {}
+    for k, action in table.items():
+        key, state = k if isinstance(k, tuple) else (k, None)
+        for f in key_forms([key]):
+            ret[(f, state)] = action
+    return ret
+
+
+def _windows(it, n: int):
+    """Sliding windows (tuple of n items)."""
+    buf: collections.deque = collections.deque(maxlen=n)
+    for item in it:
+        buf.append(item)
+        if len(buf) == n:
+            yield tuple(buf)
+
+
+def _actions(it, table: dict):
+    """(action, ev) for events in table."""
+    get = table.get
+    for ev in it:
+        action = get((ev.key, ev.state))
+        if action is None:
+            action = get((ev.key, None))
+            if action is None:
+                continue
+        yield action, ev
+
+
+class Stream:
+    """Lazy stream of key events."""
+
+    __slots__ = ("_it",)
+
+    def __init__(self, it) -> None:
+        self._it = iter(it)
+
+    def __iter__(self):
+        return self._it
+
+    def __next__(self):
+        return next(self._it)
+
+    def keys(self, *keys) -> "Stream":
+        """Only these keys (names or codes)."""
+        forms = key_forms(keys)
+        return Stream(ev for ev in self._it if ev.key in forms)
+
+    def states(self, *states: int) -> "Stream":
+        """Only these key states."""
+        st = frozenset(states)
+        return Stream(ev for ev in self._it if ev.state in st)
+
+    def filter(self, pred) -> "Stream":
+        """Only events where pred(ev) is true."""
+        return Stream(filter(pred, self._it))
+
+    def map(self, func) -> "Stream":
+        """func(ev) for each event."""
+        return Stream(map(func, self._it))
+
+    def actions(self, table: dict) -> "Stream":
+        """(action, ev) for events in table.
+
+        Args:
+            table: {key: action} または {(key, state): action}
+                (key はキー名またはキーコード)
+        """
+        return Stream(_actions(self._it, _action_table(table)))
+
+    def take_while(self, pred) -> "Stream":
+        """Stop at the first event where pred(ev) is false."""
+        return Stream(itertools.takewhile(pred, self._it))
+
+    def window(self, n: int) -> "Stream":
+        """Sliding windows (tuple of the last n items)."""
+        if n < 1:
+            raise ValueError(f"invalid window size: {n}")
+        return Stream(_windows(self._it, n))
+
+
+class AsyncStream:
+    """Lazy async stream of key events (same stages as `Stream`)."""
+
+    __slots__ = ("_ait",)
+
+    def __init__(self, ait) -> None:
+        self._ait = ait.__aiter__()
+
+    def __aiter__(self):
+        return self._ait
+
+    async def __anext__(self):
+        return await self._ait.__anext__()
+
+    def keys(self, *keys) -> "AsyncStream":
+        """Only these keys (names or codes)."""
+        forms = key_forms(keys)
+        return self.filter(lambda ev: ev.key in forms)
+
+    def states(self, *states: int) -> "AsyncStream":
+        """Only these key states."""
+        st = frozenset(states)
+        return self.filter(lambda ev: ev.state in st)
+
+    def filter(self, pred) -> "AsyncStream":
+        """Only events where pred(ev) is true."""
+
+        async def _gen(ait):
+            async for ev in ait:
+                if pred(ev):
+                    yield ev
+
+        return AsyncStream(_gen(self._ait))
+
+    def map(self, func) -> "AsyncStream":
+        """func(ev) for each event."""
+
+        async def _gen(ait):
+            async for ev in ait:
+                yield func(ev)
+
+        return AsyncStream(_gen(self._ait))
+
+    def actions(self, table: dict) -> "AsyncStream":
+        """(action, ev) for events in table (see `Stream.actions()`)."""
+        get = _action_table(table).get
+
+        async def _gen(ait):
+            async for ev in ait:
+                action = get((ev.key, ev.state))
+                if action is None:
+                    action = get((ev.key, None))
+                    if action is None:
+                        continue
+                yield action, ev
+
+        return AsyncStream(_gen(self._ait))
+
+    def take_while(self, pred) -> "AsyncStream":
+        """Stop at the first event where pred(ev) is false."""
+
+        async def _gen(ait):
+            async for ev in ait:
+                if not pred(ev):
+                    return
+                yield ev
+
+        return AsyncStream(_gen(self._ait))
+
+    def window(self, n: int) -> "AsyncStream":
+        """Sliding windows (tuple of the last n items)."""
+        if n < 1:
+            raise ValueError(f"invalid window size: {n}")
+
+        async def _gen(ait):
+            buf: collections.deque = collections.deque(maxlen=n)
+            async for item in ait:
+                buf.append(item)
+                if len(buf) == n:
+                    yield tuple(buf)
+
+        return AsyncStream(_gen(self._ait))
@@ -0,0 +1,165 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Input device enumeration via sysfs.
+
+デバイスファイル(/dev/input/event*)を開かずに、
+/sys/class/input/event*/device/ から名前や capabilities を読む。
+読み込み権限が無いデバイスも一覧でき、ioctl も発行しない。
+
+  /sys/class/input/event3/device/
+    name, phys, uniq
+    id/{bustype,vendor,product,version}   (16進)
+    capabilities/{ev,key,abs,rel,msc,sw,led,snd,ff}
+
+capabilities はカーネルの unsigned long ごとの16進数 (上位から、空白区切り)。
+"""
+
+import os
+
+import evdev
+
+from .keystate import bit_codes
+from .utils.mylogger import errmsg, get_logger
+
+SYS_DIR = "/sys/class/input"
+
+# カーネルの unsigned long のビット数
+# (32bit のユーザーランドでも、カーネルが 64bit なら 64)
+LONG_BITS = 64 if "64" in os.uname().machine else 32
+
+# capabilities のファイル名 -> イベントタイプ
+CAP_FILES = {
+    "key": evdev.ecodes.EV_KEY,
+    "rel": evdev.ecodes.EV_REL,
+    "abs": evdev.ecodes.EV_ABS,
+    "msc": evdev.ecodes.EV_MSC,
+    "sw": evdev.ecodes.EV_SW,
+    "led": evdev.ecodes.EV_LED,
+    "snd": evdev.ecodes.EV_SND,
+    "ff": evdev.ecodes.EV_FF,
+}
+
+
+def parse_bitmap(text: str, long_bits: int = LONG_BITS) -> list[int]:
+    """sysfs bitmap ("120013 0 ...") -> bit numbers."""
+    bits = 0
+    for word in text.split():
+        bits = (bits << long_bits) | int(word, 16)
+    return bit_codes(bits)
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read().rstrip("\n")
+
+
+class SysfsDev:
+    """Input device described by sysfs (not opened).
+
+    `InputDevice` の代わりに、名前などの検索に使う。
+    """
+
+    __slots__ = ("caps", "info", "name", "path", "phys", "sys_path", "uniq")
+
+    def __init__(self, sys_path: str, path: str) -> None:
+        """Constractor.
+
+        Args:
+            sys_path: /sys/class/input/eventN
+            path: /dev/input/eventN
+
+        Raises:
+            OSError: 読めない (デバイスが無くなった など)
+        """
+        self.sys_path = sys_path
+        self.path = path
+
+        dev_dir = os.path.join(sys_path, "device")
+        self.name = _read(os.path.join(dev_dir, "name"))
+        self.phys = self._read_opt(os.path.join(dev_dir, "phys"))
+        self.uniq = self._read_opt(os.path.join(dev_dir, "uniq"))
+        self.info = evdev.DeviceInfo(
+            *(
+                int(_read(os.path.join(dev_dir, "id", f)), 16)
+                for f in ("bustype", "vendor", "product", "version")
+            )
+        )
+
+        # {EV_xxx: [code, ...]}  (EV_SYN などは ev の値だけ)
+        cap_dir = os.path.join(dev_dir, "capabilities")
+        ev_types = parse_bitmap(_read(os.path.join(cap_dir, "ev")))
+        self.caps: dict[int, list[int]] = {}
+        for f, ev_type in CAP_FILES.items():
+            if ev_type not in ev_types:
+                continue
+            codes = parse_bitmap(self._read_opt(os.path.join(cap_dir, f)))
+            if codes:
+                self.caps[ev_type] = codes
+
+    @staticmethod
+    def _read_opt(path: str) -> str:
+        try:
+            return _read(path)
+        except OSError:
+            return ""
+
+    def __str__(self) -> str:
+        return f"device {self.path}, name {self.name!r}, phys {self.phys!r}"
+
+    def capabilities(self) -> dict[int, list[int]]:
+        """Capabilities (codes only, like `InputDevice.capabilities()`)."""
+        return self.caps
+
+
+class SysfsInput:
+    """Enumerate input devices via sysfs."""
+
+    def __init__(
+        self, sys_dir: str = SYS_DIR, dev_dir: str = "/dev/input", debug=False
+    ) -> None:
+        """Constractor.
+
+        Args:
+            sys_dir: /sys/class/input
+            dev_dir: デバイスファイルのディレクトリ
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("sys_dir=%a, dev_dir=%a", sys_dir, dev_dir)
+
+        self.sys_dir = sys_dir
+        self.dev_dir = dev_dir
+
+    @classmethod
+    def probe(cls, dev_dir: str = "/dev/input", debug=False):
+        """SysfsInput if sysfs is available, otherwise None."""
+        if not os.path.isdir(SYS_DIR):
+            return None
+        return cls(SYS_DIR, dev_dir, debug=debug)
+
+    def describe(self, path: str) -> SysfsDev | None:
+        """SysfsDev of /dev/input/eventN (None: not in sysfs)."""
+        name = os.path.basename(path)
+        try:
+            return SysfsDev(os.path.join(self.sys_dir, name), path)
+        except (OSError, ValueError) as _e:
+            self.__log.debug("%s: %s", name, errmsg(_e))
+            return None
+
+    def list_devs(self) -> list[SysfsDev]:
+        """All event devices."""
+        try:
+            names = sorted(
+                n for n in os.listdir(self.sys_dir) if n.startswith("event")
+            )
+        except OSError as _e:
+            self.__log.debug("%s: %s", self.sys_dir, errmsg(_e))
+            return []
+
+        devs = []
+        for n in names:
+            d = self.describe(os.path.join(self.dev_dir, n))
+            if d is not None:
+                devs.append(d)
+        return devs
@@ -3,12 +3,14 @@
 #
 """CLI base"""
 
+import io
+import mmap
 import os
 import readline
 
 import blessed
 
-from .mylogger import errmsg, get_logger
+from .mylogger import errmsg, get_logger, hot_debug
 
 
 class CliBase:
@@ -263,16 +265,46 @@ class CliWithHistory(CliBase):
 
 
 class ScriptRunner(CliBase):
-    """Script Runner."""
+    """Script Runner.
 
-    def __init__(self, script_file, debug=False):
+    batch=True: スクリプトをまとめて(mmap で)読み、
+    CHUNK_SIZE ごとに行に分けて処理する (1行ずつ readline しない)。
+    PURE_HANDLE = True のサブクラスは、n_threads > 0 なら
+    handle() をスレッドプールで並列に呼ぶ (出力の順序は行の順)。
+    """
+
+    # handle() に副作用が無い (並列に呼んでもよい)
+    #   **TO BE OVERRIDE** (サブクラスで True にする)
+    PURE_HANDLE = False
+
+    # batch モードで一度に処理するバイト数 (行の途中では区切らない)
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, script_file, batch=False, n_threads=0, debug=False):
+        """Constractor.
+
+        Args:
+            script_file: スクリプトファイル
+            batch: まとめて読んで処理する
+            n_threads: handle() を並列に呼ぶスレッド数
+                (batch=True かつ PURE_HANDLE のときだけ, 0: 並列にしない)
+        """
         super().__init__("", debug=debug)
         self.__debug = debug
         self.__log = get_logger(self.__class__.__name__, debug=self.__debug)
-        self.__log.debug("script_file=%a", script_file)
+        self.__dbg = hot_debug(self.__log)
+        self.__log.debug(
+            "script_file=%a, batch=%s, n_threads=%s",
+            script_file,
+            batch,
+            n_threads,
+        )
 
         self.script_file = script_file
         self.script_f = None
+        self.batch = batch
+        self.n_threads = n_threads
+        self.n_lines = 0  # batch モードで処理した行数
 
     def start(self):
         """Start."""
@@ -283,7 +315,9 @@ class ScriptRunner(CliBase):
         self.__log.debug("script_file=%a", self.script_file)
 
         try:
-            self.script_f = open(self.script_file, "r", encoding="utf-8")
+            # batch モードはバイナリで開く (mmap する)
+            mode, encoding = ("rb", None) if self.batch else ("r", "utf-8")
+            self.script_f = open(self.script_file, mode, encoding=encoding)
         except Exception as _e:
             self.script_f = None
             msg = errmsg(_e)
@@ -312,6 +346,170 @@ class ScriptRunner(CliBase):
                 return instr
         raise EOFError
 
+    def loop(self):
+        """loop"""
+        if not self.batch:
+            super().loop()
+            return
+
+        pool = None
+        if self.n_threads > 0:
+            if self.PURE_HANDLE:
+                from concurrent.futures import ThreadPoolExecutor
+
+                pool = ThreadPoolExecutor(
+                    self.n_threads, thread_name_prefix="pibt-script"
+                )
+            else:
+                self.__log.warning(
+                    "handle() is not pure: n_threads=%s ignored",
+                    self.n_threads,
+                )
+
+        try:
+            for lines in self.read_chunks():
+                if pool:
+                    self.run_parallel(lines, pool)
+                else:
+                    self.run_lines(lines)
+        except KeyboardInterrupt as _e:
+            print("^C [Interrupt]")
+            self.__log.debug(errmsg(_e))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+            self.__log.debug("n_lines=%s", self.n_lines)
+
+    def read_chunks(self):
+        """Read the script in chunks.
+
+        Yields:
+            lines (list[str]): 改行付きの行 (readline() と同じ)
+        """
+        f = self.script_f
+        if not f:
+            return
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as _e:
+            # 空のファイル, パイプなど: まとめて read する
+            self.__log.debug(errmsg(_e))
+            while chunk := f.readlines(self.CHUNK_SIZE):
+                yield self._split(b"".join(chunk))
+            return
+
+        with mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                end = pos + self.CHUNK_SIZE
+                if end < size:
+                    nl = mm.find(b"\n", end)
+                    end = size if nl < 0 else nl + 1
+                yield self._split(mm[pos:end])
+                pos = end
+
+    @staticmethod
+    def _split(data: bytes) -> list[str]:
+        # newline=None: "\r\n" などは "\n" に (テキストモードの open と同じ)
+        return io.StringIO(data.decode("utf-8"), newline=None).readlines()
+
+    def run_lines(self, lines) -> None:
+        """Parse, handle and output lines one by one.
+
+        handle(), output_result() の例外は `CliBase.loop()` と同じく
+        ログに出して次の行に進む。
+
+        Raises:
+            EOFError: 終了 (END)  `CliBase.loop()` と同じ
+        """
+        dbg = self.__dbg
+        parse = self.parse_instr
+        handle = self.handle
+        output = self.output_result
+        ok = self.RESULT_STATUS["OK"]
+        end = self.RESULT_STATUS["END"]
+
+        for instr in lines:
+            self.n_lines += 1
+            parsed_data = parse(instr)
+            if dbg:
+                dbg("instr=%a, parsed_data=%s", instr, parsed_data)
+
+            parsed_status = parsed_data.get("status")
+            if parsed_status != ok:
+                if parsed_status == end:
+                    self.__log.warning(parsed_data)
+                    raise EOFError(parsed_data)
+                self.__log.warning(f"parse error: {parsed_status}")
+                continue
+
+            try:
+                result_data = handle(parsed_data)
+            except Exception as _e:
+                self.__log.warning(errmsg(_e))
+                continue
+            if result_data.get("status") == end:
+                msg = f"{result_data.get('data')}"
+                self.__log.warning(msg)
+                raise EOFError(msg)
+            try:
+                output(result_data)
+            except EOFError:
+                raise
+            except Exception as _e:
+                self.__log.warning(errmsg(_e))
+
+    def run_parallel(self, lines, pool) -> None:
+        """Parse lines, handle them in pool, and output in order.
+
+        Raises:
+            EOFError: 終了 (END)  `CliBase.loop()` と同じ
+        """
+        ok = self.RESULT_STATUS["OK"]
+        end = self.RESULT_STATUS["END"]
+
+        # 終了(END)の行より前だけを handle する
+        parsed = []
+        eof = None
+        for instr in lines:
+            self.n_lines += 1
+            parsed_data = self.parse_instr(instr)
+            parsed_status = parsed_data.get("status")
+            if parsed_status == ok:
+                parsed.append(parsed_data)
+                continue
+            if parsed_status == end:
+                self.__log.warning(parsed_data)
+                eof = EOFError(parsed_data)
+                break
+            self.__log.warning(f"parse error: {parsed_status}")
+
+        # map() は結果を入力の順に返す
+        for result_data in pool.map(self._handle, parsed):
+            if result_data is None:
+                continue
+            if result_data.get("status") == end:
+                msg = f"{result_data.get('data')}"
+                self.__log.warning(msg)
+                raise EOFError(msg)
+            try:
+                self.output_result(result_data)
+            except EOFError:
+                raise
+            except Exception as _e:
+                self.__log.warning(errmsg(_e))
+
+        if eof:
+            raise eof
+
+    def _handle(self, parsed_data: dict) -> dict | None:
+        try:
+            return self.handle(parsed_data)
+        except Exception as _e:
+            self.__log.warning(errmsg(_e))
+            return None
+
 
 class OneKeyCli(CliBase):
     """One key CLI"""
@@ -9,16 +9,20 @@ def click_common_opts(
     use_h: bool = True,
     use_d: bool = True,
     use_v: bool = False,
+    pkg_name: str = "",
 ):
-    """共通オプションをまとめたメタデコレータ"""
+    """共通オプションをまとめたメタデコレータ
+
+    ver_str が空で pkg_name が指定された場合、バージョンは
+    --version が指定されたときにパッケージのメタデータから調べる。
+    """
 
     def _decorator(func):
         decorators = []
 
-        if len(ver_str) > 0:
-            v_str = ver_str
-        else:
-            v_str = "_._._"
+        v_str: str | None = ver_str
+        if len(ver_str) == 0:
+            v_str = None if pkg_name else "_._._"
 
         # version option
         ver_opts = ["--version", "-V"]
@@ -26,7 +30,10 @@ def click_common_opts(
             ver_opts.append("-v")
         decorators.append(
             click.version_option(
-                v_str, *ver_opts, message="%(prog)s %(version)s"
+                v_str,
+                *ver_opts,
+                package_name=pkg_name or None,
+                message="%(prog)s %(version)s",
             )
         )
 
@@ -0,0 +1,130 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Minimal inotify wrapper (ctypes).
+
+Usage:
+
+  ino = Inotify()
+  ino.add_watch("/dev/input", Inotify.IN_CREATE | Inotify.IN_DELETE)
+
+  select.select([ino], [], [])
+  for wd, mask, cookie, name in ino.read():
+      ...
+
+  ino.close()
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+
+from .mylogger import get_logger
+
+_libc = None
+
+
+def _get_libc():
+    """Load libc (once)."""
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return _libc
+
+
+class Inotify:
+    """inotify."""
+
+    # <sys/inotify.h>
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+
+    # struct inotify_event: wd, mask, cookie, len, name[len]
+    EV_FMT = "iIII"
+    EV_SIZE = struct.calcsize(EV_FMT)
+
+    BUF_SIZE = 4096
+
+    def __init__(self, debug=False) -> None:
+        """Constractor.
+
+        Raises:
+            OSError: inotify が使えない
+        """
+        self.__debug = debug
+        self.__log = get_logger(self.__class__.__name__, self.__debug)
+        self.__log.debug("")
+
+        self.libc = _get_libc()
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), "inotify_init1")
+
+        self.watches: dict[int, str] = {}  # {wd: path}
+
+    def fileno(self) -> int:
+        """fileno."""
+        return self.fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Add watch.
+
+        Raises:
+            OSError: 監視できない (ディレクトリが無いなど)
+        """
+        self.__log.debug("path=%a, mask=0x%X", path, mask)
+
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(path), ctypes.c_uint32(mask)
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+
+        self.watches[wd] = path
+        return wd
+
+    def read(self) -> list[tuple[int, int, int, str]]:
+        """Read events (non-blocking).
+
+        Returns:
+            [(wd, mask, cookie, name), ...]: イベントが無ければ []
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, self.BUF_SIZE)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+
+            offset = 0
+            while offset < len(buf):
+                wd, mask, cookie, name_len = struct.unpack_from(
+                    self.EV_FMT, buf, offset
+                )
+                offset += self.EV_SIZE
+                name = buf[offset : offset + name_len].rstrip(b"\0")
+                offset += name_len
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+
+        return events
+
+    def close(self) -> None:
+        """Close."""
+        self.__log.debug("fd=%s", self.fd)
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -16,54 +16,102 @@ Usage:
       log = get_logger(__name__, debug=debug_flag)
       log.debug("....")
 
+Hot path (イベントごとの処理など):
+
+  class BBB:
+      def __init__(self, debug_flag):
+          self.__log = get_logger(__class__.__name__, debug=debug_flag)
+          # デバッグ無効時は None
+          self.__dbg = hot_debug(self.__log)
+
+      def cb(self, ev):
+          if self.__dbg:
+              self.__dbg("ev=%s", ev)
+
 """
 
-import inspect
-from logging import DEBUG, INFO, Formatter, StreamHandler, getLogger
+import os
+import sys
+from logging import DEBUG, INFO, Formatter, Logger, StreamHandler, getLogger
 
+FMT_HDR = "%(asctime)s %(levelname)s "
+FMT_LOC = "%(name)s.%(funcName)s:%(lineno)d> "
 
-def get_logger(name, debug=False):
-    """Get logger."""
-    filename = inspect.stack()[1].filename.split("/")[-1]
-    name = filename + "." + name
-    logger = getLogger(name)
 
-    # Prevent messages from being passed to the root logger
-    logger.propagate = False
+class StderrHandler(StreamHandler):
+    """StreamHandler that always writes to the current `sys.stderr`.
+
+    ハンドラを使い回しても、`contextlib.redirect_stderr()` や
+    pytest の capsys による差し替えに追従する。
+    """
+
+    @property  # type: ignore[override]
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, _stream):
+        pass
 
-    # Clear existing handlers to prevent duplicates
-    # if get_logger is called multiple times for the same name
-    if logger.handlers:
-        logger.handlers.clear()
 
-    # Create a new handler and formatter for each logger
-    fmt_hdr = "%(asctime)s %(levelname)s "
-    fmt_loc = "%(name)s.%(funcName)s:%(lineno)d> "
-    handler_fmt = Formatter(
-        fmt_hdr + fmt_loc + "%(message)s", datefmt="%H:%M:%S"
-    )
+# 全ロガーで共有するハンドラ
+_handler = StderrHandler()
+_handler.setFormatter(
+    Formatter(FMT_HDR + FMT_LOC + "%(message)s", "%H:%M:%S")
+)
+_handler.setLevel(DEBUG)
 
-    console_handler = StreamHandler()
-    console_handler.setFormatter(handler_fmt)
-    console_handler.setLevel(DEBUG)
 
-    logger.addHandler(console_handler)
-    logger.setLevel(INFO)  # Default logger level
+def _caller_filename() -> str:
+    """File name of the caller of get_logger().
 
+    `inspect.stack()` は全フレームのソースを読むので使わない。
+    """
+    try:
+        return os.path.basename(sys._getframe(2).f_code.co_filename)
+    except (AttributeError, ValueError):
+        return "?"
+
+
+def get_logger(name, debug=False) -> Logger:
+    """Get logger.
+
+    ロガーとハンドラはキャッシュされるので、何度呼び出しても安価。
+    レベルだけは、呼び出しのたびに debug に従って設定する。
+    """
     # [Important !! ]
     # isinstance()では、boolもintと判定されるので、
     # 先に bool かどうかを判定する
-
     if isinstance(debug, bool):
-        if debug:
-            logger.setLevel(DEBUG)
-        return logger
+        level = DEBUG if debug else INFO
+    elif isinstance(debug, int):
+        level = debug
+    else:
+        raise ValueError("invalid `debug` value: %s" % (debug))
+
+    logger = getLogger(_caller_filename() + "." + name)
+
+    if _handler not in logger.handlers:
+        # Prevent messages from being passed to the root logger
+        logger.propagate = False
+        logger.handlers.clear()
+        logger.addHandler(_handler)
+
+    if logger.level != level:
+        logger.setLevel(level)
+    return logger
+
 
-    if isinstance(debug, int):
-        logger.setLevel(debug)
-        return logger
+def hot_debug(logger: Logger):
+    """Debug log function for hot paths.
 
-    raise ValueError("invalid `debug` value: %s" % (debug))
+    デバッグが有効なら `logger.debug` を、無効なら None を返す。
+    `if dbg:` で判定すれば、無効時は引数の評価も
+    `isEnabledFor()` の呼び出しも行われない。
+    """
+    if logger.isEnabledFor(DEBUG):
+        return logger.debug
+    return None
 
 
 def errmsg(e) -> str:
@@ -0,0 +1,146 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""evdev テスト用のヘルパー
+
+実機 (/dev/input/event*) が無い環境でも、パイプ経由で
+`struct input_event` を流し込めるダミーデバイスを提供する。
+"""
+
+import errno
+import os
+import struct
+import time
+
+import evdev
+from evdev import ecodes
+from evdev.eventio_async import EventIO
+
+# struct input_event: timeval(sec, usec), type, code, value
+EV_FMT = "llHHi"
+EV_SIZE = struct.calcsize(EV_FMT)
+
+
+class PipeInputDevice(EventIO):
+    """Dummy InputDevice backed by a pipe."""
+
+    def __init__(self, name: str = "Pipe Device", idx: int = 0) -> None:
+        """Constractor."""
+        self.name = name
+        self.path = f"/dev/input/pipe{idx}"
+        self.phys = f"pipe/input{idx}"
+        self.uniq = ""
+
+        self.fd, self.wfd = os.pipe()
+        os.set_blocking(self.fd, False)
+
+        self.gone = False
+
+    def __str__(self) -> str:
+        return f"device {self.path}, name {self.name!r}, phys {self.phys!r}"
+
+    def pack(self, etype: int, code: int, value: int, ts=None) -> bytes:
+        """Pack one event."""
+        if ts is None:
+            ts = time.time()
+        sec = int(ts)
+        usec = int((ts - sec) * 1_000_000)
+        return struct.pack(EV_FMT, sec, usec, etype, code, value)
+
+    def write_raw(self, data: bytes) -> None:
+        """Write packed events."""
+        view = memoryview(data)
+        while view:
+            n = os.write(self.wfd, view)
+            view = view[n:]
+
+    def write_ev(self, etype: int, code: int, value: int, ts=None) -> None:
+        """Write one event."""
+        self.write_raw(self.pack(etype, code, value, ts))
+
+    def key(self, code: int, value: int, ts=None) -> None:
+        """Write one key event followed by SYN_REPORT."""
+        self.write_raw(
+            self.pack(ecodes.EV_KEY, code, value, ts)
+            + self.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0, ts)
+        )
+
+    def read(self):
+        """Read events (ENODEV after disconnect())."""
+        if self.gone:
+            raise OSError(errno.ENODEV, os.strerror(errno.ENODEV))
+        return super().read()
+
+    def disconnect(self) -> None:
+        """Simulate device removal."""
+        self.gone = True
+        os.write(self.wfd, b"\0")  # select() を起こす
+
+    def capabilities(self, verbose=False, absinfo=True) -> dict:
+        """Capabilities (EV_KEY only)."""
+        return {ecodes.EV_KEY: [ecodes.KEY_A]}
+
+    def close(self) -> None:
+        """Close."""
+        super().close()
+        for fd in (self.fd, self.wfd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def key_press_bytes(dev: PipeInputDevice, code: int, n_hold: int = 0):
+    """down, hold x n_hold, up (each with SYN_REPORT)."""
+    syn = (ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    evs = [(ecodes.EV_KEY, code, evdev.KeyEvent.key_down), syn]
+    for _ in range(n_hold):
+        evs += [(ecodes.EV_KEY, code, evdev.KeyEvent.key_hold), syn]
+    evs += [(ecodes.EV_KEY, code, evdev.KeyEvent.key_up), syn]
+    return b"".join(dev.pack(*e) for e in evs)
+
+
+class ListInputDevice:
+    """Dummy InputDevice that yields events from a list."""
+
+    def __init__(self, events: list, name: str = "List Device") -> None:
+        """Constractor."""
+        self.events = events
+        self.name = name
+        self.path = "/dev/input/list0"
+
+    def __str__(self) -> str:
+        return f"device {self.path}, name {self.name!r}"
+
+    def read_loop(self):
+        """Yield all events, then stop."""
+        yield from self.events
+
+    def close(self) -> None:
+        """Close."""
+
+
+def synthetic_events(n_ev: int, n_keys: int = 4, n_hold: int = 3) -> list:
+    """Synthetic key stream (each key event is followed by SYN_REPORT).
+
+    n_keys 個のキーを順に down, hold x n_hold, up する。
+    """
+    evs = []
+    i = 0
+    while len(evs) < n_ev * 2:
+        code = ecodes.KEY_A + i % n_keys
+        states = [evdev.KeyEvent.key_down]
+        states += [evdev.KeyEvent.key_hold] * n_hold
+        states += [evdev.KeyEvent.key_up]
+        for st in states:
+            ts = i * 0.001
+            sec = int(ts)
+            usec = int((ts - sec) * 1_000_000)
+            evs.append(evdev.InputEvent(sec, usec, ecodes.EV_KEY, code, st))
+            evs.append(
+                evdev.InputEvent(
+                    sec, usec, ecodes.EV_SYN, ecodes.SYN_REPORT, 0
+                )
+            )
+            i += 1
+    return evs[: n_ev * 2]
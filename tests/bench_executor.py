@@ -0,0 +1,97 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: command launch latency
+
+キーイベントごとに subprocess.Popen で起動する場合と、
+ActionExecutor (起動済みの sh ワーカー) に送る場合の、
+起動までの時間と、完了までの時間を比べる。
+
+デーモンのメモリが大きいほど fork が遅くなるので、
+--rss でダミーのメモリを確保して測ることもできる。
+
+Usage:
+  python tests/bench_executor.py [--rss MB]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pibtinput.executor import Action, ActionExecutor
+from pibtinput.latency import LatencyHist
+
+N_RUN = 200
+
+
+def show(name: str, hist: LatencyHist) -> None:
+    print(
+        f"  {name:<24}"
+        f" p50 {hist.percentile(50) / 1e6:7.2f} ms"
+        f" p99 {hist.percentile(99) / 1e6:7.2f} ms"
+    )
+
+
+def bench_popen(fifo: str) -> tuple[LatencyHist, LatencyHist]:
+    """subprocess.Popen per command."""
+    launch, total = LatencyHist(), LatencyHist()
+    with open(fifo, "rb", buffering=0) as f:
+        for _ in range(N_RUN):
+            t0 = time.monotonic_ns()
+            proc = subprocess.Popen(
+                ["/bin/sh", "-c", f"echo > {fifo}"], start_new_session=True
+            )
+            f.read(1)
+            launch.add(time.monotonic_ns() - t0)
+            proc.wait()
+            total.add(time.monotonic_ns() - t0)
+    return launch, total
+
+
+def bench_executor(fifo: str) -> tuple[LatencyHist, LatencyHist]:
+    """ActionExecutor."""
+    total = LatencyHist()
+    executor = ActionExecutor(n_workers=2)
+    action = Action(f"echo > {fifo}")
+    with open(fifo, "rb", buffering=0) as f:
+        for _ in range(N_RUN):
+            t0 = time.monotonic_ns()
+            executor.submit(action)
+            f.read(1)
+            executor.wait_idle()
+            total.add(time.monotonic_ns() - t0)
+    executor.close()
+    return executor.launch, total
+
+
+def main():
+    """Main."""
+    rss_mb = 0
+    if "--rss" in sys.argv:
+        rss_mb = int(sys.argv[sys.argv.index("--rss") + 1])
+    ballast = bytearray(rss_mb * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fifo = os.path.join(tmpdir, "fifo")
+        os.mkfifo(fifo)
+
+        # 書き込み側が無くても open できるように、ダミーの書き込み側を開く
+        wfd = os.open(fifo, os.O_RDWR)
+        print(f"ballast: {rss_mb} MB, {N_RUN} runs")
+        for name, bench in (
+            ("Popen", bench_popen),
+            ("ActionExecutor", bench_executor),
+        ):
+            launch, total = bench(fifo)
+            print(name)
+            show("launch (until started)", launch)
+            show("total (until finished)", total)
+        os.close(wfd)
+
+
+if __name__ == "__main__":
+    main()
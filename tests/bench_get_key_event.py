@@ -0,0 +1,63 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: get_key_event()
+
+従来の実装(辞書引き + isinstance + KeyEvent生成)と、
+`keycodes.KEY_NAMES` による実装の、1イベントあたりのコストを比べる。
+
+Usage:
+  python tests/bench_get_key_event.py
+"""
+
+import timeit
+
+import evdev
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+
+N_LOOP = 200_000
+
+
+def get_key_event_legacy(ev):
+    """従来の get_key_event (ログ呼び出しを除く)"""
+    if ev.type != evdev.ecodes.EV_KEY:
+        return None, None
+
+    key_name = evdev.ecodes.keys[ev.code]
+    if isinstance(key_name, tuple):
+        key_name = key_name[0]
+
+    key_state = evdev.KeyEvent(ev).keystate
+    return key_name, key_state
+
+
+def bench(func, ev) -> float:
+    """ns/event"""
+    t = min(timeit.repeat(lambda: func(ev), number=N_LOOP, repeat=5))
+    return t / N_LOOP * 1e9
+
+
+def main():
+    """Main."""
+    bt = PiBtInput()
+    evs = {
+        "KEY_A": evdev.InputEvent(0, 0, ecodes.EV_KEY, ecodes.KEY_A, 1),
+        "BTN_A": evdev.InputEvent(0, 0, ecodes.EV_KEY, ecodes.BTN_A, 2),
+        "SYN": evdev.InputEvent(0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0),
+    }
+    funcs = {
+        "legacy": get_key_event_legacy,
+        "get_key_event": bt.get_key_event,
+        "get_key_code": bt.get_key_code,
+    }
+
+    print(f"{'ns/event':>14}" + "".join(f"{k:>10}" for k in evs))
+    for name, func in funcs.items():
+        res = [bench(func, ev) for ev in evs.values()]
+        print(f"{name:>14}" + "".join(f"{r:10.1f}" for r in res))
+
+
+if __name__ == "__main__":
+    main()
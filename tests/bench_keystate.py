@@ -0,0 +1,72 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: onkeys (dict) vs KeyState
+
+従来の CmdInput.cb_ev のように、毎イベント
+「onkeys を更新 -> 前回と比較 -> copy()」する場合と、
+KeyState で「更新 -> 世代番号を比較」する場合を比べる。
+
+Usage:
+  python tests/bench_keystate.py
+"""
+
+import timeit
+
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.keycodes import KEY_NAMES
+from pibtinput.keystate import KEY_DOWN, KEY_HOLD, KEY_UP, KeyState
+
+N_LOOP = 2000
+
+
+def make_events(n_held: int) -> list[tuple[int, int]]:
+    """n_held 個のキーを押したまま、1つのキーを down/hold/up"""
+    evs = [(ecodes.KEY_A + i, KEY_DOWN) for i in range(n_held)]
+    code = ecodes.KEY_Z
+    evs += [(code, KEY_DOWN)] + [(code, KEY_HOLD)] * 8 + [(code, KEY_UP)]
+    evs += [(ecodes.KEY_A + i, KEY_UP) for i in range(n_held)]
+    return evs
+
+
+def run_dict(bt: PiBtInput, evs) -> None:
+    """dict"""
+    onkeys: dict = {}
+    prev: dict = {}
+    for code, state in evs:
+        bt.update_onkeys(onkeys, KEY_NAMES[code], state)
+        if onkeys != prev:
+            prev = onkeys.copy()
+
+
+def run_keystate(bt: PiBtInput, evs) -> None:
+    """KeyState"""
+    onkeys = KeyState()
+    prev_gen = -1
+    for code, state in evs:
+        onkeys.update(code, state)
+        if onkeys.generation != prev_gen:
+            prev_gen = onkeys.generation
+
+
+def main():
+    """Main."""
+    bt = PiBtInput()
+    print(f"{'held':>5} {'dict(ns/ev)':>12} {'KeyState(ns/ev)':>16}")
+    for n_held in (0, 2, 4, 8):
+        evs = make_events(n_held)
+        res = []
+        for func in (run_dict, run_keystate):
+            t = min(
+                timeit.repeat(
+                    lambda f=func: f(bt, evs), number=N_LOOP, repeat=5
+                )
+            )
+            res.append(t / N_LOOP / len(evs) * 1e9)
+        print(f"{n_held:5d} {res[0]:12.1f} {res[1]:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: get_logger() and disabled debug logging
+
+従来の get_logger (inspect.stack() + 毎回ハンドラを作り直す) と、
+キャッシュする get_logger の呼び出しコスト、
+および、それを使うクラスの生成コストを比べる。
+また、デバッグ無効時の 1イベントあたりのコストを比べる。
+
+Usage:
+  python tests/bench_logger.py
+"""
+
+import contextlib
+import inspect
+import os
+import timeit
+from logging import DEBUG, INFO, Formatter, StreamHandler, getLogger
+
+import evdev
+from evdev import ecodes
+
+from pibtinput import PiBtInput, get_logger, hot_debug
+from pibtinput.cmd_list import CmdList
+
+N_NEW = 2_000
+N_EV = 200_000
+
+
+def get_logger_legacy(name, debug=False):
+    """従来の get_logger"""
+    filename = inspect.stack()[1].filename.split("/")[-1]
+    name = filename + "." + name
+    logger = getLogger(name)
+    logger.propagate = False
+    if logger.handlers:
+        logger.handlers.clear()
+
+    console_handler = StreamHandler()
+    console_handler.setFormatter(
+        Formatter(
+            "%(asctime)s %(levelname)s "
+            "%(name)s.%(funcName)s:%(lineno)d> %(message)s",
+            datefmt="%H:%M:%S",
+        )
+    )
+    console_handler.setLevel(DEBUG)
+    logger.addHandler(console_handler)
+    logger.setLevel(DEBUG if debug else INFO)
+    return logger
+
+
+def bench(func, number: int) -> float:
+    """us/call"""
+    t = min(timeit.repeat(func, number=number, repeat=5))
+    return t / number * 1e6
+
+
+def main():
+    """Main."""
+    print("construction (us/call)")
+    res = {
+        "get_logger (legacy)": lambda: get_logger_legacy("Bench"),
+        "get_logger": lambda: get_logger("Bench"),
+        "PiBtInput()": lambda: PiBtInput(),
+        "CmdList([])": lambda: CmdList([]),
+    }
+    for name, func in res.items():
+        print(f"  {name:<24} {bench(func, N_NEW):10.2f}")
+
+    # デバッグ無効時の 1イベントあたりのコスト
+    log = get_logger("BenchEv", debug=False)
+    dbg = hot_debug(log)
+    ev = evdev.InputEvent(0, 0, ecodes.EV_KEY, ecodes.KEY_A, 1)
+    bt = PiBtInput()
+
+    def log_debug():
+        log.debug("key_name=%s, key_state=%s", "KEY_A", 1)
+
+    def guarded():
+        if dbg:
+            dbg("key_name=%s, key_state=%s", "KEY_A", 1)
+
+    print("\ndebug disabled (ns/event)")
+    res = {
+        "log.debug()": log_debug,
+        "hot_debug guard": guarded,
+        "get_key_event()": lambda: bt.get_key_event(ev),
+    }
+    for name, func in res.items():
+        print(f"  {name:<24} {bench(func, N_EV) * 1000:10.1f}")
+
+    # debug=True (出力は /dev/null)
+    with open(os.devnull, "w") as null, contextlib.redirect_stderr(null):
+        bt_dbg = PiBtInput(debug=True)
+        t = bench(lambda: bt_dbg.get_key_event(ev), N_EV // 10)
+    print(f"  {'get_key_event(debug)':<24} {t * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: Matcher
+
+登録数 (chord, hold, sequence を混在) を増やしたときの、
+1イベントあたりのコストを測る。
+比較のため、全 chord/hold を毎回走査する単純な実装も測る。
+
+Usage:
+  python tests/bench_matcher.py
+"""
+
+import random
+import time
+
+from evdev import ecodes
+
+from pibtinput.keycodes import KEY_NAMES
+from pibtinput.keystate import KEY_DOWN, KEY_HOLD, KeyState
+from pibtinput.matcher import Binding, Matcher
+
+N_BINDINGS = [10, 100, 1000, 5000]
+N_EVENTS = 50_000
+
+# 使うキー (KEY_A .. KEY_Z, 数字キー)
+KEYS = [
+    KEY_NAMES[c]
+    for c in list(range(ecodes.KEY_1, ecodes.KEY_0 + 1))
+    + list(range(ecodes.KEY_Q, ecodes.KEY_P + 1))
+    + list(range(ecodes.KEY_A, ecodes.KEY_L + 1))
+    + list(range(ecodes.KEY_Z, ecodes.KEY_M + 1))
+]
+MODS = ["KEY_LEFTCTRL", "KEY_LEFTSHIFT", "KEY_LEFTALT"]
+
+
+def make_specs(n: int, rnd: random.Random) -> list[str]:
+    """n bindings (chord : hold : sequence = 2 : 1 : 2)."""
+    specs: set[str] = set()
+    while len(specs) < n:
+        r = rnd.random()
+        if r < 0.4:
+            specs.add(rnd.choice(MODS) + "+" + rnd.choice(KEYS))
+        elif r < 0.6:
+            specs.add(f"{rnd.choice(KEYS)}*{rnd.randint(2, 30)}")
+        else:
+            k = rnd.randint(3, 6)
+            specs.add(" ".join(rnd.choice(KEYS) for _ in range(k)))
+    return sorted(specs)
+
+
+def make_events(n: int, rnd: random.Random) -> list[tuple[str, int]]:
+    """Random taps, chords and holds."""
+    evs: list[tuple[str, int]] = []
+    while len(evs) < n:
+        key = rnd.choice(KEYS)
+        mod = rnd.choice(MODS) if rnd.random() < 0.2 else None
+        if mod:
+            evs.append((mod, 1))
+        evs.append((key, 1))
+        evs += [(key, 2)] * rnd.choice([0, 0, 0, 5, 20])
+        evs.append((key, 0))
+        if mod:
+            evs.append((mod, 0))
+    return evs[:n]
+
+
+class LinearMatcher:
+    """全 chord/hold を毎回走査する (sequence は対象外)"""
+
+    def __init__(self, specs: list[str]) -> None:
+        self.bindings = [Binding(s, None) for s in specs]
+        self.bindings = [
+            b for b in self.bindings if b.kind != Binding.SEQUENCE
+        ]
+
+    def feed(self, key, key_state, onkeys) -> int:
+        n = 0
+        for b in self.bindings:
+            if b.steps[0] != onkeys.bits:
+                continue
+            if b.kind == Binding.CHORD and key_state == KEY_DOWN:
+                n += 1
+            elif b.kind == Binding.HOLD and key_state == KEY_HOLD:
+                if onkeys[key] == b.count:
+                    n += 1
+        return n
+
+
+def bench(feed, evs) -> float:
+    """ns/event"""
+    onkeys = KeyState()
+    codes = [(ecodes.ecodes[k], k, st) for k, st in evs]
+    best = float("inf")
+    for _ in range(3):
+        onkeys.clear()
+        t0 = time.perf_counter_ns()
+        for code, key, st in codes:
+            onkeys.update(code, st)
+            feed(key, st, onkeys)
+        best = min(best, time.perf_counter_ns() - t0)
+    return best / len(evs)
+
+
+def main():
+    """Main."""
+    rnd = random.Random(1)
+    evs = make_events(N_EVENTS, rnd)
+    n_match = [0]
+
+    def action(binding, onkeys):
+        n_match[0] += 1
+
+    print(
+        f"{'bindings':>9} {'compile(ms)':>12} {'Matcher(ns/ev)':>15}"
+        f" {'linear(ns/ev)':>14}"
+    )
+    for n in N_BINDINGS:
+        specs = make_specs(n, rnd)
+
+        m = Matcher()
+        for s in specs:
+            m.add(s, action)
+        t0 = time.perf_counter()
+        m.compile()
+        t_compile = (time.perf_counter() - t0) * 1e3
+
+        t_matcher = bench(m.feed, evs)
+        t_linear = bench(LinearMatcher(specs).feed, evs)
+        print(f"{n:9d} {t_compile:12.2f} {t_matcher:15.1f} {t_linear:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: read loops
+
+Usage:
+  python tests/bench_read_loop.py
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from _testbase_evdev import PipeInputDevice
+from evdev import InputEvent, ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.record import EventRecorder, ReplayDevice
+
+N_DEVS = [1, 2, 4, 8, 16, 32]
+N_EV_PER_DEV = 1000  # パイプのバッファ(64KiB)に収まる数
+N_ROUND = 2000
+
+
+def make_devs(n: int) -> list[PipeInputDevice]:
+    """ダミーデバイスを作る"""
+    return [PipeInputDevice(f"Bench Device {i}", i) for i in range(n)]
+
+
+def close_devs(devs: list[PipeInputDevice]) -> None:
+    """ダミーデバイスを閉じる"""
+    for d in devs:
+        d.close()
+
+
+def fill(dev: PipeInputDevice, n_ev: int) -> None:
+    """down/up を交互に n_ev 回書き込む(SYN付き)"""
+    data = b"".join(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_A, i % 2)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        for i in range(n_ev)
+    )
+    dev.write_raw(data)
+
+
+def run_async(bt: PiBtInput, devs, cb) -> None:
+    """async_read_loop"""
+    asyncio.run(bt.async_read_loop(devs, cb))
+
+
+def run_select(bt: PiBtInput, devs, cb) -> None:
+    """select_read_loop"""
+    bt.select_read_loop(devs, cb)
+
+
+LOOPS = {
+    "async": run_async,
+    "select": run_select,
+}
+
+
+def bench_throughput(run, n_devs: int) -> dict:
+    """events/sec"""
+    devs = make_devs(n_devs)
+    for d in devs:
+        fill(d, N_EV_PER_DEV)
+
+    total = n_devs * N_EV_PER_DEV
+    count = 0
+
+    def cb(dev, key_name, key_state, onkeys):
+        nonlocal count
+        count += 1
+        return count < total
+
+    bt = PiBtInput()
+    t0 = time.perf_counter()
+    run(bt, devs, cb)
+    elapsed = time.perf_counter() - t0
+    close_devs(devs)
+
+    return {"events": count, "ev_per_sec": count / elapsed}
+
+
+def bench_latency(run, n_devs: int) -> dict:
+    """write -> callback latency (ping-pong)
+
+    コールバックの中で、次のイベントを先頭のデバイスに書き込む。
+    (他のデバイスはアイドル)
+    アイドルなデバイスが増えたときの、1イベントあたりの遅延を測る。
+    """
+    devs = make_devs(n_devs)
+    lat = []
+    t_write = 0.0
+
+    def send(i):
+        nonlocal t_write
+        t_write = time.perf_counter()
+        devs[0].key(ecodes.KEY_A, i % 2)
+
+    def cb(dev, key_name, key_state, onkeys):
+        lat.append(time.perf_counter() - t_write)
+        if len(lat) >= N_ROUND:
+            return False
+        send(len(lat))
+        return True
+
+    send(0)
+    run(PiBtInput(), devs, cb)
+    close_devs(devs)
+
+    lat.sort()
+    return {
+        "p50_us": lat[len(lat) // 2] * 1e6,
+        "p99_us": lat[len(lat) * 99 // 100] * 1e6,
+    }
+
+
+def bench_chord(frame: bool, n_frames: int = 500, n_keys: int = 4) -> dict:
+    """chord: 1フレームに n_keys 個のキー
+
+    frame=False/True で、コールバックの呼び出し回数と時間を比べる。
+    """
+    dev = make_devs(1)[0]
+    codes = [ecodes.KEY_A + i for i in range(n_keys)]
+    data = b""
+    for i in range(n_frames):
+        data += b"".join(
+            dev.pack(ecodes.EV_KEY, c, (i + 1) % 2) for c in codes
+        )
+        data += dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    dev.write_raw(data)
+    dev.key(ecodes.KEY_Q, 1)
+
+    calls = 0
+
+    def cb(*args):
+        nonlocal calls
+        calls += 1
+        return "KEY_Q" not in args[-1]
+
+    t0 = time.perf_counter()
+    PiBtInput().read_loop(dev, cb, frame=frame)
+    elapsed = time.perf_counter() - t0
+    dev.close()
+
+    return {"calls": calls, "elapsed_ms": elapsed * 1e3}
+
+
+def bench_replay(n_ev: int = 100_000) -> dict:
+    """ReplayDevice -> read_loop: events/sec (speed=0)"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.rec")
+        with EventRecorder(path, "Bench") as rec:
+            for i in range(n_ev):
+                rec.write(
+                    InputEvent(0, i, ecodes.EV_KEY, ecodes.KEY_A, i % 2)
+                )
+                rec.write(
+                    InputEvent(0, i, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+                )
+
+        count = 0
+
+        def cb(key_name, key_state, onkeys):
+            nonlocal count
+            count += 1
+            return True
+
+        with ReplayDevice(path, speed=0) as dev:
+            t0 = time.perf_counter()
+            PiBtInput().read_loop(dev, cb)
+            elapsed = time.perf_counter() - t0
+
+    return {"events": count, "ev_per_sec": count / elapsed}
+
+
+def main():
+    """Main."""
+    print(
+        f"{'loop':>6} {'devs':>5} {'ev/sec':>12}"
+        f" {'p50(us)':>10} {'p99(us)':>10}"
+    )
+    for name, run in LOOPS.items():
+        for n in N_DEVS:
+            thr = bench_throughput(run, n)
+            lat = bench_latency(run, n)
+            print(
+                f"{name:>6} {n:5d} {thr['ev_per_sec']:12.0f}"
+                f" {lat['p50_us']:10.1f} {lat['p99_us']:10.1f}"
+            )
+
+    print()
+    print(f"{'chord':>6} {'calls':>8} {'ms':>8}")
+    for frame in (False, True):
+        res = bench_chord(frame)
+        mode = "frame" if frame else "key"
+        print(f"{mode:>6} {res['calls']:8d} {res['elapsed_ms']:8.2f}")
+
+    print()
+    res = bench_replay()
+    print(f"replay: {res['events']} events, {res['ev_per_sec']:.0f} ev/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: ScriptRunner throughput (lines/sec)
+
+1行ずつ readline する従来の loop() と、
+batch モード (mmap でまとめて読む) と、
+batch モード + スレッドプール (PURE_HANDLE) を比べる。
+
+--work で handle() 1回あたりの待ち時間 [ms] を指定すると、
+I/O 待ちのある handle() を並列に呼ぶ効果を測れる。
+
+Usage:
+  python tests/bench_script.py [--lines N] [--threads N] [--work MS]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from pibtinput.utils.clibase import ScriptRunner
+
+
+class Runner(ScriptRunner):
+    """Discard results."""
+
+    PURE_HANDLE = True
+    WORK = 0.0
+
+    def handle(self, parsed_data):
+        if self.WORK:
+            time.sleep(self.WORK)
+        return super().handle(parsed_data)
+
+    def output_result(self, result_data):
+        pass
+
+
+def bench(name: str, path: str, n_lines: int, **kwargs) -> None:
+    runner = Runner(path, **kwargs)
+    t0 = time.perf_counter()
+    runner.main()
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{name:<20} {elapsed:8.3f} sec  {n_lines / elapsed:12,.0f} lines/sec"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--work", type=float, default=0.0)
+    args = parser.parse_args()
+
+    n_lines = args.lines
+    if args.work:
+        Runner.WORK = args.work / 1000
+        n_lines = min(n_lines, 2000)
+
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(f"command {i} arg{i % 10}\n" for i in range(n_lines))
+
+        print(f"lines={n_lines}, threads={args.threads}, work={args.work}ms")
+        bench("loop", path, n_lines)
+        bench("batch", path, n_lines, batch=True)
+        bench(
+            f"batch x{args.threads}",
+            path,
+            n_lines,
+            batch=True,
+            n_threads=args.threads,
+        )
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark: events() and stream stages
+
+read_loop() (コールバック) と events() (ジェネレータ) の
+1イベントあたりのコスト、および、ステージを重ねたときのコストを比べる。
+
+Usage:
+  python tests/bench_stream.py
+"""
+
+import time
+
+from _testbase_evdev import ListInputDevice, synthetic_events
+
+from pibtinput import PiBtInput
+
+N_EV = 200_000
+
+
+def bench(func, evs) -> float:
+    """ns/event (best of 3)"""
+    best = float("inf")
+    for _ in range(3):
+        dev = ListInputDevice(evs)
+        t0 = time.perf_counter_ns()
+        func(PiBtInput(), dev)
+        best = min(best, time.perf_counter_ns() - t0)
+    return best / (len(evs) // 2)
+
+
+def read_loop(bt, dev):
+    bt.read_loop(dev, lambda k, s, o: True)
+
+
+def events(bt, dev):
+    for _ in bt.events(dev):
+        pass
+
+
+def events_keys(bt, dev):
+    for _ in bt.events(dev).keys("KEY_A"):
+        pass
+
+
+def events_4_stages(bt, dev):
+    s = (
+        bt.events(dev)
+        .take_while(lambda ev: ev.key != "KEY_Q")
+        .keys("KEY_A", "KEY_B")
+        .states(1, 2)
+        .window(2)
+    )
+    for _ in s:
+        pass
+
+
+CASES = {
+    "read_loop (callback)": read_loop,
+    "events()": events,
+    "events().keys()": events_keys,
+    "events() + 4 stages": events_4_stages,
+}
+
+
+def main():
+    """Main."""
+    evs = synthetic_events(N_EV)
+    for name, func in CASES.items():
+        print(f"{name:<24}{bench(func, evs):8.1f} ns/ev")
+
+
+if __name__ == "__main__":
+    main()
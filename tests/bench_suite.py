@@ -0,0 +1,327 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Benchmark suite for the event pipeline.
+
+合成したイベント列と、記録ファイルからの再生(ReplayDevice)を使って、
+ホットパスの events/sec と 1イベントあたりの遅延(p50/p99)を測り、
+結果を JSON で出力する。リリース間の比較には --baseline を使う。
+
+Usage:
+  python tests/bench_suite.py [-o result.json] [--baseline old.json]
+  python tests/bench_suite.py --quick
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from importlib.metadata import version as get_version
+
+import bench_read_loop
+import click
+from _testbase_evdev import (
+    ListInputDevice,
+    PipeInputDevice,
+    synthetic_events,
+)
+
+from pibtinput import PiBtInput
+from pibtinput.cmd_input import CmdInput
+from pibtinput.devregistry import DevRegistry
+from pibtinput.record import EventRecorder, ReplayDevice
+
+perf_ns = time.perf_counter_ns
+
+N_EVENTS = 20_000
+N_EVENTS_QUICK = 2_000
+N_LIST_DEVS = [1, 10, 50, 100]
+N_LIST_WARM = 200
+
+
+def percentiles(samples_ns: list[int]) -> dict:
+    """p50, p99 (us)."""
+    if not samples_ns:
+        return {"p50_us": None, "p99_us": None}
+    s = sorted(samples_ns)
+    return {
+        "p50_us": s[len(s) // 2] / 1000,
+        "p99_us": s[min(len(s) - 1, len(s) * 99 // 100)] / 1000,
+    }
+
+
+def result(name: str, params: dict, n_ev: int, elapsed_ns: int, samples):
+    """Make one result."""
+    res = {
+        "name": name,
+        "params": params,
+        "events": n_ev,
+        "ev_per_sec": n_ev / (elapsed_ns / 1e9) if elapsed_ns else None,
+    }
+    res.update(percentiles(samples))
+    return res
+
+
+@contextlib.contextmanager
+def log_mode(debug: bool):
+    """debug=True の場合、ログの出力先を /dev/null にする.
+
+    ロガーのハンドラは作成時の sys.stderr を使うので、
+    対象のオブジェクトは、このコンテキストの中で作ること。
+    """
+    if not debug:
+        yield
+        return
+
+    with open(os.devnull, "w") as null:
+        with contextlib.redirect_stderr(null):
+            yield
+
+
+def bench_get_key_event(events: list, debug: bool) -> dict:
+    """PiBtInput.get_key_event()"""
+    with log_mode(debug):
+        bt = PiBtInput(debug=debug)
+        get_key_event = bt.get_key_event
+        samples = []
+        t_start = perf_ns()
+        for ev in events:
+            t0 = perf_ns()
+            get_key_event(ev)
+            samples.append(perf_ns() - t0)
+        elapsed = perf_ns() - t_start
+
+    return result(
+        "get_key_event", {"debug": debug}, len(events), elapsed, samples
+    )
+
+
+def run_read_loop(dev, cb, debug: bool):
+    """read_loop() and per-callback intervals."""
+    stamps = []
+
+    def _cb(key_name, key_state, onkeys):
+        stamps.append(perf_ns())
+        return cb(key_name, key_state, onkeys)
+
+    with log_mode(debug):
+        bt = PiBtInput(debug=debug)
+        t_start = perf_ns()
+        bt.read_loop(dev, _cb)
+        elapsed = perf_ns() - t_start
+
+    samples = [b - a for a, b in zip(stamps, stamps[1:])]
+    return len(stamps), elapsed, samples
+
+
+def bench_loop_state(dev, source: str, debug: bool) -> dict:
+    """PiBtInput.read_loop() (KeyState tracking)"""
+    n_ev, elapsed, samples = run_read_loop(
+        dev, lambda *args: True, debug=debug
+    )
+    return result(
+        "read_loop",
+        {"source": source, "debug": debug},
+        n_ev,
+        elapsed,
+        samples,
+    )
+
+
+def bench_cmd_input(dev, source: str, debug: bool) -> dict:
+    """read_loop() -> CmdInput.cb_ev()"""
+    with open(os.devnull, "w") as null:
+        with contextlib.redirect_stdout(null), log_mode(debug):
+            app = CmdInput(["bench"], flag_repeat=True, debug=debug)
+            n_ev, elapsed, samples = run_read_loop(
+                dev, app.cb_ev, debug=debug
+            )
+            app.end()
+
+    return result(
+        "read_loop+CmdInput.cb_ev",
+        {"source": source, "debug": debug},
+        n_ev,
+        elapsed,
+        samples,
+    )
+
+
+def bench_list(n_devs: int) -> list[dict]:
+    """PiBtInput.search_input_devs() with n_devs devices.
+
+    cold: 最初の呼び出し (全デバイスを開いて capabilities を取得)
+    warm: 2回目以降 (キャッシュ)
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(n_devs):
+            open(os.path.join(tmpdir, f"event{i}"), "w").close()
+
+        devs = []
+
+        def open_dev(path):
+            dev = PipeInputDevice(f"Bench Device {len(devs)}", len(devs))
+            dev.path = path
+            devs.append(dev)
+            return dev
+
+        bt = PiBtInput()
+        bt._registry = DevRegistry(tmpdir, open_dev)
+
+        t0 = perf_ns()
+        found = bt.search_input_devs(["Bench"])
+        cold = perf_ns() - t0
+        assert len(found) == n_devs
+
+        samples = []
+        for _ in range(N_LIST_WARM):
+            t0 = perf_ns()
+            bt.search_input_devs(["Bench"])
+            samples.append(perf_ns() - t0)
+
+        bt.close()
+
+    params = {"devs": n_devs}
+    res_cold = {"name": "list_cold", "params": params, "us": cold / 1000}
+    res_warm = {"name": "list_warm", "params": params}
+    res_warm.update(percentiles(samples))
+    return [res_cold, res_warm]
+
+
+def bench_multi_devs(n_devs: int) -> list[dict]:
+    """select/async read loops over n_devs devices (bench_read_loop)"""
+    results = []
+    for loop_name, run in bench_read_loop.LOOPS.items():
+        thr = bench_read_loop.bench_throughput(run, n_devs)
+        lat = bench_read_loop.bench_latency(run, n_devs)
+        res = {
+            "name": f"{loop_name}_read_loop",
+            "params": {"devs": n_devs},
+            "events": thr["events"],
+            "ev_per_sec": thr["ev_per_sec"],
+        }
+        res.update(lat)
+        results.append(res)
+    return results
+
+
+def run_all(n_events: int) -> list[dict]:
+    """Run all benchmarks."""
+    events = synthetic_events(n_events)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        rec_file = os.path.join(tmpdir, "bench.rec")
+        with EventRecorder(rec_file, "Bench") as rec:
+            for ev in events:
+                rec.write(ev)
+
+        for debug in (False, True):
+            results.append(bench_get_key_event(events, debug))
+
+            for source in ("synthetic", "replay"):
+                for bench in (bench_loop_state, bench_cmd_input):
+                    if source == "synthetic":
+                        res = bench(ListInputDevice(events), source, debug)
+                    else:
+                        with ReplayDevice(rec_file, speed=0) as dev:
+                            res = bench(dev, source, debug)
+                    results.append(res)
+
+    for n in N_LIST_DEVS:
+        results += bench_list(n)
+
+    for n in (1, 8, 32):
+        results += bench_multi_devs(n)
+
+    return results
+
+
+def result_key(res: dict) -> str:
+    """Key to compare results."""
+    params = ",".join(f"{k}={v}" for k, v in sorted(res["params"].items()))
+    return f"{res['name']}[{params}]"
+
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    """Print results (and ratio to baseline)."""
+    base = {}
+    if baseline:
+        base = {result_key(r): r for r in baseline["results"]}
+
+    print(
+        f"{'benchmark':<58} {'ev/sec':>10} {'p50(us)':>9} {'p99(us)':>9}"
+        f" {'vs base':>8}"
+    )
+    for res in results:
+        key = result_key(res)
+        ev_per_sec = res.get("ev_per_sec")
+        p50 = res.get("p50_us", res.get("us"))
+        p99 = res.get("p99_us")
+
+        ratio = ""
+        b = base.get(key)
+        if b:
+            b_p50 = b.get("p50_us", b.get("us"))
+            if ev_per_sec and b.get("ev_per_sec"):
+                ratio = f"{ev_per_sec / b['ev_per_sec']:.2f}x"
+            elif p50 and b_p50:
+                ratio = f"{b_p50 / p50:.2f}x"
+
+        print(
+            f"{key:<58}"
+            f" {ev_per_sec or 0:10.0f}"
+            f" {p50 or 0:9.2f}"
+            f" {p99 or 0:9.2f}"
+            f" {ratio:>8}"
+        )
+
+
+@click.command()
+@click.option("--output", "-o", type=click.Path(dir_okay=False))
+@click.option(
+    "--baseline",
+    "-b",
+    type=click.Path(exists=True, dir_okay=False),
+    help="previous result (JSON) to compare",
+)
+@click.option("--quick", is_flag=True, help="fewer events")
+def main(output, baseline, quick):
+    """Run benchmark suite."""
+    n_events = N_EVENTS_QUICK if quick else N_EVENTS
+
+    try:
+        pkg_version = get_version("pibtinput")
+    except Exception:
+        pkg_version = "_._._"
+
+    data = {
+        "meta": {
+            "pibtinput": pkg_version,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "events": n_events,
+        },
+        "results": run_all(n_events),
+    }
+
+    base_data = None
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            base_data = json.load(f)
+    print_results(data["results"], base_data)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"\n* {output}")
+
+
+if __name__ == "__main__":
+    main()
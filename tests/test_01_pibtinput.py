@@ -0,0 +1,377 @@
+# tests/test_01_pibtinput.py
+#
+# PiBtInput のテスト (パイプによるダミーデバイスを使用)
+#
+import asyncio
+import os
+import threading
+import time
+
+import evdev
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.devregistry import DevRegistry
+
+KEY_DOWN = evdev.KeyEvent.key_down
+KEY_HOLD = evdev.KeyEvent.key_hold
+KEY_UP = evdev.KeyEvent.key_up
+
+
+@pytest.fixture
+def devs():
+    """ダミーデバイス x 3"""
+    _devs = [PipeInputDevice(f"Pipe Device {i}", i) for i in range(3)]
+    yield _devs
+    for d in _devs:
+        d.close()
+
+
+class TestReadLoop:
+    """read_loop()"""
+
+    def test_read_loop(self, devs):
+        dev = devs[0]
+        dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=2))
+
+        bt = PiBtInput()
+        got = []
+
+        def cb(key_name, key_state, onkeys):
+            got.append((key_name, key_state, dict(onkeys)))
+            return key_state != KEY_UP
+
+        bt.read_loop(dev, cb)
+        assert got == [
+            ("KEY_A", KEY_DOWN, {"KEY_A": 1}),
+            ("KEY_A", KEY_HOLD, {"KEY_A": 2}),
+            ("KEY_A", KEY_HOLD, {"KEY_A": 3}),
+            ("KEY_A", KEY_UP, {}),
+        ]
+
+
+class TestAsyncReadLoop:
+    """async_read_loop()"""
+
+    @pytest.mark.parametrize("use_coro", [False, True])
+    def test_multi_devs(self, devs, use_coro):
+        for d in devs:
+            d.key(ecodes.KEY_A, KEY_DOWN)
+        devs[1].key(ecodes.KEY_B, KEY_DOWN)
+        devs[2].key(ecodes.KEY_Q, KEY_DOWN)
+
+        bt = PiBtInput()
+        got = {d.path: [] for d in devs}
+
+        def cb(dev, key_name, key_state, onkeys):
+            got[dev.path].append(sorted(onkeys))
+            return key_name != "KEY_Q"
+
+        async def acb(dev, key_name, key_state, onkeys):
+            await asyncio.sleep(0)
+            return cb(dev, key_name, key_state, onkeys)
+
+        asyncio.run(bt.async_read_loop(devs, acb if use_coro else cb))
+
+        # onkeys はデバイスごとに独立
+        assert got[devs[0].path] == [["KEY_A"]]
+        assert got[devs[1].path] == [["KEY_A"], ["KEY_A", "KEY_B"]]
+        assert got[devs[2].path][-1] == ["KEY_A", "KEY_Q"]
+
+    def test_exception(self, devs):
+        devs[0].key(ecodes.KEY_A, KEY_DOWN)
+
+        def cb(dev, key_name, key_state, onkeys):
+            raise ValueError(key_name)
+
+        with pytest.raises(ValueError):
+            asyncio.run(PiBtInput().async_read_loop(devs, cb))
+
+
+class TestSelectReadLoop:
+    """select_read_loop()"""
+
+    def test_multi_devs(self, devs):
+        devs[0].key(ecodes.KEY_A, KEY_DOWN)
+        devs[2].key(ecodes.KEY_B, KEY_DOWN)
+        devs[2].key(ecodes.KEY_B, KEY_HOLD)
+        devs[0].key(ecodes.KEY_Q, KEY_DOWN)
+
+        bt = PiBtInput()
+        got = []
+
+        def cb(dev, key_name, key_state, onkeys):
+            got.append((dev.path, key_name, sorted(onkeys.items())))
+            return len(got) < 4
+
+        bt.select_read_loop(devs, cb)
+
+        assert sorted(got) == [
+            (devs[0].path, "KEY_A", [("KEY_A", 1)]),
+            (devs[0].path, "KEY_Q", [("KEY_A", 1), ("KEY_Q", 1)]),
+            (devs[2].path, "KEY_B", [("KEY_B", 1)]),
+            (devs[2].path, "KEY_B", [("KEY_B", 2)]),
+        ]
+        assert bt.dev_onkeys[devs[1].path] == {}
+
+
+class TestFrame:
+    """frame=True"""
+
+    def chord(self, dev, codes, value):
+        """同じ SYN_REPORT 内で複数のキー"""
+        data = b"".join(dev.pack(ecodes.EV_KEY, c, value) for c in codes)
+        dev.write_raw(data + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+
+    def test_read_loop(self, devs):
+        dev = devs[0]
+        self.chord(dev, [ecodes.KEY_A, ecodes.KEY_B], KEY_DOWN)
+        self.chord(dev, [ecodes.KEY_A], KEY_HOLD)
+        self.chord(dev, [ecodes.KEY_A, ecodes.KEY_B], KEY_UP)
+
+        bt = PiBtInput()
+        got = []
+
+        def cb(frame, onkeys):
+            got.append((frame, onkeys))
+            return bool(onkeys)
+
+        bt.read_loop(dev, cb, frame=True)
+        assert got == [
+            (
+                [("KEY_A", KEY_DOWN), ("KEY_B", KEY_DOWN)],
+                {"KEY_A": 1, "KEY_B": 1},
+            ),
+            ([("KEY_A", KEY_HOLD)], {"KEY_A": 2, "KEY_B": 1}),
+            ([("KEY_A", KEY_UP), ("KEY_B", KEY_UP)], {}),
+        ]
+        # スナップショットなので、後から変化しない
+        assert got[0][1] == {"KEY_A": 1, "KEY_B": 1}
+
+    def test_syn_dropped(self, devs):
+        dev = devs[0]
+        dev.write_raw(
+            dev.pack(ecodes.EV_KEY, ecodes.KEY_A, KEY_DOWN)
+            + dev.pack(ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+            + dev.pack(ecodes.EV_KEY, ecodes.KEY_B, KEY_DOWN)
+            + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        )
+        self.chord(dev, [ecodes.KEY_Q], KEY_DOWN)
+
+        got = []
+
+        def cb(dev, frame, onkeys):
+            got.append(frame)
+            return False
+
+        PiBtInput().select_read_loop(devs, cb, frame=True)
+        assert got == [[("KEY_Q", KEY_DOWN)]]
+
+
+class ResyncDevice(PipeInputDevice):
+    """PipeInputDevice with active_keys()."""
+
+    active = ()
+
+    def active_keys(self, verbose=False):
+        return list(self.active)
+
+
+class TestResync:
+    """SYN_DROPPED の後、active_keys() から読み直す"""
+
+    def write_dropped(self, dev):
+        """A, B を押し、溢れた間に A を放して C を押す"""
+        dev.write_raw(
+            dev.pack(ecodes.EV_KEY, ecodes.KEY_A, KEY_DOWN)
+            + dev.pack(ecodes.EV_KEY, ecodes.KEY_B, KEY_DOWN)
+            + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+            + dev.pack(ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+            + dev.pack(ecodes.EV_KEY, ecodes.KEY_A, KEY_UP)
+            + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        )
+        dev.key(ecodes.KEY_Q, KEY_DOWN)
+        dev.active = (ecodes.KEY_B, ecodes.KEY_C)
+
+    def test_frame(self):
+        dev = ResyncDevice()
+        self.write_dropped(dev)
+
+        got = []
+
+        def cb(frame, onkeys):
+            got.append((frame, dict(onkeys)))
+            return ("KEY_Q", KEY_DOWN) not in frame
+
+        PiBtInput().read_loop(dev, cb, frame=True)
+        dev.close()
+        assert got == [
+            (
+                [("KEY_A", KEY_DOWN), ("KEY_B", KEY_DOWN)],
+                {"KEY_A": 1, "KEY_B": 1},
+            ),
+            (
+                [("KEY_A", KEY_UP), ("KEY_C", KEY_DOWN)],
+                {"KEY_B": 1, "KEY_C": 1},
+            ),
+            ([("KEY_Q", KEY_DOWN)], {"KEY_B": 1, "KEY_C": 1, "KEY_Q": 1}),
+        ]
+
+    def test_key(self):
+        dev = ResyncDevice()
+        self.write_dropped(dev)
+
+        got = []
+
+        def cb(key_name, key_state, onkeys):
+            got.append((key_name, key_state))
+            return key_name != "KEY_Q"
+
+        PiBtInput().read_loop(dev, cb)
+        dev.close()
+        assert got == [
+            ("KEY_A", KEY_DOWN),
+            ("KEY_B", KEY_DOWN),
+            ("KEY_A", KEY_UP),  # 合成したイベント
+            ("KEY_C", KEY_DOWN),
+            ("KEY_Q", KEY_DOWN),
+        ]
+
+
+class TestKeyCode:
+    """key_code=True"""
+
+    def test_read_loop(self, devs):
+        dev = devs[0]
+        dev.write_raw(key_press_bytes(dev, ecodes.KEY_RESERVED, n_hold=1))
+
+        got = []
+
+        def cb(key_code, key_state, onkeys):
+            got.append((key_code, key_state, dict(onkeys)))
+            return key_state != KEY_UP
+
+        PiBtInput().read_loop(dev, cb, key_code=True)
+        assert got == [
+            (ecodes.KEY_RESERVED, KEY_DOWN, {ecodes.KEY_RESERVED: 1}),
+            (ecodes.KEY_RESERVED, KEY_HOLD, {ecodes.KEY_RESERVED: 2}),
+            (ecodes.KEY_RESERVED, KEY_UP, {}),
+        ]
+
+
+class TestSupervisedReadLoop:
+    """supervised_read_loop()"""
+
+    def test_reconnect(self, tmp_path):
+        opened = []
+
+        def open_dev(path):
+            dev = PipeInputDevice("8BitDo Micro", len(opened))
+            dev.path = path
+            opened.append(dev)
+            return dev
+
+        bt = PiBtInput()
+        bt._registry = DevRegistry(str(tmp_path), open_dev)
+        assert bt.registry.inotify is not None
+
+        # 最初はデバイスが無い: 別スレッドで後から作る
+        def connect(name, code):
+            (tmp_path / name).touch()
+            while not opened or opened[-1].path != str(tmp_path / name):
+                time.sleep(0.01)
+            opened[-1].key(code, KEY_DOWN)
+
+        threading.Timer(0.1, connect, ("event0", ecodes.KEY_A)).start()
+
+        got = []
+
+        def cb(key_name, key_state, onkeys):
+            got.append(dict(onkeys))
+            if key_name == "KEY_A":
+                # 切断して、別のノードで再接続
+                (tmp_path / "event0").unlink()
+                opened[0].disconnect()
+                threading.Timer(
+                    0.1, connect, ("event1", ecodes.KEY_Q)
+                ).start()
+            return key_name != "KEY_Q"
+
+        connected = []
+        bt.supervised_read_loop(
+            ["8BitDo"], cb, on_connect=lambda d: connected.append(d.path)
+        )
+        bt.close()
+
+        # 再接続後の onkeys に KEY_A は残らない
+        assert got == [{"KEY_A": 1}, {"KEY_Q": 1}]
+        assert connected == [
+            str(tmp_path / "event0"),
+            str(tmp_path / "event1"),
+        ]
+        assert len(bt.reconnects) == 1
+        assert bt.reconnects[0]["path"] == str(tmp_path / "event1")
+        assert bt.reconnects[0]["downtime"] >= 0.1
+        for d in opened:
+            d.close()
+
+
+class TestWatchReadLoop:
+    """watch_read_loop()"""
+
+    def test_hotplug(self, tmp_path):
+        opened = {}
+
+        def open_dev(path):
+            name = os.path.basename(path)
+            dev = PipeInputDevice(
+                "Keyboard" if name == "event9" else "8BitDo Micro",
+                len(opened),
+            )
+            dev.path = path
+            opened[name] = dev
+            return dev
+
+        bt = PiBtInput()
+        bt._registry = DevRegistry(str(tmp_path), open_dev)
+        (tmp_path / "event0").touch()
+        (tmp_path / "event9").touch()
+
+        def plug(name, code):
+            (tmp_path / name).touch()
+            while name not in opened:
+                time.sleep(0.01)
+            opened[name].key(code, KEY_DOWN)
+
+        got = []
+
+        def cb(dev, key_name, key_state, onkeys):
+            got.append((os.path.basename(dev.path), key_name))
+            if key_name == "KEY_B":
+                # event0 を外して、event1 を接続
+                (tmp_path / "event0").unlink()
+                opened["event0"].disconnect()
+                threading.Timer(0.1, plug, ("event1", ecodes.KEY_Q)).start()
+            return key_name != "KEY_Q"
+
+        removed = []
+
+        def on_disconnect(dev):
+            removed.append(os.path.basename(dev.path))
+
+        bt.registry.update()
+        opened["event9"].key(ecodes.KEY_A, KEY_DOWN)
+        opened["event0"].key(ecodes.KEY_B, KEY_DOWN)
+        bt.watch_read_loop(
+            [["8BitDo"], ["Keyboard"]], cb, on_disconnect=on_disconnect
+        )
+        bt.close()
+
+        assert sorted(got[:2]) == [("event0", "KEY_B"), ("event9", "KEY_A")]
+        assert got[2:] == [("event1", "KEY_Q")]
+        assert removed == ["event0"]
+        assert str(tmp_path / "event0") not in bt.dev_onkeys
+        for d in opened.values():
+            d.close()
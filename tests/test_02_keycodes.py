@@ -0,0 +1,61 @@
+# tests/test_02_keycodes.py
+#
+# keycodes のテスト
+#
+import evdev
+import pytest
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.keycodes import KEY_CODES, KEY_NAMES, key_code, key_name
+
+
+@pytest.mark.parametrize(
+    "code, name",
+    [
+        (ecodes.KEY_A, "KEY_A"),
+        (ecodes.BTN_A, "BTN_A"),  # 別名あり: BTN_GAMEPAD, BTN_SOUTH
+        (ecodes.KEY_MUTE, "KEY_MIN_INTERESTING"),
+        (0x2FF, "0x2FF"),  # 未定義
+    ],
+)
+def test_key_name(code, name):
+    assert key_name(code) == name
+    assert len(KEY_NAMES) == ecodes.KEY_MAX + 1
+
+
+@pytest.mark.parametrize(
+    "name, code",
+    [
+        ("KEY_A", ecodes.KEY_A),
+        ("BTN_SOUTH", ecodes.BTN_A),
+        ("KEY_MUTE", ecodes.KEY_MUTE),
+        ("0x2FF", 0x2FF),  # 未定義
+    ],
+)
+def test_key_code(name, code):
+    assert key_code(name) == code
+    assert KEY_CODES[name] == code
+
+
+def test_same_as_evdev():
+    """従来の get_key_event と同じ結果になる"""
+    bt = PiBtInput()
+    for code in ecodes.keys:
+        for value in (0, 1, 2):
+            ev = evdev.InputEvent(0, 0, ecodes.EV_KEY, code, value)
+            name = ecodes.keys[code]
+            if isinstance(name, tuple):
+                name = name[0]
+            assert bt.get_key_event(ev) == (name, evdev.KeyEvent(ev).keystate)
+            assert bt.get_key_code(ev) == (code, value)
+
+    ev = evdev.InputEvent(0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    assert bt.get_key_event(ev) == (None, None)
+    assert bt.get_key_code(ev) == (None, None)
+
+
+def test_round_trip():
+    """KEY_NAMES の名前は、すべて KEY_CODES でコードに戻せる"""
+    for code, name in enumerate(KEY_NAMES):
+        assert KEY_CODES[name] == code
@@ -0,0 +1,97 @@
+# tests/test_03_devregistry.py
+#
+# DevRegistry のテスト
+#
+# 一時ディレクトリを /dev/input の代わりにし、
+# ファイルの作成/削除を inotify で検出できることを確認する。
+#
+import os
+
+import pytest
+from _testbase_evdev import PipeInputDevice
+
+from pibtinput.devregistry import DevRegistry
+
+
+class FakeDevice(PipeInputDevice):
+    """close() されたかを記録する"""
+
+    closed = False
+
+    def close(self):
+        super().close()
+        self.closed = True
+
+
+class FakeOpener:
+    """open_dev: パスごとにダミーデバイスを作る"""
+
+    def __init__(self):
+        self.opened: list[str] = []
+        self.devs: list[FakeDevice] = []
+
+    def __call__(self, path):
+        dev = FakeDevice(os.path.basename(path), len(self.devs))
+        dev.path = path
+        self.opened.append(path)
+        self.devs.append(dev)
+        return dev
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    for i in range(3):
+        (tmp_path / f"event{i}").touch()
+    (tmp_path / "mice").touch()
+    return tmp_path
+
+
+def test_cache(input_dir):
+    opener = FakeOpener()
+    with DevRegistry(str(input_dir), opener) as reg:
+        assert reg.inotify is not None
+
+        devs1 = reg.list_devs()
+        devs2 = reg.list_devs()
+        assert [d.name for d in devs1] == ["event0", "event1", "event2"]
+        assert devs1 == devs2
+        assert len(opener.opened) == 3  # 2回目は開かない
+
+        caps1 = reg.capabilities(devs1[0])
+        assert reg.capabilities(devs1[0]) is caps1
+
+    # close() で全て閉じる
+    assert all(d.closed for d in opener.devs)
+
+
+def test_invalidate(input_dir):
+    opener = FakeOpener()
+    with DevRegistry(str(input_dir), opener) as reg:
+        devs = reg.list_devs()
+        dev1 = devs[1]
+
+        (input_dir / "event1").unlink()
+        (input_dir / "event9").touch()
+
+        names = sorted(d.name for d in reg.list_devs())
+        assert names == ["event0", "event2", "event9"]
+        assert dev1.closed
+        assert len(opener.opened) == 4
+
+        # 変更が無ければ、何もしない
+        assert reg.update() is False
+
+
+def test_no_inotify(tmp_path):
+    """監視できない場合は、毎回走査する"""
+    missing = tmp_path / "missing"
+    opener = FakeOpener()
+    with DevRegistry(str(missing), opener) as reg:
+        assert reg.inotify is None
+        assert reg.list_devs() == []
+
+        missing.mkdir()
+        (missing / "event0").touch()
+        assert [d.name for d in reg.list_devs()] == ["event0"]
+        assert [d.name for d in reg.list_devs()] == ["event0"]
+        assert len(opener.opened) == 1
@@ -0,0 +1,91 @@
+# tests/test_04_keystate.py
+#
+# KeyState のテスト
+#
+import pytest
+from evdev import ecodes
+
+from pibtinput.keystate import (
+    KEY_DOWN,
+    KEY_HOLD,
+    KEY_UP,
+    KeyState,
+    bit_codes,
+)
+
+A = ecodes.KEY_A
+B = ecodes.KEY_B
+BTN = ecodes.BTN_A
+
+
+def test_bit_codes():
+    assert bit_codes(0) == []
+    assert bit_codes(1 << 3 | 1 << 300 | 1) == [0, 3, 300]
+
+
+def test_update():
+    ks = KeyState()
+    assert not ks and len(ks) == 0 and ks.generation == 0
+
+    assert ks.update(A, KEY_DOWN)
+    assert ks.pressed == "KEY_A" and ks.released is None
+    assert ks.update(A, KEY_HOLD)
+    assert ks.pressed is None
+    assert ks.update(BTN, KEY_DOWN)
+    assert ks.generation == 3
+
+    # Mapping として dict と同じように使える
+    assert dict(ks) == {"KEY_A": 2, "BTN_A": 1}
+    assert ks == {"KEY_A": 2, "BTN_A": 1}
+    assert ks["KEY_A"] == 2
+    assert ks["BTN_SOUTH"] == 1  # 別名
+    assert ks.get("KEY_B") is None
+    assert "KEY_A" in ks and "KEY_B" not in ks and "NO_SUCH_KEY" not in ks
+    assert list(ks) == ["KEY_A", "BTN_A"]
+    assert repr(ks) == "{'KEY_A': 2, 'BTN_A': 1}"
+    with pytest.raises(KeyError):
+        ks["KEY_B"]
+
+    assert ks.update(A, KEY_UP)
+    assert ks.released == "KEY_A"
+    assert not ks.update(A, KEY_UP)  # 変化なし
+    assert ks.generation == 4
+    assert dict(ks) == {"BTN_A": 1}
+
+
+def test_hold_without_down():
+    ks = KeyState()
+    ks.update(A, KEY_HOLD)
+    assert dict(ks) == {"KEY_A": 1}
+    assert ks.pressed == "KEY_A"
+
+
+def test_snapshot_and_delta():
+    ks = KeyState()
+    ks.update(A, KEY_DOWN)
+    snap1 = ks.snapshot()
+
+    ks.update(A, KEY_HOLD)
+    ks.update(B, KEY_DOWN)
+    snap2 = ks.copy()
+
+    ks.update(A, KEY_UP)
+    ks.clear()
+    assert not ks and ks.count(B) == 0
+
+    # スナップショットは変化しない
+    assert snap1 == {"KEY_A": 1}
+    assert snap2 == {"KEY_A": 2, "KEY_B": 1}
+    assert snap2.generation == 3
+    assert hash(snap1) != hash(snap2)
+
+    assert snap2.delta(snap1) == (["KEY_B"], [])
+    assert ks.delta(snap2) == ([], ["KEY_A", "KEY_B"])
+
+
+def test_key_code():
+    ks = KeyState(key_code=True)
+    ks.update(A, KEY_DOWN)
+    assert dict(ks) == {A: 1}
+    assert ks.pressed == A
+    assert ks.is_pressed(A) and ks.is_pressed("KEY_A")
@@ -0,0 +1,90 @@
+# tests/test_05_record.py
+#
+# EventRecorder / ReplayDevice のテスト
+#
+import time
+
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.record import EventRecorder, ReplayDevice
+
+
+@pytest.fixture
+def rec_file(tmp_path):
+    """KEY_A(down, hold x 2, up), KEY_B(down, up) を記録したファイル"""
+    dev = PipeInputDevice("8BitDo Micro")
+    t0 = 1_700_000_000.0
+    data = key_press_bytes(dev, ecodes.KEY_A, n_hold=2)
+    data += dev.pack(ecodes.EV_KEY, ecodes.KEY_B, 1, t0 + 0.2)
+    data += dev.pack(ecodes.EV_KEY, ecodes.KEY_B, 0, t0 + 0.2)
+    dev.write_raw(data)
+
+    path = tmp_path / "a.rec"
+    with EventRecorder(str(path), dev.name) as rec:
+        for ev in dev.read():
+            rec.write(ev)
+    dev.close()
+    return path
+
+
+def test_replay(rec_file):
+    with ReplayDevice(str(rec_file), speed=0) as dev:
+        assert dev.name == "8BitDo Micro"
+        assert dev.n_events == 10
+
+        got = []
+
+        def cb(key_name, key_state, onkeys):
+            got.append((key_name, key_state, dict(onkeys)))
+            return True
+
+        PiBtInput().read_loop(dev, cb)
+
+    assert got == [
+        ("KEY_A", 1, {"KEY_A": 1}),
+        ("KEY_A", 2, {"KEY_A": 2}),
+        ("KEY_A", 2, {"KEY_A": 3}),
+        ("KEY_A", 0, {}),
+        ("KEY_B", 1, {"KEY_B": 1}),
+        ("KEY_B", 0, {}),
+    ]
+
+
+def test_replay_speed(tmp_path):
+    """記録時の間隔を speed 倍で再生する"""
+    dev = PipeInputDevice()
+    dev.key(ecodes.KEY_A, 1, ts=100.0)
+    dev.key(ecodes.KEY_A, 0, ts=100.5)
+    path = tmp_path / "b.rec"
+    with EventRecorder(str(path)) as rec:
+        for ev in dev.read():
+            rec.write(ev)
+    dev.close()
+
+    with ReplayDevice(str(path), speed=5) as rdev:
+        t0 = time.monotonic()
+        evs = list(rdev.read_loop())
+        elapsed = time.monotonic() - t0
+
+    assert len(evs) == 4
+    assert evs[2].timestamp() == pytest.approx(100.5)
+    assert 0.09 < elapsed < 0.5
+
+
+def test_not_record_file(tmp_path):
+    path = tmp_path / "c.rec"
+    path.write_bytes(b"0123456789abcdef")
+    with pytest.raises(ValueError):
+        ReplayDevice(str(path))
+
+
+def test_cli_replay(cli_runner, rec_file):
+    """pibtinput input --replay"""
+    cli_runner.test_command(
+        ["pibtinput", "input", "--replay", str(rec_file), "--speed", "0"],
+        e_stdout=["KEY_A:1", "KEY_B:0  {}"],
+        e_ret=0,
+    )
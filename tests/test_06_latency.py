@@ -0,0 +1,175 @@
+# tests/test_06_latency.py
+#
+# LatencyHist / LatencyStats のテスト
+#
+import random
+import threading
+import time
+
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.cmd_stats import CLEAR, CmdStats
+from pibtinput.latency import (
+    N_BUCKETS,
+    LatencyHist,
+    LatencyStats,
+    bucket_index,
+    bucket_range,
+)
+from pibtinput.record import EventRecorder
+
+
+@pytest.mark.parametrize("ns", [0, 1, 7, 8, 9, 1000, 123_456, 10**9])
+def test_bucket(ns):
+    low, high = bucket_range(bucket_index(ns))
+    assert low <= ns < high
+    assert (high - low) <= max(1, low // 8)
+
+
+def test_bucket_overflow():
+    assert bucket_index(10**15) == N_BUCKETS - 1
+    assert bucket_index(-5) == 0
+
+
+def test_hist_percentile():
+    hist = LatencyHist()
+    values = list(range(1000, 101_000, 1000))  # 1us .. 100us
+    random.shuffle(values)
+    for v in values:
+        hist.add(v)
+
+    assert hist.n == 100
+    assert hist.min == 1000
+    assert hist.max == 100_000
+    assert hist.percentile(50) == pytest.approx(50_000, rel=0.13)
+    assert hist.percentile(99) == pytest.approx(99_000, rel=0.13)
+    assert hist.percentile(100) == 100_000
+
+    hist.clear()
+    assert hist.n == 0
+    assert hist.percentile(50) == 0
+
+
+def test_read_loop_stats():
+    """read_loop(stats=...) は EV_KEY ごとに遅延を記録する"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=3))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_B))
+    stats = LatencyStats()
+
+    def cb(key_name, key_state, onkeys):
+        return not (key_name == "KEY_B" and key_state == 0)
+
+    PiBtInput().read_loop(dev, cb, stats=stats)
+    dev.close()
+
+    s = stats.summary()
+    assert s["events"] == 7
+    assert s["input"]["n"] == 7
+    assert s["callback"]["n"] == 7
+    assert 0 <= s["input"]["p50_us"] < 1_000_000
+    assert s["keys"]["KEY_A"]["events"] == 5
+    assert s["keys"]["KEY_A"]["down"] == 1
+    assert s["keys"]["KEY_A"]["hold"] == 3
+    assert s["keys"]["KEY_B"]["hold"] == 0
+
+
+def test_read_loop_stats_frame():
+    """frame=True では、SYN_REPORT (コールバック) ごとに記録する"""
+    dev = PipeInputDevice()
+    dev.write_raw(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_A, 1)
+        + dev.pack(ecodes.EV_KEY, ecodes.KEY_B, 1)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    )
+    dev.write_raw(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_A, 0)
+        + dev.pack(ecodes.EV_KEY, ecodes.KEY_B, 0)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    )
+    stats = LatencyStats()
+
+    def cb(frame, onkeys):
+        return bool(onkeys)
+
+    PiBtInput().read_loop(dev, cb, frame=True, stats=stats)
+    dev.close()
+
+    assert stats.n_events == 4
+    assert stats.input.n == 2
+    assert stats.callback.n == 2
+
+
+def test_cli_stats(cli_runner, tmp_path):
+    """pibtinput stats --replay"""
+    dev = PipeInputDevice("8BitDo Micro")
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=2))
+    path = tmp_path / "a.rec"
+    with EventRecorder(str(path), dev.name) as rec:
+        for ev in dev.read():
+            rec.write(ev)
+    dev.close()
+
+    cli_runner.test_command(
+        ["pibtinput", "stats", "--replay", str(path), "--speed", "0"],
+        e_stdout=["events: 4", "not measured in replay", "KEY_A"],
+        e_ret=0,
+    )
+
+
+def test_stats_refresh(capsys):
+    """イベントが来なくても interval ごとに表示を更新する"""
+    app = CmdStats([], interval=0.01)
+    th = threading.Thread(target=app.refresh)
+    th.start()
+    time.sleep(0.1)
+    app.stopped.set()
+    th.join()
+    app.end()
+
+    assert capsys.readouterr().out.count(CLEAR) >= 2
+
+
+def test_window_summary():
+    """window_summary() は前回からの区間だけ (summary() は累計)"""
+    stats = LatencyStats()
+    for _ in range(10):
+        stats.add_key(ecodes.KEY_A, 1)
+        stats.input.add(1000)
+
+    w = stats.window_summary()
+    assert w["events"] == 10
+    assert w["input"]["n"] == 10
+    assert w["keys"]["KEY_A"]["down"] == 10
+
+    # バーストの後: 区間の値は 0 に戻る
+    w = stats.window_summary()
+    assert w["events"] == 0
+    assert w["input"]["n"] == 0
+    assert w["input"]["p99_us"] == 0
+    assert w["keys"] == {}
+
+    stats.add_key(ecodes.KEY_B, 1)
+    stats.input.add(50_000)
+    w = stats.window_summary()
+    assert list(w["keys"]) == ["KEY_B"]
+    assert w["input"]["p50_us"] == pytest.approx(50, rel=0.13)
+    assert w["input"]["max_us"] == 50
+
+    s = stats.summary()
+    assert s["events"] == 11
+    assert s["input"]["n"] == 11
+    assert s["input"]["max_us"] == 50
+
+
+def test_stats_format_live():
+    app = CmdStats([])
+    app.stats.add_key(ecodes.KEY_A, 1)
+    out = app.format(live=True)
+    assert "cumulative:" in out
+    assert "input (live)" in out
+    assert "input (cumulative)" in out
+    app.end()
@@ -0,0 +1,59 @@
+# tests/test_07_mylogger.py
+#
+# get_logger / hot_debug のテスト
+#
+import contextlib
+import io
+from logging import DEBUG, INFO
+
+import evdev
+from evdev import ecodes
+
+from pibtinput import PiBtInput, get_logger, hot_debug
+
+
+def test_get_logger_cached():
+    """同じ名前なら同じロガー、ハンドラは増えない"""
+    log1 = get_logger("Cached", debug=True)
+    log2 = get_logger("Cached", debug=False)
+
+    assert log1 is log2
+    assert log1.name == "test_07_mylogger.py.Cached"
+    assert len(log1.handlers) == 1
+    assert log1.level == INFO
+    assert get_logger("Cached", debug=DEBUG).level == DEBUG
+
+
+def test_get_logger_stderr():
+    """ハンドラは、その時点の sys.stderr に出力する"""
+    log = get_logger("Stderr", debug=True)
+
+    buf = io.StringIO()
+    with contextlib.redirect_stderr(buf):
+        log.debug("hello")
+    assert "Stderr.test_get_logger_stderr" in buf.getvalue()
+    assert "hello" in buf.getvalue()
+
+
+def test_hot_debug():
+    assert hot_debug(get_logger("Hot", debug=False)) is None
+
+    log = get_logger("Hot", debug=True)
+    assert hot_debug(log) == log.debug
+
+
+def test_get_key_event_debug():
+    """debug=True の場合だけ、ログを出す版に差し替えられる"""
+    ev = evdev.InputEvent(0, 0, ecodes.EV_KEY, ecodes.KEY_A, 1)
+
+    buf = io.StringIO()
+    with contextlib.redirect_stderr(buf):
+        assert PiBtInput().get_key_event(ev) == ("KEY_A", 1)
+        assert buf.getvalue() == ""
+
+        bt = PiBtInput(debug=True)
+        assert bt.get_key_event(ev) == ("KEY_A", 1)
+        assert bt.get_key_code(ev) == (ecodes.KEY_A, 1)
+
+    assert "key_name=KEY_A, key_state=1" in buf.getvalue()
+    assert "key_code=30, key_state=1" in buf.getvalue()
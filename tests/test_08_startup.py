@@ -0,0 +1,70 @@
+# tests/test_08_startup.py
+#
+# CLI 起動時の import のテスト
+#
+import re
+import subprocess
+import sys
+
+import pytest
+
+# `pibtinput --help` で読み込まれてはいけないモジュール
+HEAVY_MODULES = [
+    "evdev",
+    "blessed",
+    "readline",
+    "asyncio",
+    "importlib.metadata",
+]
+
+# `import pibtinput.__main__` にかけてよい時間 (import time, us)
+IMPORT_BUDGET_US = 100_000
+
+
+def run_python(code: str, *opts: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *opts, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.mark.parametrize("module", ["pibtinput", "pibtinput.__main__"])
+def test_no_heavy_imports(module):
+    code = (
+        f"import sys, {module}\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    assert run_python(code).stdout.strip() == "[]"
+
+
+def test_lazy_attrs():
+    """公開している名前は、参照すれば使える"""
+    code = (
+        "import pibtinput\n"
+        "assert pibtinput.PiBtInput.__name__ == 'PiBtInput'\n"
+        "assert callable(pibtinput.get_logger)\n"
+        "assert isinstance(pibtinput.__version__, str)\n"
+        "assert 'CliBase' in dir(pibtinput)\n"
+        "import sys\n"
+        "print('blessed' in sys.modules)"
+    )
+    assert run_python(code).stdout.strip() == "False"
+
+    import pibtinput
+
+    with pytest.raises(AttributeError):
+        _ = pibtinput.no_such_name
+
+
+def test_import_time_budget():
+    """import pibtinput.__main__ の時間 (3回の最小値)"""
+    times = []
+    for _ in range(3):
+        err = run_python("import pibtinput.__main__", "-X", "importtime")
+        m = re.search(r"\|\s*(\d+) \| pibtinput\.__main__$", err.stderr, re.M)
+        assert m, err.stderr
+        times.append(int(m.group(1)))
+
+    assert min(times) < IMPORT_BUDGET_US, times
@@ -0,0 +1,215 @@
+# tests/test_09_matcher.py
+#
+# Matcher のテスト
+#
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.keystate import KeyState
+from pibtinput.matcher import Binding, Matcher
+
+
+def run(matcher: Matcher, events: list[tuple[str, int]]) -> None:
+    """Feed (key_name, key_state) events."""
+    onkeys = KeyState()
+    cb = matcher.stage()
+    for key, st in events:
+        onkeys.update(ecodes.ecodes[key], st)
+        cb(key, st, onkeys)
+
+
+def tap(*keys: str) -> list[tuple[str, int]]:
+    return [e for k in keys for e in ((k, 1), (k, 0))]
+
+
+@pytest.mark.parametrize(
+    "spec, kind, n_steps, count",
+    [
+        ("KEY_LEFTCTRL+KEY_S", Binding.CHORD, 1, 0),
+        ("leftctrl+s", Binding.CHORD, 1, 0),
+        ("KEY_S*11", Binding.HOLD, 1, 11),
+        ("up up down down", Binding.SEQUENCE, 4, 0),
+        ("KEY_A KEY_LEFTCTRL+KEY_B", Binding.SEQUENCE, 2, 0),
+    ],
+)
+def test_binding(spec, kind, n_steps, count):
+    b = Binding(spec, None)
+    assert b.kind == kind
+    assert len(b.steps) == n_steps
+    assert b.count == count
+
+
+@pytest.mark.parametrize(
+    "spec", ["", "KEY_NOSUCH", "KEY_A+", "KEY_A*x", "KEY_A*0", "a b*2"]
+)
+def test_binding_error(spec):
+    with pytest.raises(ValueError):
+        Binding(spec, None)
+
+
+def test_chord():
+    got = []
+    m = Matcher()
+    m.add("KEY_LEFTCTRL+KEY_S", lambda b, k: got.append(b.spec))
+
+    run(m, [("KEY_S", 1), ("KEY_S", 0)])
+    assert got == []
+
+    run(m, [("KEY_LEFTCTRL", 1), ("KEY_S", 1), ("KEY_S", 2), ("KEY_S", 0)])
+    assert got == ["KEY_LEFTCTRL+KEY_S"]
+
+
+def test_hold():
+    got = []
+    m = Matcher()
+    m.add("KEY_S*3", lambda b, k: got.append(dict(k)))
+
+    run(m, [("KEY_S", 1)] + [("KEY_S", 2)] * 4 + [("KEY_S", 0)])
+    assert got == [{"KEY_S": 3}]
+
+
+def test_sequence():
+    got = []
+    m = Matcher()
+    m.add("up up down down", lambda b, k: got.append(b.spec))
+    m.add("up down", lambda b, k: got.append(b.spec))
+    m.add("KEY_A KEY_B KEY_C", lambda b, k: got.append(b.spec))
+
+    run(m, tap("KEY_UP", "KEY_UP", "KEY_UP", "KEY_DOWN", "KEY_DOWN"))
+    assert got == ["up down", "up up down down"]
+
+    got.clear()
+    run(m, tap("KEY_A", "KEY_B", "KEY_X", "KEY_C"))
+    run(m, tap("KEY_A", "KEY_A", "KEY_B", "KEY_C"))
+    assert got == ["KEY_A KEY_B KEY_C"]
+
+
+def test_sequence_timeout(monkeypatch):
+    t_now = [0.0]
+    monkeypatch.setattr("pibtinput.matcher.time.monotonic", lambda: t_now[0])
+
+    got = []
+    m = Matcher(timeout=0.5)
+    m.add("KEY_A KEY_B", lambda b, k: got.append(b.spec))
+
+    run(m, tap("KEY_A"))
+    t_now[0] = 1.0
+    run(m, tap("KEY_B"))
+    assert got == []
+
+    run(m, tap("KEY_A"))
+    t_now[0] = 1.2
+    run(m, tap("KEY_B"))
+    assert got == ["KEY_A KEY_B"]
+
+
+def test_stage_read_loop():
+    """read_loop() のステージとして使い、action が False なら終了"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_S, n_hold=20))
+
+    m = Matcher()
+    m.add("KEY_S*11", lambda b, k: False)
+
+    got = []
+
+    def cb(key_name, key_state, onkeys):
+        got.append((key_name, key_state))
+        return True
+
+    PiBtInput().read_loop(dev, m.stage(cb))
+    dev.close()
+
+    # 11回目 (hold x 10) で終了し、その回の cb は呼ばれない
+    assert got[:3] == [("KEY_A", 1), ("KEY_A", 0), ("KEY_S", 1)]
+    assert len(got) == 3 + 9
+
+
+def test_stage_frame():
+    """frame=True: 同じフレームで押された chord は一度だけ一致する"""
+    dev = PipeInputDevice()
+    dev.write_raw(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_LEFTCTRL, 1)
+        + dev.pack(ecodes.EV_KEY, ecodes.KEY_S, 1)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    )
+    dev.write_raw(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_LEFTCTRL, 0)
+        + dev.pack(ecodes.EV_KEY, ecodes.KEY_S, 0)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    )
+
+    got = []
+    m = Matcher()
+    m.add("KEY_LEFTCTRL+KEY_S", lambda b, k: got.append(b.spec))
+
+    def cb(frame, onkeys):
+        return bool(onkeys)
+
+    PiBtInput().read_loop(dev, m.stage(cb, frame=True), frame=True)
+    dev.close()
+
+    assert got == ["KEY_LEFTCTRL+KEY_S"]
+
+
+def test_stage_frame_release_press():
+    """frame=True: 同じフレームで、放してから押す"""
+    got = []
+    m = Matcher()
+    m.add("KEY_A", lambda b, k: got.append(b.spec))
+    m.add("KEY_UP KEY_DOWN", lambda b, k: got.append(b.spec))
+    cb = m.stage(frame=True)
+
+    onkeys = KeyState()
+
+    def frame(*evs):
+        for key, st in evs:
+            onkeys.update(ecodes.ecodes[key], st)
+        cb(list(evs), onkeys.snapshot())
+
+    frame(("KEY_B", 1))
+    frame(("KEY_B", 0), ("KEY_A", 1))
+    assert got == ["KEY_A"]
+
+    got.clear()
+    frame(("KEY_A", 0), ("KEY_UP", 1))
+    frame(("KEY_UP", 0), ("KEY_DOWN", 1))
+    assert got == ["KEY_UP KEY_DOWN"]
+
+
+def test_stage_multi_dev():
+    """dev 付きのコールバック: 判定の状態はデバイスごと"""
+    got = []
+    m = Matcher()
+    m.add("KEY_A", lambda b, k: got.append(b.spec))
+    m.add("KEY_X KEY_Y", lambda b, k: got.append(b.spec))
+    cb = m.stage()
+
+    devs = [PipeInputDevice(idx=i) for i in range(2)]
+    onkeys = [KeyState(), KeyState()]
+
+    def ev(i, key, st):
+        onkeys[i].update(ecodes.ecodes[key], st)
+        cb(devs[i], key, st, onkeys[i])
+
+    # dev0: A down, dev1: A down -> 2回一致
+    ev(0, "KEY_A", 1)
+    ev(1, "KEY_A", 1)
+    ev(0, "KEY_A", 0)
+    ev(1, "KEY_A", 0)
+    assert got == ["KEY_A", "KEY_A"]
+
+    # dev0 の X と dev1 の Y は、sequence にならない
+    got.clear()
+    ev(0, "KEY_X", 1)
+    ev(1, "KEY_Y", 1)
+    assert got == []
+    ev(0, "KEY_X", 0)
+    ev(0, "KEY_Y", 1)
+    assert got == ["KEY_X KEY_Y"]
+
+    for d in devs:
+        d.close()
@@ -0,0 +1,227 @@
+# tests/test_10_keymap.py
+#
+# KeyMap / CmdRun のテスト
+#
+import threading
+import time
+
+import evdev
+import pytest
+from _testbase_evdev import PipeInputDevice
+from evdev import ecodes
+
+from pibtinput.cmd_run import CmdRun
+from pibtinput.executor import Action, ActionExecutor
+from pibtinput.keymap import KeyMap
+from pibtinput.keystate import KeyState
+
+CONFIG = """\
+# all devices
+KEY_VOLUMEUP  1  echo vol-up
+
+[8BitDo Micro]   # gamepad
+KEY_ENTER           1  echo enter
+KEY_S+KEY_LEFTCTRL  1  echo save
+a                   2  @coalesce echo repeat
+
+[*]
+KEY_VOLUMEUP  1  echo vol-up-2
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "keymap.conf"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def test_parse(config_file):
+    keymap = KeyMap.load(config_file)
+    assert keymap.keywords_list() == [[], ["8BitDo", "Micro"]]
+
+    gamepad = keymap.table_for(PipeInputDevice("8BitDo Micro"))
+    other = keymap.table_for(PipeInputDevice("Keyboard"))
+
+    def commands(table, key):
+        return [(a.command, a.policy) for a in table[key]]
+
+    ctrl = 1 << ecodes.KEY_LEFTCTRL
+    assert commands(gamepad, (ecodes.KEY_S, 1, ctrl)) == [
+        ("echo save", "queue")
+    ]
+    assert commands(gamepad, (ecodes.KEY_A, 2, 0)) == [
+        ("echo repeat", "coalesce")
+    ]
+    assert commands(other, (ecodes.KEY_VOLUMEUP, 1, 0)) == [
+        ("echo vol-up", "queue"),
+        ("echo vol-up-2", "queue"),
+    ]
+    assert (ecodes.KEY_ENTER, 1, 0) not in other
+
+
+def test_section_devmatch():
+    """セクションは devmatch のキーワード (MAC, vendor:product)"""
+    keymap = KeyMap()
+    keymap.parse(
+        [
+            "[e4:17:d8:12:34:56]",
+            "KEY_A  1  echo mac",
+            "[2dc8:9020]",
+            "KEY_A  1  echo id",
+            "[name=Keyboard]",
+            "KEY_A  1  echo keyboard",
+        ]
+    )
+
+    pad = PipeInputDevice("8BitDo Micro", 0)
+    pad.uniq = "E4:17:D8:12:34:56"
+    pad.info = evdev.DeviceInfo(5, 0x2DC8, 0x9020, 1)
+    other = PipeInputDevice("8BitDo Micro gamepad", 1)
+    other.info = evdev.DeviceInfo(5, 0x2DC8, 0x9021, 1)
+    kbd = PipeInputDevice("Keyboard", 2)
+
+    def commands(dev):
+        table = keymap.table_for(dev)
+        return [a.command for a in table.get((ecodes.KEY_A, 1, 0), [])]
+
+    assert commands(pad) == ["echo mac", "echo id"]
+    assert commands(other) == []
+    assert commands(kbd) == ["echo keyboard"]
+    for d in (pad, other, kbd):
+        d.close()
+
+
+@pytest.mark.parametrize(
+    "text, lineno",
+    [
+        ("KEY_A 1\n", 1),
+        ("\n# c\nKEY_NOSUCH 1 echo\n", 3),
+        ("KEY_A 3 echo\n", 1),
+        ("KEY_A x echo\n", 1),
+        ("[dev\n", 1),
+        ("KEY_A 1 @later echo\n", 1),
+        ("KEY_A 1 @drop\n", 1),
+        ("\n[phys~(]\nKEY_A 1 echo\n", 2),
+    ],
+)
+def test_parse_error(text, lineno):
+    with pytest.raises(ValueError, match=f"^conf:{lineno}: "):
+        KeyMap().parse(text.splitlines(), "conf")
+
+
+def test_cb_ev(config_file, capsys):
+    """CmdRun.cb_ev: (コード, 状態, 修飾キー) で引く"""
+    app = CmdRun(config_file, dry_run=True)
+    dev = PipeInputDevice("8BitDo Micro")
+    onkeys = KeyState(key_code=True)
+
+    for code, st in [
+        (ecodes.KEY_S, 1),  # 修飾キーなし: 一致しない
+        (ecodes.KEY_S, 0),
+        (ecodes.KEY_LEFTCTRL, 1),
+        (ecodes.KEY_S, 1),
+        (ecodes.KEY_S, 0),
+        (ecodes.KEY_LEFTCTRL, 0),
+        (ecodes.KEY_ENTER, 1),
+        (ecodes.KEY_ENTER, 0),
+        (ecodes.KEY_VOLUMEUP, 1),
+    ]:
+        onkeys.update(code, st)
+        assert app.cb_ev(dev, code, st, onkeys)
+
+    app.end()
+    dev.close()
+    assert capsys.readouterr().out.splitlines() == [
+        "KEY_S:1  echo save",
+        "KEY_ENTER:1  echo enter",
+        "KEY_VOLUMEUP:1  echo vol-up",
+        "KEY_VOLUMEUP:1  echo vol-up-2",
+    ]
+
+
+def test_executor(tmp_path):
+    out = tmp_path / "out"
+    executor = ActionExecutor(n_workers=2)
+    action = Action(f'echo "$PIBTINPUT_KEY" >> {out}')
+    assert executor.submit(action, {"PIBTINPUT_KEY": "KEY_A"})
+    assert executor.submit(action, {"PIBTINPUT_KEY": "KEY_B"})
+    assert executor.wait_idle(timeout=5)
+
+    # 環境変数は、コマンドごと
+    assert sorted(out.read_text().split()) == ["KEY_A", "KEY_B"]
+
+    s = executor.summary()
+    assert s["done"] == 2
+    assert s["launch"]["n"] == 2
+    executor.close()
+
+
+@pytest.mark.parametrize(
+    "policy, n_run, counter",
+    [
+        ("queue", 4, None),
+        ("drop", 1, "dropped"),
+        ("coalesce", 2, "coalesced"),
+    ],
+)
+def test_executor_policy(tmp_path, policy, n_run, counter):
+    """1ワーカーで、実行中に同じアクションを3回投入する"""
+    out = tmp_path / "out"
+    gate = tmp_path / "gate"
+    executor = ActionExecutor(n_workers=1)
+    action = Action(
+        f"echo x >> {out}; while [ ! -e {gate} ]; do sleep 0.01; done",
+        policy,
+    )
+
+    executor.submit(action)
+    while not action.running:
+        time.sleep(0.01)
+    for _ in range(3):
+        executor.submit(action)
+    gate.touch()
+
+    assert executor.wait_idle(timeout=5)
+    assert len(out.read_text().split()) == n_run
+    if counter:
+        assert executor.summary()[counter] == 4 - n_run
+    executor.close()
+
+
+def test_executor_fd3(tmp_path):
+    """コマンドからワーカーの通知用 fd 3 は見えない"""
+    executor = ActionExecutor(n_workers=1)
+    executor.submit(Action("echo X >&3"))
+    executor.submit(Action("true"))
+    assert executor.wait_idle(timeout=5)
+
+    s = executor.summary()
+    assert s["failed"] == 1
+    assert s["done"] == 1
+    executor.close()
+
+
+def test_executor_close(tmp_path):
+    """close() で、待ちのアクションは捨てられる"""
+    gate = tmp_path / "gate"
+    executor = ActionExecutor(n_workers=1)
+    action = Action(f"while [ ! -e {gate} ]; do sleep 0.01; done")
+    for _ in range(4):
+        executor.submit(action)
+    while not action.running:
+        time.sleep(0.01)
+
+    threading.Timer(0.1, gate.touch).start()
+    executor.close()
+
+    assert executor.wait_idle(timeout=0)
+    assert executor.summary()["cancelled"] == 3
+    assert action.queued == 0
+
+
+def test_action_error():
+    with pytest.raises(ValueError):
+        Action("echo", "later")
+    with pytest.raises(ValueError):
+        Action("echo a\necho b")
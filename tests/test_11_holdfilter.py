@@ -0,0 +1,140 @@
+# tests/test_11_holdfilter.py
+#
+# HoldFilter のテスト
+#
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.cmd_input import CmdInput
+from pibtinput.holdfilter import HoldFilter, set_repeat
+
+
+def run(hf: HoldFilter, n_hold: int) -> list[tuple[str, int, int]]:
+    """KEY_S を n_hold 回リピートさせて、通過したイベントを返す"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_S, n_hold=n_hold))
+
+    got = []
+
+    def cb(key_name, key_state, onkeys):
+        got.append((key_name, key_state, onkeys.count(ecodes.KEY_S)))
+        return key_state != 0
+
+    PiBtInput().read_loop(dev, hf.stage(cb))
+    dev.close()
+    return got
+
+
+@pytest.mark.parametrize(
+    "mode, every, n_hold, expected",
+    [
+        ("pass", 0, 3, [1, 2, 2, 2, 0]),
+        ("suppress", 0, 3, [1, 0]),
+        ("coalesce", 3, 7, [1, 2, 2, 0]),
+        ("coalesce", 1, 2, [1, 2, 2, 0]),
+    ],
+)
+def test_mode(mode, every, n_hold, expected):
+    hf = HoldFilter(mode, every=every)
+    got = run(hf, n_hold)
+    assert [st for _, st, _ in got] == expected
+    assert hf.dropped == n_hold + 2 - len(expected)
+
+
+def test_coalesce_count():
+    """onkeys の回数は、捨てたイベントも数えている"""
+    got = run(HoldFilter("coalesce", every=3), 7)
+    assert [n for _, st, n in got if st == 2] == [4, 7]
+
+
+def test_throttle(monkeypatch):
+    t_now = [0.0]
+    monkeypatch.setattr(
+        "pibtinput.holdfilter.time.monotonic", lambda: t_now[0]
+    )
+
+    hf = HoldFilter("throttle", rate=10)
+    got = []
+    cb = hf.stage(lambda k, st, o: got.append((k, st)))
+
+    cb(ecodes.KEY_S, 1, None)
+    for _ in range(5):
+        t_now[0] += 0.04
+        cb(ecodes.KEY_S, 2, None)
+    cb(ecodes.KEY_S, 0, None)
+
+    # 0.1秒以上あいた hold (0.12) だけが通る
+    assert got == [(ecodes.KEY_S, 1), (ecodes.KEY_S, 2), (ecodes.KEY_S, 0)]
+    assert hf.dropped == 4
+
+
+def test_frame():
+    """frame=True: hold だけのフレームは cb に渡らない"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=5))
+
+    frames = []
+
+    def cb(frame, onkeys):
+        frames.append([st for _, st in frame])
+        return bool(onkeys)
+
+    hf = HoldFilter("suppress")
+    PiBtInput().read_loop(dev, hf.stage(cb, frame=True), frame=True)
+    dev.close()
+
+    assert frames == [[1], [0]]
+
+
+def test_throttle_per_dev(monkeypatch):
+    """throttle: 別のデバイスの同じキーは間引かない"""
+    monkeypatch.setattr("pibtinput.holdfilter.time.monotonic", lambda: 1.0)
+
+    hf = HoldFilter("throttle", rate=10)
+    got = []
+    cb = hf.stage(lambda d, k, st, o: got.append((d.path, st)))
+
+    devs = [PipeInputDevice(idx=i) for i in range(2)]
+    cb(devs[0], ecodes.KEY_S, 2, None)
+    cb(devs[1], ecodes.KEY_S, 2, None)
+    cb(devs[0], ecodes.KEY_S, 2, None)  # 間引かれる
+    for d in devs:
+        d.close()
+
+    assert got == [(devs[0].path, 2), (devs[1].path, 2)]
+    assert hf.dropped == 1
+
+
+@pytest.mark.parametrize(
+    "mode, rate, every",
+    [
+        ("x", 0, 0),
+        ("throttle", 0, 0),
+        ("coalesce", 0.5, 0),  # rate ではなく every
+        ("coalesce", 0, 0),
+        ("coalesce", 0, 0.5),
+    ],
+)
+def test_error(mode, rate, every):
+    with pytest.raises(ValueError):
+        HoldFilter(mode, rate, every)
+
+
+def test_set_repeat_pipe():
+    """リピート設定を持たないデバイスは OSError"""
+    dev = PipeInputDevice()
+    with pytest.raises(OSError):
+        set_repeat(dev, 500, 100)
+    dev.close()
+
+
+def test_cmd_input_exit():
+    """hold を捨てても、'S' の長押しで終了する"""
+    app = CmdInput(["x"], flag_repeat=False)
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_S, n_hold=20))
+    app.bt.read_loop(dev, app.cb)
+    dev.close()
+    assert app.hold_filter.dropped == 9
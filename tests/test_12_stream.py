@@ -0,0 +1,107 @@
+# tests/test_12_stream.py
+#
+# PiBtInput.events() / Stream のテスト
+#
+import asyncio
+
+import pytest
+from _testbase_evdev import ListInputDevice, PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.stream import Stream, key_forms
+
+
+def list_dev(*presses: tuple[int, int]) -> ListInputDevice:
+    """(code, n_hold) ごとに down, hold x n_hold, up"""
+    dev = PipeInputDevice()
+    for code, n_hold in presses:
+        dev.write_raw(key_press_bytes(dev, code, n_hold))
+    evs = []
+    while True:
+        try:
+            evs += list(dev.read())
+        except BlockingIOError:
+            break
+    dev.close()
+    return ListInputDevice(evs)
+
+
+def test_events():
+    dev = list_dev((ecodes.KEY_A, 1), (ecodes.KEY_B, 0))
+    got = [(ev.key, ev.state) for ev in PiBtInput().events(dev)]
+    assert got == [
+        ("KEY_A", 1),
+        ("KEY_A", 2),
+        ("KEY_A", 0),
+        ("KEY_B", 1),
+        ("KEY_B", 0),
+    ]
+
+
+def test_events_onkeys():
+    """onkeys は read_loop() と同じく更新される"""
+    dev = list_dev((ecodes.KEY_A, 2))
+    got = [dict(ev.onkeys) for ev in PiBtInput().events(dev)]
+    assert got == [{"KEY_A": 1}, {"KEY_A": 2}, {"KEY_A": 3}, {}]
+
+
+def test_stages():
+    dev = list_dev((ecodes.KEY_A, 1), (ecodes.KEY_B, 3), (ecodes.KEY_Q, 0))
+    s = (
+        PiBtInput()
+        .events(dev, key_code=True)
+        .take_while(lambda ev: ev.key != ecodes.KEY_Q)
+        .keys("KEY_B")
+        .states(2)
+        .map(lambda ev: ev.onkeys.count(ev.key))
+        .window(2)
+    )
+    assert list(s) == [(2, 3), (3, 4)]
+
+
+def test_actions():
+    dev = list_dev((ecodes.KEY_A, 1), (ecodes.KEY_B, 0))
+    table = {("KEY_A", 1): "a-down", ecodes.KEY_B: "b-any"}
+    got = [(a, ev.state) for a, ev in PiBtInput().events(dev).actions(table)]
+    assert got == [("a-down", 1), ("b-any", 1), ("b-any", 0)]
+
+
+def test_lazy():
+    """必要な分だけ読み込む"""
+    n_read = [0]
+
+    def source():
+        for i in range(100):
+            n_read[0] += 1
+            yield i
+
+    s = Stream(source()).filter(lambda x: x % 2).take_while(lambda x: x < 5)
+    assert list(s) == [1, 3]
+    assert n_read[0] == 6
+
+
+@pytest.mark.parametrize("keys", [("KEY_NOSUCH",), (-1,)])
+def test_key_forms_error(keys):
+    with pytest.raises(ValueError):
+        key_forms(keys)
+
+
+def test_async_events():
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, 2))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_Q))
+
+    async def run():
+        s = (
+            PiBtInput()
+            .async_events(dev)
+            .take_while(lambda ev: ev.key != "KEY_Q")
+            .states(2)
+            .map(lambda ev: ev.onkeys.count(ecodes.KEY_A))
+            .window(2)
+        )
+        return [w async for w in s]
+
+    assert asyncio.run(run()) == [(2, 3)]
+    dev.close()
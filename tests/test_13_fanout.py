@@ -0,0 +1,76 @@
+# tests/test_13_fanout.py
+#
+# FanOut のテスト
+#
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+
+
+class GrabDevice(PipeInputDevice):
+    """PipeInputDevice with grab()/ungrab()."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.grabbed: list[str] = []
+
+    def grab(self) -> None:
+        self.grabbed.append("grab")
+
+    def ungrab(self) -> None:
+        self.grabbed.append("ungrab")
+
+
+def test_fanout():
+    dev = GrabDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=1))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_B))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_Q))
+
+    got_all = []
+    got_b = []
+
+    def cb_all(key, key_state, onkeys):
+        got_all.append((key, key_state))
+        return key != "KEY_Q"
+
+    def cb_b(key, key_state, onkeys):
+        got_b.append((key, dict(onkeys)))
+        return key != "KEY_Q"
+
+    fo = PiBtInput().fanout(dev)
+    fo.subscribe(cb_all)
+    sub_b = fo.subscribe(cb_b, keys=["KEY_B", ecodes.KEY_Q], states=[1])
+    fo.run()
+    dev.close()
+
+    assert [k for k, st in got_all if st == 1] == ["KEY_A", "KEY_B", "KEY_Q"]
+    assert got_b == [("KEY_B", {"KEY_B": 1}), ("KEY_Q", {"KEY_Q": 1})]
+    assert sub_b.n_calls == 2
+    assert dev.grabbed == ["grab", "ungrab"]
+
+
+def test_isolated():
+    """例外を出した購読者だけが外れる"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A))
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_Q))
+
+    got = []
+
+    def cb_bad(key, key_state, onkeys):
+        raise RuntimeError("bad subscriber")
+
+    def cb_good(key, key_state, onkeys):
+        got.append(key)
+        return key != "KEY_Q"
+
+    fo = PiBtInput().fanout(dev, grab=False)
+    fo.subscribe(cb_bad)
+    fo.subscribe(cb_good)
+    fo.run()
+    dev.close()
+
+    assert got == ["KEY_A", "KEY_A", "KEY_Q"]
+    assert len(fo.subs) == 0
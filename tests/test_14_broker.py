@@ -0,0 +1,151 @@
+# tests/test_14_broker.py
+#
+# Broker / BrokerClient のテスト
+#
+import threading
+import time
+
+import pytest
+from evdev import ecodes
+
+from pibtinput.broker import Broker
+from pibtinput.client import BrokerClient
+from pibtinput.keystate import KeyState
+
+
+class FakeDev:
+    def __init__(self, path: str, name: str) -> None:
+        self.path = path
+        self.name = name
+        self.onkeys = KeyState(key_code=True)
+
+    def publish(self, broker: Broker, *frame: tuple[int, int]) -> None:
+        for code, key_state in frame:
+            self.onkeys.update(code, key_state)
+        broker.publish(self, list(frame), self.onkeys.snapshot())
+
+
+@pytest.fixture
+def broker(tmp_path):
+    b = Broker(str(tmp_path / "broker.sock"), max_buffer=4096)
+    b.start()
+    yield b
+    b.close()
+
+
+def connect(broker: Broker, n: int = 1) -> BrokerClient:
+    """Connect and wait until the broker accepts it."""
+    cl = BrokerClient(broker.path)
+    while len(broker.conns) < n:
+        time.sleep(0.01)
+    return cl
+
+
+def test_read_loop(broker):
+    dev = FakeDev("/dev/input/event3", "8BitDo Micro")
+    dev.publish(broker, (ecodes.KEY_LEFTCTRL, 1))
+
+    # 後から接続しても、現在の状態を受け取る (イベントとしては届かない)
+    cl = connect(broker)
+    dev.publish(broker, (ecodes.KEY_S, 1))
+    dev.publish(broker, (ecodes.KEY_S, 0), (ecodes.KEY_LEFTCTRL, 0))
+
+    got = []
+
+    def cb(rdev, key, key_state, onkeys):
+        got.append((rdev.name, key, key_state, dict(onkeys)))
+        return not (key == "KEY_LEFTCTRL" and key_state == 0)
+
+    cl.read_loop(cb)
+    cl.close()
+
+    assert cl.resyncs == 0
+    assert got == [
+        ("8BitDo Micro", "KEY_S", 1, {"KEY_LEFTCTRL": 1, "KEY_S": 1}),
+        ("8BitDo Micro", "KEY_S", 0, {"KEY_LEFTCTRL": 1}),
+        ("8BitDo Micro", "KEY_LEFTCTRL", 0, {}),
+    ]
+
+
+def test_events_frame(broker):
+    cl = connect(broker)
+    devs = [FakeDev(f"/dev/input/event{i}", f"pad{i}") for i in range(2)]
+    devs[0].publish(broker, (ecodes.KEY_A, 1), (ecodes.KEY_B, 1))
+    devs[1].publish(broker, (ecodes.KEY_A, 1))
+    broker.close()
+
+    got = [(ev.dev.name, ev.key) for ev in cl.events()]
+    cl.close()
+    assert got == [("pad0", "KEY_A"), ("pad0", "KEY_B"), ("pad1", "KEY_A")]
+
+
+def test_frame_generation(broker):
+    """frame=True: onkeys の generation は broker 側の世代"""
+    dev = FakeDev("/dev/input/event0", "pad")
+    dev.publish(broker, (ecodes.KEY_A, 1))
+
+    cl = connect(broker)
+    dev.publish(broker, (ecodes.KEY_A, 2))
+    dev.publish(broker, (ecodes.KEY_A, 0), (ecodes.KEY_B, 1))
+    broker.close()
+
+    got = []
+
+    def cb(rdev, frame, onkeys):
+        got.append((frame, dict(onkeys), onkeys.generation))
+
+    cl.read_loop(cb, frame=True)
+    cl.close()
+
+    assert got == [
+        ([("KEY_A", 2)], {"KEY_A": 2}, 2),
+        ([("KEY_A", 0), ("KEY_B", 1)], {"KEY_B": 1}, 4),
+    ]
+
+
+@pytest.mark.parametrize("slow", ["drop", "disconnect"])
+def test_slow_client(tmp_path, slow):
+    """読まないクライアントがいても、publish() は止まらない"""
+    broker = Broker(str(tmp_path / "b.sock"), max_buffer=4096, slow=slow)
+    broker.start()
+    stuck = connect(broker, 1)
+    reader = connect(broker, 2)
+    conn, conn_r = broker.conns
+
+    got = []
+
+    def read():
+        for ev in reader.events():
+            got.append(dict(ev.onkeys))
+
+    th = threading.Thread(target=read)
+    th.start()
+
+    dev = FakeDev("/dev/input/event0", "pad")
+    for _ in range(20_000):
+        dev.publish(broker, (ecodes.KEY_A, 1))
+        dev.publish(broker, (ecodes.KEY_A, 0))
+    dev.publish(broker, (ecodes.KEY_B, 1))
+
+    if slow == "drop":
+        assert conn.dropped > 0
+    else:
+        assert conn.closed
+
+    # 読む側に送り終わるまで待つ
+    while slow == "drop" and (conn_r.outbuf or conn_r.stale):
+        time.sleep(0.01)
+    broker.close()
+    th.join()
+    stuck.close()
+    reader.close()
+
+    # 捨てられたフレームがあっても、最後の状態は一致する
+    # (disconnect では、読む側も追いつかなければ切断される)
+    if slow == "drop":
+        assert got[-1] == {"KEY_B": 1}
+
+
+def test_already_running(broker):
+    with pytest.raises(OSError):
+        Broker(broker.path).start()
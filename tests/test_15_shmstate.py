@@ -0,0 +1,122 @@
+# tests/test_15_shmstate.py
+#
+# ShmKeyState / ShmKeyReader のテスト
+#
+import subprocess
+import sys
+
+import pytest
+from _testbase_evdev import PipeInputDevice, key_press_bytes
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.cmd_serve import CmdServe
+from pibtinput.keystate import KeyState
+from pibtinput.shmstate import ShmKeyReader, ShmKeyState
+
+
+@pytest.fixture
+def shm(tmp_path):
+    w = ShmKeyState(str(tmp_path / "keys"))
+    yield w
+    w.close(unlink=True)
+
+
+def test_publish(shm):
+    r = ShmKeyReader(shm.path)
+    onkeys = KeyState(key_code=True)
+    onkeys.update(ecodes.KEY_A, 1)
+    onkeys.update(ecodes.KEY_A, 2)
+    onkeys.update(ecodes.KEY_LEFTCTRL, 1)
+    shm.publish(onkeys)
+
+    assert r.seq == 2
+    assert r.is_pressed(ecodes.KEY_A)
+    assert r.is_pressed("KEY_LEFTCTRL")
+    assert not r.is_pressed(ecodes.KEY_B)
+    assert r.count("KEY_A") == 2
+    assert r.read() == (2, onkeys.bits, {30: 2, 29: 1})
+
+    # KeySnapshot: 離したキーは 0 になる
+    onkeys.update(ecodes.KEY_A, 0)
+    shm.publish(onkeys.snapshot())
+    assert r.count(ecodes.KEY_A) == 0
+    assert r.read()[2] == {ecodes.KEY_LEFTCTRL: 1}
+    r.close()
+
+
+def test_writing(shm):
+    """書き込み中 (seq が奇数) のまま止まったら、あきらめる"""
+    r = ShmKeyReader(shm.path)
+    shm.seqv[0] = 1
+    with pytest.raises(RuntimeError):
+        r.is_pressed(ecodes.KEY_A)
+    r.close()
+
+
+def test_not_shm(tmp_path):
+    path = tmp_path / "x"
+    path.write_bytes(b"x" * 8192)
+    with pytest.raises(ValueError):
+        ShmKeyReader(str(path))
+
+
+def test_stage_other_process(shm):
+    """read loop のステージ: 別のプロセスから読む"""
+    dev = PipeInputDevice()
+    dev.write_raw(key_press_bytes(dev, ecodes.KEY_A, n_hold=2))
+
+    def cb(key, key_state, onkeys):
+        return key_state != 0
+
+    PiBtInput().read_loop(dev, shm.stage(cb))
+    dev.close()
+
+    code = (
+        "from pibtinput.shmstate import ShmKeyReader\n"
+        f"r = ShmKeyReader({shm.path!r})\n"
+        "print(r.seq, r.count('KEY_A'))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    ).stdout
+    assert out.split() == ["8", "0"]
+
+
+class FakeDev:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.name = path
+        self.onkeys = KeyState(key_code=True)
+
+    def frame(self, *frame: tuple[int, int]) -> tuple:
+        for code, key_state in frame:
+            self.onkeys.update(code, key_state)
+        return self, list(frame), self.onkeys.snapshot()
+
+
+def test_serve_disconnect(tmp_path):
+    """外したデバイスのキーは、押されたまま残らない"""
+    app = CmdServe(
+        [],
+        socket_path=str(tmp_path / "sock"),
+        shm_path=str(tmp_path / "keys"),
+    )
+    r = ShmKeyReader(app.shm.path)
+    devs = [FakeDev(f"/dev/input/event{i}") for i in range(2)]
+
+    app.publish(*devs[0].frame((ecodes.KEY_A, 1)))
+    app.publish(*devs[1].frame((ecodes.KEY_B, 1)))
+    assert r.read()[2] == {ecodes.KEY_A: 1, ecodes.KEY_B: 1}
+    gen = app.merged_onkeys().generation
+
+    app.on_disconnect(devs[0])
+    assert r.read()[2] == {ecodes.KEY_B: 1}
+    assert app.merged_onkeys().generation > gen
+
+    app.on_disconnect(devs[1])
+    assert r.read()[2] == {}
+    assert not r.is_pressed(ecodes.KEY_B)
+
+    r.close()
+    app.end()
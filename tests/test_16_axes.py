@@ -0,0 +1,234 @@
+# tests/test_16_axes.py
+#
+# Axes (EV_ABS) のテスト
+#
+import asyncio
+import itertools
+
+import evdev
+import pytest
+from _testbase_evdev import PipeInputDevice
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.axes import DPAD_KEYS, Axes
+from pibtinput.keycodes import KEY_NAMES
+
+ABSINFO = {
+    ecodes.ABS_X: evdev.AbsInfo(128, 0, 255, 0, 15, 0),
+    ecodes.ABS_Y: evdev.AbsInfo(128, 0, 255, 0, 15, 0),
+    ecodes.ABS_HAT0X: evdev.AbsInfo(0, -1, 1, 0, 0, 0),
+    ecodes.ABS_GAS: evdev.AbsInfo(0, 0, 1023, 0, 0, 0),
+}
+BTN = KEY_NAMES[ecodes.BTN_SOUTH]
+
+
+class PadDevice(PipeInputDevice):
+    """PipeInputDevice with EV_ABS."""
+
+    def capabilities(self, verbose=False, absinfo=True) -> dict:
+        return {
+            ecodes.EV_KEY: [ecodes.BTN_SOUTH],
+            ecodes.EV_ABS: list(ABSINFO.items()),
+        }
+
+    def absinfo(self, code: int):
+        return ABSINFO[code]
+
+    def frame(self, *evs) -> None:
+        """Write events followed by SYN_REPORT."""
+        data = list(itertools.starmap(self.pack, evs))
+        data.append(self.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+        self.write_raw(b"".join(data))
+
+
+def test_normalize():
+    state = Axes(deadzone=0.1).new_state(PadDevice())
+    x = state.axis[ecodes.ABS_X]
+    assert x.normalize(128) == 0.0
+    assert x.normalize(130) == 0.0  # flat
+    assert x.normalize(255) == pytest.approx(1.0)
+    assert x.normalize(0) == pytest.approx(-1.0)
+    assert x.normalize(-50) == pytest.approx(-1.0)
+    gas = state.axis[ecodes.ABS_GAS]
+    assert gas.normalize(0) == 0.0
+    assert gas.normalize(1023) == pytest.approx(1.0)
+
+    with pytest.raises(ValueError):
+        Axes(deadzone=1.0)
+    with pytest.raises(ValueError):
+        Axes(keys={"ABS_X": ("KEY_NONE?", "KEY_RIGHT")})
+    with pytest.raises(ValueError):
+        Axes(keys={"KEY_A": ("KEY_LEFT", "KEY_RIGHT")})
+
+
+def test_coalesce():
+    """スティックの EV_ABS は SYN_REPORT ごとに一度だけ"""
+    dev = PadDevice()
+    for v in range(128, 256, 4):
+        dev.frame((ecodes.EV_ABS, ecodes.ABS_Y, v))
+    dev.frame(
+        *[(ecodes.EV_ABS, ecodes.ABS_X, v) for v in range(128, 256)],
+        (ecodes.EV_ABS, ecodes.ABS_GAS, 1023),
+    )
+    dev.frame((ecodes.EV_KEY, ecodes.BTN_SOUTH, 1))
+
+    got = []
+
+    def cb_axis(state, changed):
+        got.append(changed)
+        return True
+
+    def cb(key, key_state, onkeys):
+        return key != BTN
+
+    PiBtInput().read_loop(dev, cb, axes=Axes(0.1, cb_axis=cb_axis))
+    dev.close()
+
+    # flat (deadzone) の中は変化なし, X と GAS は一度にまとめて
+    assert len(got) == 32 - 4 + 1
+    assert got[-1] == {"ABS_X": pytest.approx(1.0), "ABS_GAS": 1.0}
+
+
+@pytest.mark.parametrize("frame", [False, True])
+def test_vkeys(frame):
+    dev = PadDevice()
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, -1))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, 1))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, 0))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 255))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 180))  # まだ押している
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 128))
+    dev.frame((ecodes.EV_KEY, ecodes.BTN_SOUTH, 1))
+
+    got = []
+
+    if frame:
+
+        def cb(fr, onkeys):
+            got.extend(fr)
+            return (BTN, 1) not in fr
+
+    else:
+
+        def cb(key, key_state, onkeys):
+            got.append((key, key_state))
+            return key != BTN
+
+    bt = PiBtInput()
+    bt.read_loop(dev, cb, frame=frame, axes=Axes(0.1, DPAD_KEYS))
+    dev.close()
+
+    assert got == [
+        ("KEY_LEFT", 1),
+        ("KEY_LEFT", 0),
+        ("KEY_RIGHT", 1),
+        ("KEY_RIGHT", 0),
+        ("KEY_RIGHT", 1),
+        ("KEY_RIGHT", 0),
+        (BTN, 1),
+    ]
+    assert dict(bt.onkeys) == {BTN: 1}
+
+
+@pytest.mark.parametrize("frame", [False, True])
+def test_vkeys_shared(frame):
+    """十字キーとスティックが同じキー: 両方が放すまで押したまま"""
+    dev = PadDevice()
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, -1))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 0))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, 0))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 128))
+    dev.frame((ecodes.EV_KEY, ecodes.BTN_SOUTH, 1))
+
+    got = []
+
+    if frame:
+
+        def cb(fr, onkeys):
+            got.extend((k, st, dict(onkeys)) for k, st in fr)
+            return (BTN, 1) not in fr
+
+    else:
+
+        def cb(key, key_state, onkeys):
+            got.append((key, key_state, dict(onkeys)))
+            return key != BTN
+
+    bt = PiBtInput()
+    bt.read_loop(dev, cb, frame=frame, axes=Axes(0.1, DPAD_KEYS))
+    dev.close()
+
+    assert got == [
+        ("KEY_LEFT", 1, {"KEY_LEFT": 1}),
+        ("KEY_LEFT", 0, {}),  # スティックも戻ったとき
+        (BTN, 1, {BTN: 1}),
+    ]
+
+
+def test_vkeys_async():
+    dev = PadDevice()
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, -1))
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, 1))
+
+    got = []
+
+    async def cb(d, key, key_state, onkeys):
+        await asyncio.sleep(0)
+        got.append((key, key_state, dict(onkeys)))
+        return key != "KEY_RIGHT"
+
+    bt = PiBtInput()
+    asyncio.run(bt.async_read_loop([dev], cb, axes=Axes(0.1, DPAD_KEYS)))
+    dev.close()
+
+    assert got == [
+        ("KEY_LEFT", 1, {"KEY_LEFT": 1}),
+        ("KEY_LEFT", 0, {}),
+        ("KEY_RIGHT", 1, {"KEY_RIGHT": 1}),
+    ]
+
+
+def test_syn_dropped():
+    """SYN_DROPPED の後は、absinfo から読み直す"""
+    dev = PadDevice()
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 255))
+    dev.write_ev(ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_X, 0))  # 捨てられる
+    dev.frame((ecodes.EV_KEY, ecodes.BTN_SOUTH, 1))
+
+    got = []
+
+    def cb_axis(state, changed):
+        got.append(changed)
+        return True
+
+    def cb(key, key_state, onkeys):
+        return key != BTN
+
+    PiBtInput().read_loop(dev, cb, axes=Axes(0.1, cb_axis=cb_axis))
+    dev.close()
+
+    # absinfo の値 (128: 中心) に戻る
+    assert got == [{"ABS_X": pytest.approx(1.0)}, {"ABS_X": 0.0}]
+
+
+def test_syn_dropped_frame():
+    dev = PadDevice()
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, -1))
+    dev.write_ev(ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+    dev.frame((ecodes.EV_ABS, ecodes.ABS_HAT0X, 1))  # 捨てられる
+    dev.frame((ecodes.EV_KEY, ecodes.BTN_SOUTH, 1))
+
+    got = []
+
+    def cb(fr, onkeys):
+        got.append(fr)
+        return (BTN, 1) not in fr
+
+    bt = PiBtInput()
+    bt.read_loop(dev, cb, frame=True, axes=Axes(0.1, DPAD_KEYS))
+    dev.close()
+
+    # absinfo の値 (0) に戻るので、KEY_LEFT を放す
+    assert got == [[("KEY_LEFT", 1)], [("KEY_LEFT", 0)], [(BTN, 1)]]
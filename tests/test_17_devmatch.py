@@ -0,0 +1,112 @@
+# tests/test_17_devmatch.py
+#
+# DevIndex / DevQuery (search_input_devs) のテスト
+#
+import os
+
+import evdev
+import pytest
+from _testbase_evdev import PipeInputDevice
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.devmatch import DevIndex, DevQuery, compile_query
+from pibtinput.devregistry import DevRegistry
+
+DEVS = [
+    # name, vendor, product, phys, uniq
+    ("8BitDo Micro gamepad Keyboard", 0x2DC8, 0x9020, "b8:27:eb:00:00:01",
+     "E4:17:D8:00:00:01"),
+    ("8BitDo Micro gamepad Keyboard", 0x2DC8, 0x9020, "b8:27:eb:00:00:01",
+     "E4:17:D8:00:00:02"),
+    ("AT Translated Set 2 keyboard", 0x0001, 0x0001, "isa0060/serio0/input0",
+     ""),
+]  # fmt: skip
+
+
+class InfoDevice(PipeInputDevice):
+    def __init__(self, i: int) -> None:
+        name, vendor, product, phys, uniq = DEVS[i]
+        super().__init__(name, i)
+        self.info = evdev.DeviceInfo(5, vendor, product, 1)
+        self.phys = phys
+        self.uniq = uniq
+
+    def capabilities(self, verbose=False, absinfo=True) -> dict:
+        caps = {ecodes.EV_KEY: [ecodes.KEY_A]}
+        if self.path.endswith("1"):
+            caps[ecodes.EV_ABS] = [
+                (ecodes.ABS_HAT0X, evdev.AbsInfo(0, -1, 1, 0, 0, 0))
+            ]
+        return caps
+
+
+@pytest.fixture
+def index():
+    devs = [InfoDevice(i) for i in range(len(DEVS))]
+    yield DevIndex(devs, lambda d: d.capabilities())
+    for d in devs:
+        d.close()
+
+
+@pytest.mark.parametrize(
+    "words, expected",
+    [
+        ([], [0, 1, 2]),
+        (["8BitDo"], [0, 1]),
+        (["8BitDo", "Keyboard"], [0, 1]),
+        (["keyboard"], [2]),
+        (["e4:17:d8:00:00:02"], [1]),
+        (["E4:17:D8:00:00:02", "8BitDo"], [1]),
+        (["2DC8:9020"], [0, 1]),
+        (["vendor=0001"], [2]),
+        (["name=8BitDo*"], [0, 1]),
+        (["name=8BitDo"], []),
+        (["phys~^isa"], [2]),
+        (["uniq~02$"], [1]),
+        (["cap=ABS_HAT0X"], [1]),
+        (["cap=KEY_A", "2dc8:9020"], [0, 1]),
+        (["cap=KEY_B"], []),
+        (["path=/dev/input/pipe2"], [2]),
+        (["foo=bar"], []),  # 不明なフィールドは名前の一部
+    ],
+)
+def test_search(index, words, expected):
+    found = index.search(DevQuery(words))
+    assert [d.path for d in found] == [
+        f"/dev/input/pipe{i}" for i in expected
+    ]
+
+
+@pytest.mark.parametrize("word", ["cap=KEY_NONE?", "cap~KEY_A", "name~("])
+def test_invalid(word):
+    with pytest.raises(ValueError):
+        DevQuery([word])
+
+
+def test_compile_cache():
+    assert compile_query(("a", "b")) is compile_query(("a", "b"))
+
+
+def test_search_input_devs(tmp_path):
+    """registry が変わったら、索引を作り直す"""
+    for i in range(3):
+        (tmp_path / f"event{i}").touch()
+
+    def open_dev(path):
+        dev = InfoDevice(int(path[-1]))
+        dev.path = path
+        return dev
+
+    bt = PiBtInput()
+    bt._registry = DevRegistry(str(tmp_path), open_dev)
+
+    found = bt.search_input_devs(["e4:17:d8:00:00:02"])
+    assert [d.path for d in found] == [os.path.join(tmp_path, "event1")]
+    index = bt.dev_index()
+    assert bt.dev_index() is index
+
+    (tmp_path / "event1").unlink()
+    assert bt.search_input_devs(["e4:17:d8:00:00:02"]) == []
+    assert bt.dev_index() is not index
+    bt.close()
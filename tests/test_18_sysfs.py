@@ -0,0 +1,120 @@
+# tests/test_18_sysfs.py
+#
+# SysfsInput (sysfs からのデバイス一覧) のテスト
+#
+import os
+
+import pytest
+from _testbase_evdev import PipeInputDevice
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.devregistry import DevRegistry
+from pibtinput.sysfs import SysfsInput, parse_bitmap
+
+# name, vendor, uniq, capabilities (ファイル名: 内容)
+DEVS = {
+    "event0": ("8BitDo Micro gamepad Keyboard", "2dc8", "e4:17:d8:00:00:01",
+               {"ev": "120013", "key": "40000000 0 0 0 0 0 40000000"}),
+    "event1": ("USB Mouse", "046d", "",
+               {"ev": "17", "key": "", "rel": "903"}),
+    "event2": ("8BitDo Micro gamepad", "2dc8", "e4:17:d8:00:00:02",
+               {"ev": "b", "key": "ffff0000 0 0 0 0", "abs": "30003"}),
+}  # fmt: skip
+
+
+def make_sysfs(root) -> str:
+    sys_dir = root / "sys"
+    for ev, (name, vendor, uniq, caps) in DEVS.items():
+        d = sys_dir / ev / "device"
+        (d / "id").mkdir(parents=True)
+        (d / "capabilities").mkdir()
+        (d / "name").write_text(name + "\n")
+        (d / "phys").write_text("b8:27:eb:00:00:01\n")
+        (d / "uniq").write_text(uniq + "\n")
+        for f, v in (("bustype", "5"), ("vendor", vendor)):
+            (d / "id" / f).write_text(v + "\n")
+        for f in ("product", "version"):
+            (d / "id" / f).write_text("1\n")
+        for f, v in caps.items():
+            (d / "capabilities" / f).write_text(v + "\n")
+    # sysfs だけにあって、まだ /dev に無いものは無視される
+    (sys_dir / "event9").mkdir()
+    return str(sys_dir)
+
+
+@pytest.fixture
+def bt(tmp_path):
+    sys_dir = make_sysfs(tmp_path)
+    dev_dir = tmp_path / "dev"
+    dev_dir.mkdir()
+    for ev in DEVS:
+        (dev_dir / ev).touch()
+
+    opened = []
+
+    def open_dev(path):
+        opened.append(os.path.basename(path))
+        dev = PipeInputDevice(DEVS[os.path.basename(path)][0])
+        dev.path = path
+        return dev
+
+    bt = PiBtInput()
+    bt._registry = DevRegistry(
+        str(dev_dir), open_dev, sysfs=SysfsInput(sys_dir, str(dev_dir))
+    )
+    bt.opened = opened
+    yield bt
+    bt.close()
+
+
+def test_parse_bitmap():
+    assert parse_bitmap("120013") == [0, 1, 4, 17, 20]
+    assert parse_bitmap("1 0", long_bits=64) == [64]
+    assert parse_bitmap("1 0", long_bits=32) == [32]
+    assert parse_bitmap("") == []
+
+
+def test_describe(bt):
+    infos = bt.registry.describe()
+    assert [os.path.basename(d.path) for d in infos] == [
+        "event0",
+        "event1",
+        "event2",
+    ]
+    d0 = infos[0]
+    assert d0.name == "8BitDo Micro gamepad Keyboard"
+    assert d0.info.vendor == 0x2DC8
+    assert d0.uniq == "e4:17:d8:00:00:01"
+    assert ecodes.KEY_A in d0.capabilities()[ecodes.EV_KEY]
+    assert ecodes.EV_ABS in infos[2].capabilities()
+    assert bt.opened == []
+
+
+def test_search(bt):
+    # 一覧, 検索ではデバイスを開かない
+    infos = bt.search_dev_info([])
+    assert [d.name for d in infos] == [
+        "8BitDo Micro gamepad Keyboard",
+        "8BitDo Micro gamepad",
+    ]
+    assert [d.name for d in bt.search_dev_info(["cap=ABS_Y"])] == [
+        "8BitDo Micro gamepad"
+    ]
+    assert bt.opened == []
+
+    # 選んだデバイスだけを開く
+    devs = bt.search_input_devs(["e4:17:d8:00:00:02"])
+    assert [d.name for d in devs] == ["8BitDo Micro gamepad"]
+    assert bt.opened == ["event2"]
+
+    # 2回目は開き直さない
+    assert bt.search_input_devs(["e4:17:d8:00:00:02"]) == devs
+    assert bt.opened == ["event2"]
+
+
+def test_removed(bt, tmp_path):
+    assert len(bt.search_input_devs(["8BitDo"])) == 2
+    (tmp_path / "dev" / "event2").unlink()
+    devs = bt.search_input_devs(["8BitDo"])
+    assert [d.name for d in devs] == ["8BitDo Micro gamepad Keyboard"]
@@ -0,0 +1,149 @@
+# tests/test_19_output.py
+#
+# FrameWriter (input --format) のテスト
+#
+import contextlib
+import csv
+import io
+import json
+import os
+
+import pytest
+from _testbase_evdev import PipeInputDevice
+from evdev import ecodes
+
+from pibtinput import PiBtInput
+from pibtinput.broker import EVT_STRUCT, HDR_STRUCT, MSG_DEV, MSG_FRAME
+from pibtinput.output import FrameWriter
+
+
+@pytest.fixture
+def pipe():
+    r, w = os.pipe()
+    yield r, w
+    for fd in (r, w):
+        with contextlib.suppress(OSError):
+            os.close(fd)
+
+
+def read_all(fd: int) -> bytes:
+    os.set_blocking(fd, False)
+    data = b""
+    try:
+        while chunk := os.read(fd, 65536):
+            data += chunk
+    except BlockingIOError:
+        pass
+    return data
+
+
+def run(fmt: str, fd: int, flush_interval: float = 0.0) -> FrameWriter:
+    """KEY_LEFTCTRL + KEY_A (ts 100.5, 101.25) を書く"""
+    dev = PipeInputDevice('Pad,"1"')
+    dev.write_raw(
+        dev.pack(ecodes.EV_KEY, ecodes.KEY_LEFTCTRL, 1, ts=100.5)
+        + dev.pack(ecodes.EV_KEY, ecodes.KEY_A, 1, ts=100.5)
+        + dev.pack(ecodes.EV_SYN, ecodes.SYN_REPORT, 0, ts=100.5)
+    )
+    dev.key(ecodes.KEY_A, 0, ts=101.25)
+
+    w = FrameWriter(fmt, fd, flush_interval)
+    w.set_dev(dev)
+
+    def cb(frame, onkeys):
+        w.write_frame(frame, onkeys)
+        return (ecodes.KEY_A, 0) not in frame
+
+    PiBtInput().read_loop(dev, cb, frame=True, key_code=True)
+    dev.close()
+    return w
+
+
+def test_ndjson(pipe):
+    w = run("ndjson", pipe[1])
+    w.close()
+    recs = [json.loads(line) for line in read_all(pipe[0]).splitlines()]
+    assert recs == [
+        {"sec": 100, "usec": 500000, "dev": "/dev/input/pipe0",
+         "code": 29, "key": "KEY_LEFTCTRL", "state": 1,
+         "held": {"KEY_LEFTCTRL": 1, "KEY_A": 1}},
+        {"sec": 100, "usec": 500000, "dev": "/dev/input/pipe0",
+         "code": 30, "key": "KEY_A", "state": 1,
+         "held": {"KEY_LEFTCTRL": 1, "KEY_A": 1}},
+        {"sec": 101, "usec": 250000, "dev": "/dev/input/pipe0",
+         "code": 30, "key": "KEY_A", "state": 0,
+         "held": {"KEY_LEFTCTRL": 1}},
+    ]  # fmt: skip
+    assert w.n_writes == 2  # フレームごと
+
+
+def test_csv(pipe):
+    run("csv", pipe[1]).close()
+    rows = list(csv.reader(io.StringIO(read_all(pipe[0]).decode())))
+    assert rows[0] == ["sec", "usec", "dev", "code", "key", "state", "held"]
+    assert rows[2] == [
+        "100",
+        "500000",
+        "/dev/input/pipe0",
+        "30",
+        "KEY_A",
+        "1",
+        "KEY_LEFTCTRL:1 KEY_A:1",
+    ]
+    assert len(rows) == 4
+
+
+def test_binary(pipe):
+    run("binary", pipe[1]).close()
+    data = read_all(pipe[0])
+
+    msgs = []
+    off = 0
+    while off < len(data):
+        msg_type, dev_id, n, n_held, seq, sec, usec, _ = (
+            HDR_STRUCT.unpack_from(data, off)
+        )
+        off += HDR_STRUCT.size
+        if msg_type == MSG_DEV:
+            msgs.append(("dev", data[off : off + n].split(b"\0")[0]))
+            off += n
+            continue
+        assert msg_type == MSG_FRAME
+        frame = [
+            EVT_STRUCT.unpack_from(data, off + i * EVT_STRUCT.size)
+            for i in range(n)
+        ]
+        off += n * EVT_STRUCT.size + n_held * 4
+        msgs.append((seq, sec, usec, frame))
+
+    assert msgs == [
+        ("dev", b"/dev/input/pipe0"),
+        (1, 100, 500000, [(29, 1), (30, 1)]),
+        (2, 101, 250000, [(30, 0)]),
+    ]
+
+
+def test_batched(pipe):
+    """flush_interval の間は、まとめて書く"""
+    w = run("ndjson", pipe[1], flush_interval=60)
+    assert w.n_writes == 0
+    assert read_all(pipe[0]) == b""
+    w.close()
+    assert w.n_writes == 1
+    assert len(read_all(pipe[0]).splitlines()) == 3
+
+
+def test_broken_pipe(pipe):
+    os.close(pipe[0])
+    w = FrameWriter("csv", pipe[1], 0)
+    w.set_dev(PipeInputDevice())
+    assert (
+        w.write_frame([(ecodes.KEY_A, 1)], PiBtInput().onkeys.snapshot())
+        is False
+    )
+    w.close()
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        FrameWriter("xml")
@@ -0,0 +1,126 @@
+# tests/test_20_scriptrunner.py
+#
+# ScriptRunner (batch モード) のテスト
+#
+import contextlib
+import threading
+import time
+
+import pytest
+
+from pibtinput.utils.clibase import ScriptRunner
+
+
+class Recorder(ScriptRunner):
+    """Collect results instead of printing."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.out = []
+
+    def output_result(self, result_data):
+        self.out.append(result_data["data"])
+
+
+class PureRecorder(Recorder):
+    """handle() without side effects (slow, to be run in parallel)."""
+
+    PURE_HANDLE = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def handle(self, parsed_data):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.001)
+        return super().handle(parsed_data)
+
+
+def run(cls, path, **kwargs):
+    runner = cls(str(path), **kwargs)
+    with contextlib.suppress(EOFError):
+        runner.main()
+    return runner
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "script.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [16, 1000, 256 * 1024])
+def test_batch_same_as_loop(script, monkeypatch, chunk_size):
+    monkeypatch.setattr(ScriptRunner, "CHUNK_SIZE", chunk_size)
+    expected = run(Recorder, script).out
+    assert len(expected) == 1000
+
+    runner = run(Recorder, script, batch=True)
+    assert runner.out == expected
+    assert runner.n_lines == 1000
+
+
+def test_batch_newlines(tmp_path):
+    path = tmp_path / "script.txt"
+    path.write_bytes(b"a\r\nb\n\nc")
+
+    assert run(Recorder, path, batch=True).out == ["a", "b", "", "c"]
+
+
+def test_batch_empty(tmp_path):
+    path = tmp_path / "script.txt"
+    path.write_bytes(b"")
+
+    assert run(Recorder, path, batch=True).out == []
+
+
+@pytest.mark.parametrize("n_threads", [0, 4])
+def test_batch_exit(tmp_path, n_threads):
+    path = tmp_path / "script.txt"
+    path.write_text("a\nb\nexit\nc\n")
+
+    runner = PureRecorder(str(path), batch=True, n_threads=n_threads)
+    with pytest.raises(EOFError):
+        runner.main()
+    assert runner.out == ["a", "b"]
+
+
+def test_batch_parallel_ordered(script):
+    runner = run(PureRecorder, script, batch=True, n_threads=4)
+    assert runner.out == [f"line {i}" for i in range(1000)]
+    assert len(runner.threads) > 1
+
+
+def test_batch_not_pure(script):
+    """n_threads is ignored unless PURE_HANDLE."""
+    runner = run(Recorder, script, batch=True, n_threads=4)
+    assert runner.out == [f"line {i}" for i in range(1000)]
+
+
+def test_batch_no_file(tmp_path):
+    runner = run(Recorder, tmp_path / "none.txt", batch=True)
+    assert runner.out == []
+
+
+class BrokenOutput(Recorder):
+    """output_result() fails for one line."""
+
+    PURE_HANDLE = True
+
+    def output_result(self, result_data):
+        if result_data["data"] == "b":
+            raise ValueError(result_data["data"])
+        super().output_result(result_data)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"batch": True}, {"batch": True, "n_threads": 4}]
+)
+def test_output_error(tmp_path, kwargs):
+    """An exception from output_result() skips only that line."""
+    path = tmp_path / "script.txt"
+    path.write_text("a\nb\nc\n")
+
+    assert run(BrokenOutput, path, **kwargs).out == ["a", "c"]